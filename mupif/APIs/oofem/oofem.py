@@ -262,17 +262,6 @@ class OOFEM(Application.Application):
         self.oofem_pb.solveYourselfAt(ts)
 
 
-    def wait(self):
-        """
-        Wait until solve is completed when executed in background.
-        """
-    def isSolved(self):
-        """
-        Check whether solve has completed.
-
-        :return: Returns true or false depending whether solve has completed when executed in background.
-        :rtype: bool
-        """
     def finishStep(self, tstep):
         """
         Called after a global convergence within a time step is achieved.
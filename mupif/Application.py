@@ -22,12 +22,31 @@
 #
 
 import os
+import copy
+import functools
+import concurrent.futures
 import Pyro4
 from . import APIError
 from . import MupifObject
+from . import MeshCache
 import logging
 log = logging.getLogger()
 
+
+def _backgroundSolveStep(solveStep):
+    """
+    Wraps solveStep of an application class so that runInBackground=True submits the (synchronous) solve to the worker thread of the application instead of blocking, see :func:`Application.solveStep`.
+    """
+    @functools.wraps(solveStep)
+    def wrapper(self, tstep, *args, **kwargs):
+        runInBackground = kwargs.pop('runInBackground', args[1] if len(args) > 1 else False)
+        if not runInBackground:
+            return solveStep(self, tstep, *args[:1], **kwargs)
+        return self._submitSolve(solveStep, tstep, *args[:1], **kwargs)
+    wrapper._backgroundSolveStep = True
+    return wrapper
+
+
 @Pyro4.expose
 class Application(MupifObject.MupifObject):
     """
@@ -42,6 +61,12 @@ class Application(MupifObject.MupifObject):
 
     .. automethod:: __init__
     """
+    def __init_subclass__(cls, **kwargs):
+        super(Application, cls).__init_subclass__(**kwargs)
+        solveStep = cls.__dict__.get('solveStep')
+        if solveStep is not None and not getattr(solveStep, '_backgroundSolveStep', False):
+            cls.solveStep = _backgroundSolveStep(solveStep)
+
     def __init__ (self, file='', workdir=''):
         """
         Constructor. Initializes the application.
@@ -62,6 +87,9 @@ class Application(MupifObject.MupifObject):
         self.pyroNS = None
         self.pyroURI = None
         self.appName = None
+        # background solve, see solveStep
+        self._solveExecutor = None
+        self._solveFuture = None
         
     def registerPyro (self, pyroDaemon, pyroNS, pyroURI, appName=None, externalDaemon = False):
         """
@@ -89,6 +117,19 @@ class Application(MupifObject.MupifObject):
         :return: Returns requested field.
         :rtype: Field
         """
+    def getFieldCached(self, fieldID, time, knownMeshes=()):
+        """
+        Returns the requested field like :func:`getField`, but with the mesh replaced by :obj:`MeshCache.MeshReference` if the caller already holds it, so that the mesh is not transferred again. See :obj:`MeshCache.MeshCache`.
+
+        :param FieldID fieldID: Identifier of the field
+        :param Physics.PhysicalQuantity time: Target time
+        :param knownMeshes: digests (:func:`Mesh.Mesh.internalArraysDigest`) of meshes held by the caller
+
+        :return: Returns requested field.
+        :rtype: Field
+        """
+        return MeshCache.stripMesh(self.getField(fieldID, time), knownMeshes)
+
     def getFieldURI(self, fieldID, time):
         """
         Returns the uri of requested field at given time. Field is identified by fieldID.
@@ -181,11 +222,49 @@ class Application(MupifObject.MupifObject):
         :param int stageID: optional argument identifying solution stage (default 0)
         :param bool runInBackground: optional argument, defualt False. If True, the solution will run in background (in separate thread or remotely).
 
+        :return: if runInBackground is True, the future of the solution
+        :rtype: concurrent.futures.Future
+
+        Derived classes implement the solution synchronously; background execution is provided by this class for any solveStep override. Steps submitted in background are solved one after another in a single worker thread of the application. Other services (getField etc.) should not be called before the step is solved. Futures can not be sent over the wire, remote callers use :func:`startSolveStep` instead.
+        """
+    def startSolveStep(self, tstep, stageID=0):
+        """
+        Starts the solution of given time step in background, without returning the future (to be used through Pyro).
+        Use :func:`wait` and :func:`isSolved` to check for the solution.
+
+        :param TimeStep tstep: Solution step
+        :param int stageID: optional argument identifying solution stage (default 0)
         """
-    def wait(self):
+        self.solveStep(tstep, stageID, runInBackground=True)
+    def _submitSolve(self, solveStep, tstep, *args, **kwargs):
+        """
+        Submits solveStep to the worker thread of the application.
+
+        :return: future of the solution
+        :rtype: concurrent.futures.Future
+        """
+        if getattr(self, '_solveExecutor', None) is None:
+            self._solveExecutor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._solveFuture = self._solveExecutor.submit(solveStep, self, tstep, *args, **kwargs)
+        return self._solveFuture
+
+    def wait(self, timeout=None):
         """
         Wait until solve is completed when executed in background.
+        Exception raised by the solution is re-raised.
+
+        :param float timeout: optional maximum time to wait in seconds, wait until completed if None
+
+        :return: Returns true if solve has completed, false on timeout
+        :rtype: bool
         """
+        future = getattr(self, '_solveFuture', None)
+        if future is not None:
+            try:
+                future.result(timeout)
+            except concurrent.futures.TimeoutError:
+                return False
+        return True
     def isSolved(self):
         """
         Check whether solve has completed.
@@ -193,6 +272,8 @@ class Application(MupifObject.MupifObject):
         :return: Returns true or false depending whether solve has completed when executed in background.
         :rtype: bool
         """ 
+        future = getattr(self, '_solveFuture', None)
+        return future is None or future.done()
     def finishStep(self, tstep):
         """
         Called after a global convergence within a time step is achieved.
@@ -278,6 +359,10 @@ class Application(MupifObject.MupifObject):
                 self.pyroDaemon.shutdown()
             self.pyroDaemon=None
 
+        if getattr(self, '_solveExecutor', None) is not None:
+            self._solveExecutor.shutdown(wait=False)
+            self._solveExecutor = None
+
 
     def getURI(self):
         """
@@ -298,11 +383,23 @@ class RemoteApplication (object):
     These extermal attributes could not be injected into Application instance, as it is remote instance (using proxy) and the termination of job and tunnel has to be done from local computer, which has the neccesary communication link established 
     (ssh tunnel in particular, when port translation takes place)
     """
-    def __init__ (self, decoratee, jobMan=None, jobID=None, appTunnel=None):
+    #: maximum time (s) of a single remote wait call when waiting for the solution in background, see :func:`solveStep`
+    waitInterval = 0.1
+
+    def __init__ (self, decoratee, jobMan=None, jobID=None, appTunnel=None, meshCache=None):
+        """
+        :param decoratee: application (pyro proxy)
+        :param jobMan: job manager the application was allocated by
+        :param jobID: job ID at the job manager
+        :param appTunnel: ssh tunnel to the application
+        :param MeshCache.MeshCache meshCache: cache of meshes of fields obtained by :func:`getField` (may be shared by several applications); a new cache is created if not given
+        """
         self._decoratee = decoratee
         self._jobMan = jobMan
         self._jobID = jobID
         self._appTunnel = appTunnel
+        self._meshCache = MeshCache.MeshCache() if meshCache is None else meshCache
+        self._solveExecutor = None
         
     def __getattr__(self, name):
         """ 
@@ -313,6 +410,44 @@ class RemoteApplication (object):
     def getJobID(self):
         return self._jobID
 
+    def getField(self, fieldID, time):
+        """
+        Returns the requested field, see :func:`Application.getField`. Meshes are cached and only transferred if not received before (see :func:`Application.getFieldCached`); fields on the same mesh share one mesh instance.
+        """
+        if self._meshCache is not None and not hasattr(self._decoratee, 'getFieldCached'):
+            # application without getFieldCached
+            self._meshCache = None
+        if self._meshCache is None: return self._decoratee.getField(fieldID, time)
+        return self._meshCache.resolve(self._decoratee.getFieldCached(fieldID, time, self._meshCache.getDigests()))
+
+    def solveStep(self, tstep, stageID=0, runInBackground=False):
+        """
+        Solves the problem for given time step, see :func:`Application.solveStep`.
+
+        If runInBackground is True, the solution is started in background on the application side and a future is returned, which is completed (in a local thread, using separate proxy) once the remote solution is finished. Remote exceptions are set on the future, the result of remote solution is None. Solutions of several applications can be overlapped this way.
+
+        :return: if runInBackground is True, the future of the solution
+        :rtype: concurrent.futures.Future
+        """
+        if not runInBackground:
+            return self._decoratee.solveStep(tstep, stageID)
+        if not isinstance(self._decoratee, Pyro4.Proxy):
+            # local application
+            return self._decoratee.solveStep(tstep, stageID, runInBackground=True)
+        self._decoratee.startSolveStep(tstep, stageID)
+        # pyro proxy can not be used from several threads at once
+        app = copy.copy(self._decoratee)
+        if self._solveExecutor is None:
+            self._solveExecutor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        return self._solveExecutor.submit(self._waitRemote, app)
+
+    def _waitRemote(self, app):
+        """
+        Waits for the remote solution in short intervals, so that (multiplexed) application daemon is not blocked for the whole solution.
+        """
+        while not app.wait(self.waitInterval):
+            pass
+
     
     @Pyro4.oneway # in case call returns much later than daemon.shutdown
     def terminate(self):
@@ -322,6 +457,10 @@ class RemoteApplication (object):
         if self._decoratee:
             self._decoratee.terminate()
             self._decoratee = None
+
+        if self._solveExecutor is not None:
+            self._solveExecutor.shutdown(wait=False)
+            self._solveExecutor = None
         
         if (self._jobMan and self._jobID):
             log.info ("RemoteApplication: Terminating jobManager job %s on %s"%(self._jobID, self._jobMan))
@@ -39,6 +39,27 @@ debug = 0
 #in element tolerance
 tolerance = 0.001
 
+def _detBatch(m):
+    """
+    Determinants of (n,k,k) array of matrices; 2x2 and 3x3 ones are expanded explicitly, which is much faster than numpy.linalg.det for many small matrices.
+    """
+    if m.shape[-1]==2:
+        return m[:,0,0]*m[:,1,1]-m[:,0,1]*m[:,1,0]
+    if m.shape[-1]==3:
+        return (m[:,0,0]*(m[:,1,1]*m[:,2,2]-m[:,1,2]*m[:,2,1])-
+                m[:,0,1]*(m[:,1,0]*m[:,2,2]-m[:,1,2]*m[:,2,0])+
+                m[:,0,2]*(m[:,1,0]*m[:,2,1]-m[:,1,1]*m[:,2,0]))
+    return np.linalg.det(m)
+
+def _invertBatch(m):
+    """
+    Invert (n,k,k) array of matrices; inverses of singular matrices are set to nan.
+    """
+    ret=np.full(m.shape,np.nan)
+    regular=np.fabs(np.linalg.det(m))>0.
+    ret[regular]=np.linalg.inv(m[regular])
+    return ret
+
 @Pyro4.expose
 class Cell(object):
     """
@@ -187,6 +208,95 @@ class Cell(object):
         """
         #raise APIError.APIError("getTransformationJacobian not implemented")
 
+    @classmethod
+    def glob2locBatch(cls, vertexCoords, points):
+        """
+        Vectorized counterpart of glob2loc: converts many points, each in its own cell of the receiver's type, in one pass.
+
+        :param numpy.array vertexCoords: (n,nv,3) array with vertex coordinates of n cells
+        :param numpy.array points: (n,3) array of global coordinates; i-th point is converted in i-th cell
+        :return: tuple (lc,inside) of (n,nlc) array of local coordinates and (n,) boolean array, True where the point lies inside the cell
+        :rtype: (numpy.array, numpy.array)
+        :except: NotImplementedError if the cell type has no vectorized implementation
+        """
+        raise NotImplementedError("glob2locBatch not implemented for %s"%cls.__name__)
+
+    @classmethod
+    def evalNBatch(cls, lc):
+        """
+        Vectorized counterpart of _evalN: evaluates shape functions at many points given in local coordinates.
+
+        :param numpy.array lc: (n,nlc) array of local coordinates, as returned by :func:`glob2locBatch`
+        :return: (n,nv) array of shape function values, ordered as cell vertices
+        :rtype: numpy.array
+        :except: NotImplementedError if the cell type has no vectorized implementation
+        """
+        raise NotImplementedError("evalNBatch not implemented for %s"%cls.__name__)
+
+    @classmethod
+    def evalDNBatch(cls, lc):
+        """
+        Evaluates derivatives of shape functions with respect to (independent) local coordinates at many points.
+
+        :param numpy.array lc: (n,nlc) array of local coordinates
+        :return: (n,nv,dim) array of shape function derivatives, dim being the cell dimension
+        :rtype: numpy.array
+        :except: NotImplementedError if the cell type has no vectorized implementation
+        """
+        raise NotImplementedError("evalDNBatch not implemented for %s"%cls.__name__)
+
+    @classmethod
+    def evalJacobianBatch(cls, vertexCoords, lc):
+        """
+        Vectorized counterpart of getTransformationJacobian: returns determinants of jacobian of the geometry transformation of many cells, each at its own point, using :func:`evalDNBatch`. 2D cells use x and y coordinates only.
+
+        :param numpy.array vertexCoords: (n,nv,3) array with vertex coordinates of n cells
+        :param numpy.array lc: (n,nlc) array of local coordinates, or (nlc,) array of the same local coordinates for all cells
+        :return: (n,) array of jacobians
+        :rtype: numpy.array
+        """
+        dn = cls.evalDNBatch(np.atleast_2d(lc))
+        dim = dn.shape[2]
+        return _detBatch(np.matmul(np.swapaxes(vertexCoords[:,:dn.shape[1],:dim], 1, 2), dn))
+
+    @classmethod
+    def evalVolumeBatch(cls, vertexCoords):
+        """
+        Computes volumes (areas of 2D cells) of many cells of the receiver's type at once.
+
+        :param numpy.array vertexCoords: (n,nv,3) array with vertex coordinates of n cells
+        :return: (n,) array of cell volumes
+        :rtype: numpy.array
+        :except: NotImplementedError if the cell type has no vectorized implementation
+        """
+        raise NotImplementedError("evalVolumeBatch not implemented for %s"%cls.__name__)
+
+    @classmethod
+    def affineMapBatch(cls, vertexCoords):
+        """
+        Computes inverse geometry maps of cells with affine geometry (linear simplices), so that local coordinates of a point are obtained by a single matrix product, see :func:`glob2locAffineBatch`.
+
+        :param numpy.array vertexCoords: (n,nv,3) array with vertex coordinates of n cells
+        :return: (n,nlc,4) array; local coordinates of point x are maps[:,:,:3].dot(x)+maps[:,:,3]. Maps of degenerate cells are nan.
+        :rtype: numpy.array
+        :except: NotImplementedError if the cell type does not have affine geometry
+        """
+        raise NotImplementedError("affineMapBatch not implemented for %s"%cls.__name__)
+
+    @classmethod
+    def glob2locAffineBatch(cls, maps, points):
+        """
+        Counterpart of :func:`glob2locBatch` using precomputed maps from :func:`affineMapBatch` (barycentric local coordinates).
+
+        :param numpy.array maps: (n,nlc,4) array of inverse maps
+        :param numpy.array points: (n,3) array of global coordinates; i-th point is converted in i-th cell
+        :return: tuple (lc,inside), see :func:`glob2locBatch`
+        :rtype: (numpy.array, numpy.array)
+        """
+        lc = np.einsum('nij,nj->ni', maps[:,:,:3], points) + maps[:,:,3]
+        inside = np.all((lc >= -tolerance) & (lc <= 1.0+tolerance), axis=1)
+        return lc, inside
+
 
 ##############################################################
 # Implementation of individual cells follows
@@ -319,6 +429,65 @@ class Triangle_2d_lin(Cell):
         """
         return (lc[0], lc[1], 1.-lc[0]-lc[1])
 
+    @classmethod
+    def glob2locBatch(cls, vertexCoords, points):
+        """
+        See :func:`Cell.glob2locBatch`; local coordinates are area coordinates, as in :func:`glob2loc`.
+        """
+        x1 = vertexCoords[:,0,0]; y1 = vertexCoords[:,0,1]
+        x2 = vertexCoords[:,1,0]; y2 = vertexCoords[:,1,1]
+        x3 = vertexCoords[:,2,0]; y3 = vertexCoords[:,2,1]
+        xp = points[:,0]; yp = points[:,1]
+
+        area = 0.5 * ( x2 * y3 + x1 * y2 + y1 * x3 - x2 * y1 - x3 * y2 - x1 * y3 )
+
+        # degenerate cells give inf/nan, which never pass the inside test
+        with np.errstate(divide='ignore', invalid='ignore'):
+            l1 = ( ( x2 * y3 - x3 * y2 ) + ( y2 - y3 ) * xp + ( x3 - x2 ) * yp ) / 2. / area
+            l2 = ( ( x3 * y1 - x1 * y3 ) + ( y3 - y1 ) * xp + ( x1 - x3 ) * yp ) / 2. / area
+            l3 = ( ( x1 * y2 - x2 * y1 ) + ( y1 - y2 ) * xp + ( x2 - x1 ) * yp ) / 2. / area
+
+        lc = np.column_stack((l1, l2, l3))
+        inside = np.all((lc >= -tolerance) & (lc <= 1.0+tolerance), axis=1)
+        return lc, inside
+
+    @classmethod
+    def evalNBatch(cls, lc):
+        """
+        See :func:`Cell.evalNBatch`
+        """
+        return np.column_stack((lc[:,0], lc[:,1], 1.-lc[:,0]-lc[:,1]))
+
+    @classmethod
+    def evalDNBatch(cls, lc):
+        """
+        See :func:`Cell.evalDNBatch`
+        """
+        return np.broadcast_to(np.array([[1.,0.],[0.,1.],[-1.,-1.]]), (lc.shape[0],3,2))
+
+    @classmethod
+    def evalVolumeBatch(cls, vertexCoords):
+        """
+        See :func:`Cell.evalVolumeBatch`; returns cell areas.
+        """
+        d1 = vertexCoords[:,1,:2] - vertexCoords[:,0,:2]
+        d2 = vertexCoords[:,2,:2] - vertexCoords[:,0,:2]
+        return 0.5 * np.fabs(d1[:,0] * d2[:,1] - d1[:,1] * d2[:,0])
+
+    @classmethod
+    def affineMapBatch(cls, vertexCoords):
+        """
+        See :func:`Cell.affineMapBatch`; local coordinates are area coordinates.
+        """
+        n = vertexCoords.shape[0]
+        t = np.ones((n,3,3))
+        t[:,:2,:] = np.swapaxes(vertexCoords[:,:3,:2], 1, 2)
+        inv = _invertBatch(t)
+        maps = np.zeros((n,3,4))
+        maps[:,:,:2] = inv[:,:,:2]
+        maps[:,:,3] = inv[:,:,2]
+        return maps
+
 @Pyro4.expose
 class Triangle_2d_quad(Cell):
     """
@@ -435,6 +604,9 @@ class Triangle_2d_quad(Cell):
         :rtype: bool
         """
         ac = self.glob2loc(point)
+        if ac is None:
+            # no convergence
+            return False
 
         for li in ac:
             if li < -tolerance or li > 1.0+tolerance:
@@ -552,6 +724,91 @@ class Triangle_2d_quad(Cell):
         return math.fabs( ( 4 * ( -( x4 * y1 ) + x6 * y1 + x4 * y2 - x5 * y2 + x5 * y3 - x6 * y3 ) + x2 * ( y1 - y3 - 4 * y4 + 4 * y5 ) +
                             x1 * ( -y2 + y3 + 4 * y4 - 4 * y6 ) + x3 * ( -y1 + y2 - 4 * y5 + 4 * y6 ) ) / 6 );
 
+    @classmethod
+    def glob2locBatch(cls, vertexCoords, points):
+        """
+        See :func:`Cell.glob2locBatch`; local coordinates are area coordinates, as in :func:`glob2loc`. Newton-Raphson iterations run simultaneously for the whole batch; points for which they do not converge get nan coordinates and are reported as outside.
+        """
+        x = vertexCoords[:,:6,:2]
+        xp = points[:,:2]
+        convergence_limit = 1.e-6 * np.sqrt(cls.evalVolumeBatch(vertexCoords))
+
+        n = points.shape[0]
+        lc = np.zeros((n,2))
+        converged = np.zeros(n, dtype=bool)
+        active = np.arange(n)
+        for nite in range(10):
+            if active.size == 0: break
+            xa = x[active]
+            res = xp[active] - np.einsum('nk,nkd->nd', cls.evalNBatch(lc[active]), xa)
+            # check for convergence
+            conv = np.sqrt(np.sum(res*res, axis=1)) < convergence_limit[active]
+            converged[active[conv]] = True
+            keep = ~conv
+            active, xa, res = active[keep], xa[keep], res[keep]
+            # jac[n,d,j]=d x_d / d l_j; singular jacobians fail the whole cell
+            jac = np.einsum('nkd,nkj->ndj', xa, cls.evalDNBatch(lc[active]))
+            regular = np.fabs(_detBatch(jac)) > 0.
+            active, jac, res = active[regular], jac[regular], res[regular]
+            lc[active] += np.linalg.solve(jac, res[:,:,None])[:,:,0]
+
+        lc = np.column_stack((lc[:,0], lc[:,1], 1.0 - lc[:,0] - lc[:,1]))
+        lc[~converged] = np.nan
+        inside = converged & np.all((lc >= -tolerance) & (lc <= 1.0+tolerance), axis=1)
+        return lc, inside
+
+    @classmethod
+    def evalNBatch(cls, lc):
+        """
+        See :func:`Cell.evalNBatch`
+        """
+        l1 = lc[:,0]
+        l2 = lc[:,1]
+        l3 = 1.0 - l1 - l2
+        return np.column_stack((( 2. * l1 - 1. ) * l1,
+                                ( 2. * l2 - 1. ) * l2,
+                                ( 2. * l3 - 1. ) * l3,
+                                4. * l1 * l2,
+                                4. * l2 * l3,
+                                4. * l3 * l1))
+
+    @classmethod
+    def evalDNBatch(cls, lc):
+        """
+        See :func:`Cell.evalDNBatch`; vectorized counterpart of :func:`_evalDerivatives`.
+        """
+        l1 = lc[:,0]
+        l2 = lc[:,1]
+        l3 = 1.0 - l1 - l2
+        dn = np.zeros((lc.shape[0],6,2))
+        dn[:,0,0] =  4.0 * l1 - 1.0
+        dn[:,2,0] = -1.0 * ( 4.0 * l3 - 1.0 )
+        dn[:,3,0] =  4.0 * l2
+        dn[:,4,0] = -4.0 * l2
+        dn[:,5,0] =  4.0 * l3 - 4.0 * l1
+
+        dn[:,1,1] =  4.0 * l2 - 1.0
+        dn[:,2,1] = -1.0 * ( 4.0 * l3 - 1.0 )
+        dn[:,3,1] =  4.0 * l1
+        dn[:,4,1] =  4.0 * l3 - 4.0 * l2
+        dn[:,5,1] = -4.0 * l1
+        return dn
+
+    @classmethod
+    def evalVolumeBatch(cls, vertexCoords):
+        """
+        See :func:`Cell.evalVolumeBatch`; returns cell areas, as :func:`_evalArea`.
+        """
+        x = vertexCoords
+        x1 = x[:,0,0]; y1 = x[:,0,1]
+        x2 = x[:,1,0]; y2 = x[:,1,1]
+        x3 = x[:,2,0]; y3 = x[:,2,1]
+        x4 = x[:,3,0]; y4 = x[:,3,1]
+        x5 = x[:,4,0]; y5 = x[:,4,1]
+        x6 = x[:,5,0]; y6 = x[:,5,1]
+        return np.fabs( ( 4 * ( -( x4 * y1 ) + x6 * y1 + x4 * y2 - x5 * y2 + x5 * y3 - x6 * y3 ) + x2 * ( y1 - y3 - 4 * y4 + 4 * y5 ) +
+                          x1 * ( -y2 + y3 + 4 * y4 - 4 * y6 ) + x3 * ( -y1 + y2 - 4 * y5 + 4 * y6 ) ) / 6 )
+
 
 @Pyro4.expose
 class Quad_2d_lin(Cell):
@@ -770,6 +1027,83 @@ class Quad_2d_lin(Cell):
 
         return j11*j22-j12*j21
 
+    @classmethod
+    def glob2locBatch(cls, vertexCoords, points):
+        """
+        See :func:`Cell.glob2locBatch`; local coordinates are (ksi,eta) in <-1,1>, obtained by the same closed-form solution as in :func:`glob2loc`. Points without real solution get nan coordinates and are reported as outside.
+        """
+        c1 = vertexCoords[:,0]; c2 = vertexCoords[:,1]; c3 = vertexCoords[:,2]; c4 = vertexCoords[:,3]
+        xp = points[:,0]; yp = points[:,1]
+
+        a1=c1[:,0]+c2[:,0]+c3[:,0]+c4[:,0]
+        a2=c1[:,0]-c2[:,0]-c3[:,0]+c4[:,0]
+        a3=c1[:,0]+c2[:,0]-c3[:,0]-c4[:,0]
+        a4=c1[:,0]-c2[:,0]+c3[:,0]-c4[:,0]
+
+        b1=c1[:,1]+c2[:,1]+c3[:,1]+c4[:,1]
+        b2=c1[:,1]-c2[:,1]-c3[:,1]+c4[:,1]
+        b3=c1[:,1]+c2[:,1]-c3[:,1]-c4[:,1]
+        b4=c1[:,1]-c2[:,1]+c3[:,1]-c4[:,1]
+
+        a = a2 * b4 - b2 * a4
+        b = a1 * b4 + a2 * b3 - a3 * b2 - b1 * a4 - b4 * 4.0 * xp + a4 * 4.0 * yp
+        c = a1 * b3 - a3 * b1 - 4.0 * xp * b3 + 4.0 * yp * a3
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # roots of a*ksi^2+b*ksi+c=0, as in Util.quadratic_real
+            linear = np.fabs(a) <= 1.e-10
+            t = 0.5 * b / a
+            r = t * t - c / a
+            sq = np.sqrt(np.where(r < 0., 0., r))
+            ksi1 = np.where(linear, -c / b, sq - t)
+            ksi2 = np.where(linear, ksi1, -sq - t)
+            real = np.where(linear, np.fabs(b) > 1.e-10, r >= 0.)
+
+            def eta(ksi):
+                denom = b3 + ksi * b4
+                return np.where(np.fabs(denom) <= 1.e-10, (4.0 * xp - a1 - ksi * a2) / (a3 + ksi * a4), (4.0 * yp - b1 - ksi * b2) / denom)
+            lc1 = np.column_stack((ksi1, eta(ksi1)))
+            lc2 = np.column_stack((ksi2, eta(ksi2)))
+
+        # take the root closer to the parent element
+        diff1 = np.sum((lc1 - np.clip(lc1, -1., 1.))**2, axis=1)
+        diff2 = np.sum((lc2 - np.clip(lc2, -1., 1.))**2, axis=1)
+        lc = np.where(((diff1 > diff2) & ~linear)[:,None], lc2, lc1)
+        lc[~real] = np.nan
+        inside = np.all((lc >= -1.0-tolerance) & (lc <= 1.0+tolerance), axis=1)
+        return lc, inside
+
+    @classmethod
+    def evalNBatch(cls, lc):
+        """
+        See :func:`Cell.evalNBatch`
+        """
+        return np.column_stack((0.25 * ( 1. + lc[:,0] ) * ( 1. + lc[:,1] ),
+                                0.25 * ( 1. - lc[:,0] ) * ( 1. + lc[:,1] ),
+                                0.25 * ( 1. - lc[:,0] ) * ( 1. - lc[:,1] ),
+                                0.25 * ( 1. + lc[:,0] ) * ( 1. - lc[:,1] )))
+
+    @classmethod
+    def evalDNBatch(cls, lc):
+        """
+        See :func:`Cell.evalDNBatch`
+        """
+        ksi = lc[:,0]
+        eta = lc[:,1]
+        dn = np.empty((lc.shape[0],4,2))
+        dn[:,:,0] = np.column_stack((0.25 * ( 1. + eta ), -0.25 * ( 1. + eta ), -0.25 * ( 1. - eta ), 0.25 * ( 1. - eta )))
+        dn[:,:,1] = np.column_stack((0.25 * ( 1. + ksi ),  0.25 * ( 1. - ksi ), -0.25 * ( 1. - ksi ),-0.25 * ( 1. + ksi )))
+        return dn
+
+    @classmethod
+    def evalVolumeBatch(cls, vertexCoords):
+        """
+        See :func:`Cell.evalVolumeBatch`; returns cell areas.
+        """
+        x = vertexCoords[:,:4,0]
+        y = vertexCoords[:,:4,1]
+        return 0.5 * np.fabs(np.sum(x * np.roll(y, -1, axis=1) - np.roll(x, -1, axis=1) * y, axis=1))
+
 
 @Pyro4.expose
 class Tetrahedron_3d_lin(Cell):
@@ -905,6 +1239,71 @@ class Tetrahedron_3d_lin(Cell):
                  ( c2[0] - c1[0] ) * ( c3[1] - c1[1] ) * ( c4[2] - c1[2] ) -
                  ( c3[0] - c1[0] ) * ( c2[1] - c1[1] ) * ( c4[2] - c1[2] ) )
 
+    @classmethod
+    def glob2locBatch(cls, vertexCoords, points):
+        """
+        See :func:`Cell.glob2locBatch`; local coordinates are volume coordinates, as in :func:`glob2loc`.
+        """
+        x1 = vertexCoords[:,0,0]; y1 = vertexCoords[:,0,1]; z1 = vertexCoords[:,0,2]
+        x2 = vertexCoords[:,1,0]; y2 = vertexCoords[:,1,1]; z2 = vertexCoords[:,1,2]
+        x3 = vertexCoords[:,2,0]; y3 = vertexCoords[:,2,1]; z3 = vertexCoords[:,2,2]
+        x4 = vertexCoords[:,3,0]; y4 = vertexCoords[:,3,1]; z4 = vertexCoords[:,3,2]
+
+        xp = points[:,0]; yp = points[:,1]; zp = points[:,2]
+
+        volume = ( ( x4 - x1 ) * ( y2 - y1 ) * ( z3 - z1 ) - ( x4 - x1 ) * ( y3 - y1 ) * ( z2 - z1 ) +
+                   ( x3 - x1 ) * ( y4 - y1 ) * ( z2 - z1 ) - ( x2 - x1 ) * ( y4 - y1 ) * ( z3 - z1 ) +
+                   ( x2 - x1 ) * ( y3 - y1 ) * ( z4 - z1 ) - ( x3 - x1 ) * ( y2 - y1 ) * ( z4 - z1 ) ) / 6.
+
+        # degenerate cells give inf/nan, which never pass the inside test
+        with np.errstate(divide='ignore', invalid='ignore'):
+            l1 = ( ( x3 - x2 ) * ( yp - y2 ) * ( z4 - z2 ) - ( xp - x2 ) * ( y3 - y2 ) * ( z4 - z2 ) +
+                   ( x4 - x2 ) * ( y3 - y2 ) * ( zp - z2 ) - ( x4 - x2 ) * ( yp - y2 ) * ( z3 - z2 ) +
+                   ( xp - x2 ) * ( y4 - y2 ) * ( z3 - z2 ) - ( x3 - x2 ) * ( y4 - y2 ) * ( zp - z2 ) ) / 6. / volume
+
+            l2 = ( ( x4 - x1 ) * ( yp - y1 ) * ( z3 - z1 ) - ( xp - x1 ) * ( y4 - y1 ) * ( z3 - z1 ) +
+                   ( x3 - x1 ) * ( y4 - y1 ) * ( zp - z1 ) - ( x3 - x1 ) * ( yp - y1 ) * ( z4 - z1 ) +
+                   ( xp - x1 ) * ( y3 - y1 ) * ( z4 - z1 ) - ( x4 - x1 ) * ( y3 - y1 ) * ( zp - z1 ) ) / 6. / volume
+
+            l3 = ( ( x2 - x1 ) * ( yp - y1 ) * ( z4 - z1 ) - ( xp - x1 ) * ( y2 - y1 ) * ( z4 - z1 ) +
+                   ( x4 - x1 ) * ( y2 - y1 ) * ( zp - z1 ) - ( x4 - x1 ) * ( yp - y1 ) * ( z2 - z1 ) +
+                   ( xp - x1 ) * ( y4 - y1 ) * ( z2 - z1 ) - ( x2 - x1 ) * ( y4 - y1 ) * ( zp - z1 ) ) / 6. / volume
+
+        lc = np.column_stack((l1, l2, l3, 1.0 - l1 - l2 - l3))
+        inside = np.all((lc >= -tolerance) & (lc <= 1.0+tolerance), axis=1)
+        return lc, inside
+
+    @classmethod
+    def evalNBatch(cls, lc):
+        """
+        See :func:`Cell.evalNBatch`
+        """
+        return np.column_stack((lc[:,0], lc[:,1], lc[:,2], 1.-lc[:,0]-lc[:,1]-lc[:,2]))
+
+    @classmethod
+    def evalDNBatch(cls, lc):
+        """
+        See :func:`Cell.evalDNBatch`
+        """
+        return np.broadcast_to(np.array([[1.,0.,0.],[0.,1.,0.],[0.,0.,1.],[-1.,-1.,-1.]]), (lc.shape[0],4,3))
+
+    @classmethod
+    def evalVolumeBatch(cls, vertexCoords):
+        """
+        See :func:`Cell.evalVolumeBatch`
+        """
+        d = vertexCoords[:,1:4,:3] - vertexCoords[:,:1,:3]
+        return np.fabs(_detBatch(d)) / 6.
+
+    @classmethod
+    def affineMapBatch(cls, vertexCoords):
+        """
+        See :func:`Cell.affineMapBatch`; local coordinates are volume coordinates.
+        """
+        t = np.ones((vertexCoords.shape[0],4,4))
+        t[:,:3,:] = np.swapaxes(vertexCoords[:,:4,:3], 1, 2)
+        return _invertBatch(t)
+
 
 import numpy
 import numpy.linalg
@@ -1159,3 +1558,116 @@ class Brick_3d_lin(Cell):
             j33 = j33+dnw[i]*z
 
         return (j11*j22*j33+j21*j32*j13+j31*j12*j23-j13*j22*j31-j23*j32*j11-j33*j12*j21)
+
+    # signs combining vertex coordinates into coefficients a1..a8 (b1..b8, c1..c8) of glob2loc
+    _coeffSigns = np.array([[ 1,  1,  1,  1,  1,  1,  1,  1],
+                            [-1, -1,  1,  1, -1, -1,  1,  1],
+                            [-1,  1,  1, -1, -1,  1,  1, -1],
+                            [ 1,  1,  1,  1, -1, -1, -1, -1],
+                            [ 1, -1,  1, -1,  1, -1,  1, -1],
+                            [-1, -1,  1,  1,  1,  1, -1, -1],
+                            [-1,  1,  1, -1,  1, -1, -1,  1],
+                            [ 1, -1,  1, -1, -1,  1, -1,  1]], dtype=np.float64)
+
+    @classmethod
+    def glob2locBatch(cls, vertexCoords, points):
+        """
+        See :func:`Cell.glob2locBatch`; local coordinates are (u,v,w) in <-1,1>, obtained by Newton-Raphson iterations as in :func:`glob2loc`, running simultaneously for the whole batch. The convergence limit is relative to the magnitude of vertex coordinates. Points for which iterations do not converge get nan coordinates and are reported as outside.
+        """
+        # k[:,i,:] holds (a_i+1,b_i+1,c_i+1)
+        k = np.einsum('ij,njd->nid', cls._coeffSigns, vertexCoords[:,:8,:3])
+        p8 = 8.0 * points[:,:3]
+        scale = np.maximum(np.fabs(vertexCoords[:,:8,:3]).max(axis=(1,2)), 1.)
+        limit = (1.e-10 * scale)**2
+
+        n = points.shape[0]
+        lc = np.zeros((n,3))
+        converged = np.zeros(n, dtype=bool)
+        active = np.arange(n)
+        for nite in range(10):
+            if active.size == 0: break
+            ka = k[active]
+            u = lc[active,0][:,None]; v = lc[active,1][:,None]; w = lc[active,2][:,None]
+            # compute the residual
+            r = (ka[:,0] + u * ka[:,1] + v * ka[:,2] + w * ka[:,3] + u * v * ka[:,4] + u * w * ka[:,5] + v * w * ka[:,6] + u * v * w * ka[:,7] - p8[active])
+            conv = np.sum(r*r, axis=1) < limit[active]
+            converged[active[conv]] = True
+            keep = ~conv
+            active, ka, r = active[keep], ka[keep], r[keep]
+            u, v, w = u[keep], v[keep], w[keep]
+            # jacobian, columns are derivatives by u,v,w
+            jac = np.stack((ka[:,1] + v * ka[:,4] + w * ka[:,5] + v * w * ka[:,7],
+                            ka[:,2] + u * ka[:,4] + w * ka[:,6] + u * w * ka[:,7],
+                            ka[:,3] + u * ka[:,5] + v * ka[:,6] + u * v * ka[:,7]), axis=2)
+            regular = np.fabs(_detBatch(jac)) > 0.
+            active, jac, r = active[regular], jac[regular], r[regular]
+            lc[active] -= np.linalg.solve(jac, r[:,:,None])[:,:,0]
+
+        lc[~converged] = np.nan
+        inside = converged & np.all((lc >= -1.0-tolerance) & (lc <= 1.0+tolerance), axis=1)
+        return lc, inside
+
+    @classmethod
+    def evalNBatch(cls, lc):
+        """
+        See :func:`Cell.evalNBatch`
+        """
+        u = lc[:,0]; v = lc[:,1]; w = lc[:,2]
+        return np.column_stack((0.125 * ( 1. - u ) * ( 1. - v ) * ( 1. + w ),
+                                0.125 * ( 1. - u ) * ( 1. + v ) * ( 1. + w ),
+                                0.125 * ( 1. + u ) * ( 1. + v ) * ( 1. + w ),
+                                0.125 * ( 1. + u ) * ( 1. - v ) * ( 1. + w ),
+                                0.125 * ( 1. - u ) * ( 1. - v ) * ( 1. - w ),
+                                0.125 * ( 1. - u ) * ( 1. + v ) * ( 1. - w ),
+                                0.125 * ( 1. + u ) * ( 1. + v ) * ( 1. - w ),
+                                0.125 * ( 1. + u ) * ( 1. - v ) * ( 1. - w )))
+
+    @classmethod
+    def evalDNBatch(cls, lc):
+        """
+        See :func:`Cell.evalDNBatch`
+        """
+        u = lc[:,0]; v = lc[:,1]; w = lc[:,2]
+        dn = np.empty((lc.shape[0],8,3))
+        dn[:,:,0] = np.column_stack((-0.125 * ( 1. - v ) * ( 1. + w ),
+                                     -0.125 * ( 1. + v ) * ( 1. + w ),
+                                      0.125 * ( 1. + v ) * ( 1. + w ),
+                                      0.125 * ( 1. - v ) * ( 1. + w ),
+                                     -0.125 * ( 1. - v ) * ( 1. - w ),
+                                     -0.125 * ( 1. + v ) * ( 1. - w ),
+                                      0.125 * ( 1. + v ) * ( 1. - w ),
+                                      0.125 * ( 1. - v ) * ( 1. - w )))
+        dn[:,:,1] = np.column_stack((-0.125 * ( 1. - u ) * ( 1. + w ),
+                                      0.125 * ( 1. - u ) * ( 1. + w ),
+                                      0.125 * ( 1. + u ) * ( 1. + w ),
+                                     -0.125 * ( 1. + u ) * ( 1. + w ),
+                                     -0.125 * ( 1. - u ) * ( 1. - w ),
+                                      0.125 * ( 1. - u ) * ( 1. - w ),
+                                      0.125 * ( 1. + u ) * ( 1. - w ),
+                                     -0.125 * ( 1. + u ) * ( 1. - w )))
+        dn[:,:,2] = np.column_stack(( 0.125 * ( 1. - u ) * ( 1. - v ),
+                                      0.125 * ( 1. - u ) * ( 1. + v ),
+                                      0.125 * ( 1. + u ) * ( 1. + v ),
+                                      0.125 * ( 1. + u ) * ( 1. - v ),
+                                     -0.125 * ( 1. - u ) * ( 1. - v ),
+                                     -0.125 * ( 1. - u ) * ( 1. + v ),
+                                     -0.125 * ( 1. + u ) * ( 1. + v ),
+                                     -0.125 * ( 1. + u ) * ( 1. - v )))
+        return dn
+
+    @classmethod
+    def evalVolumeBatch(cls, vertexCoords):
+        """
+        See :func:`Cell.evalVolumeBatch`; the jacobian is integrated by 2x2x2 Gauss rule, which is exact for trilinear geometry.
+        """
+        k = np.einsum('ij,njd->nid', cls._coeffSigns, vertexCoords[:,:8,:3]) / 8.
+        g = 1. / math.sqrt(3.)
+        volume = np.zeros(vertexCoords.shape[0])
+        for u in (-g, g):
+            for v in (-g, g):
+                for w in (-g, g):
+                    jac = np.stack((k[:,1] + v * k[:,4] + w * k[:,5] + v * w * k[:,7],
+                                    k[:,2] + u * k[:,4] + w * k[:,6] + u * w * k[:,7],
+                                    k[:,3] + u * k[:,5] + v * k[:,6] + u * v * k[:,7]), axis=2)
+                    volume += _detBatch(jac)
+        return np.fabs(volume)
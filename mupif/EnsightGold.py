@@ -0,0 +1,327 @@
+# 
+#           MuPIF: Multi-Physics Integration Framework 
+#               Copyright (C) 2010-2015 Borek Patzak
+# 
+#    Czech Technical University, Faculty of Civil Engineering,
+#  Department of Structural Mechanics, 166 29 Prague, Czech Republic
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, 
+# Boston, MA  02110-1301  USA
+#
+"""
+Reading and writing of Ensight Gold binary (``C Binary``) geometry and variable files, and writing of transient ``.case`` files referring to them.
+
+All data are read and written as whole blocks (numpy.fromfile and numpy.ndarray.tofile). Only unstructured parts are supported. Meshes are created in the same way as by :func:`EnsightReader2.readEnsightGeo`; each part has its own vertices (vertices shared by parts are duplicated). Files are written in little-endian byte order; both byte orders are read.
+"""
+from __future__ import print_function
+from __future__ import division
+from builtins import range, object
+
+import os
+import collections
+import numpy
+
+from . import CellGeometryType
+from . import Field
+from . import ValueType
+from . import Mesh
+from .fieldID import FieldID
+from .Physics import PhysicalQuantities
+from .EnsightReader2 import _makeMesh
+
+# number of nodes of all Ensight Gold element types (nsided and nfaced are not supported)
+_goldElementSizes = {
+    'point': 1, 'bar2': 2, 'bar3': 3, 'tria3': 3, 'tria6': 6, 'quad4': 4, 'quad8': 8,
+    'tetra4': 4, 'tetra10': 10, 'pyramid5': 5, 'pyramid13': 13, 'penta6': 6, 'penta15': 15, 'hexa8': 8, 'hexa20': 20,
+}
+_goldElementSizes.update([('g_'+t, n) for t, n in list(_goldElementSizes.items())])
+# element types corresponding to cell geometry types
+_goldCellTypes = {
+    'tria3': CellGeometryType.CGT_TRIANGLE_1,
+    'tria6': CellGeometryType.CGT_TRIANGLE_2,
+    'quad4': CellGeometryType.CGT_QUAD,
+    'tetra4': CellGeometryType.CGT_TETRA,
+    'hexa8': CellGeometryType.CGT_HEXAHEDRON,
+}
+# variable types by number of components
+_goldVariableTypes = {1: 'scalar', 3: 'vector', 6: 'tensor symm', 9: 'tensor asym'}
+
+
+def _readString(f):
+    """
+    Read 80-character string record; return None at the end of file.
+    """
+    s = f.read(80)
+    if not s: return None
+    if len(s) < 80: raise IOError('Unexpected end of Ensight file %s'%f.name)
+    return s.split(b'\0', 1)[0].decode('ascii', 'replace').strip()
+
+def _readArray(f, dtype, count):
+    """
+    Read *count* items of *dtype* from *f*.
+    """
+    ret = numpy.fromfile(f, dtype=dtype, count=count)
+    if ret.shape[0] != count: raise IOError('Unexpected end of Ensight file %s'%f.name)
+    return ret
+
+def _peekPart(f):
+    """
+    Return True if the next record is a part record or the end of file, without consuming it.
+    """
+    pos = f.tell()
+    s = _readString(f)
+    f.seek(pos)
+    return s is None or s.startswith('part')
+
+def _readPartNumber(f, order):
+    """
+    Read part number; if *order* (byte order, ``<`` or ``>``) is None, it is detected from the number, which must be positive and small.
+
+    :return: (part number, byte order)
+    """
+    raw = f.read(4)
+    if order is None:
+        order = '<' if 0 < numpy.frombuffer(raw, dtype='<i4')[0] < 2**24 else '>'
+    return int(numpy.frombuffer(raw, dtype=order+'i4')[0]), order
+
+def _writeString(f, s):
+    """
+    Write 80-character string record.
+    """
+    f.write(s.encode('ascii')[:80].ljust(80, b' '))
+
+
+def readEnsightGoldGeo(name, partFilter, partRec, compact=False):
+    """
+    Reads Ensight Gold binary geometry file and returns corresponding Mesh object instance. Supports only unstructured parts.
+
+    Parts not in *partFilter* are skipped by seeking past them.
+
+    :param str name: Path to Ensight geometry file (\*.geo)
+    :param tuple partFilter: Only parts with id contained in partFilter will be imported
+    :param list partRec: Output argument; a dict is appended for each part, containing part number (``part``), number of nodes (``coordinates``) and number of elements of each element type. Needed by readEnsightGoldField
+    :param bool compact: Return :obj:`Mesh.CompactUnstructuredMesh` instead of :obj:`Mesh.UnstructuredMesh`
+    :return: mesh
+    :rtype: Mesh
+    """
+    coords, labels, cellTypes, cellVertices = [], [], [], []
+    nv = 0 # number of vertices read so far
+    with open(name, 'rb') as f:
+        fmt = _readString(f)
+        if fmt is None or fmt.lower() != 'c binary': raise ValueError('%s: only Ensight Gold C Binary files are supported (not "%s")'%(name, fmt))
+        desc1, desc2 = _readString(f), _readString(f)
+        nodeId, elemId = _readString(f).split()[-1], _readString(f).split()[-1]
+        order = None
+        while True:
+            kw = _readString(f)
+            if kw is None: break
+            if kw.startswith('extents'):
+                f.seek(6*4, os.SEEK_CUR)
+                continue
+            if not kw.startswith('part'): raise ValueError('%s: part record expected (not "%s")'%(name, kw))
+            partnum, order = _readPartNumber(f, order)
+            read = partnum in partFilter
+            rec = {'part': partnum}
+            partRec.append(rec)
+            partdesc = _readString(f)
+            kw = _readString(f)
+            if kw != 'coordinates': raise NotImplementedError('%s: part %d is not unstructured ("%s")'%(name, partnum, kw))
+            nn = int(_readArray(f, order+'i4', 1)[0])
+            rec['coordinates'] = nn
+            if read:
+                ids = _readArray(f, order+'i4', nn) if nodeId in ('given', 'ignore') else None
+                coords.append(_readArray(f, order+'f4', 3*nn).reshape(3, nn).T.astype(numpy.float64))
+                labels.append(ids.astype(numpy.int64) if nodeId == 'given' else numpy.arange(nv, nv+nn))
+            else:
+                f.seek((4 if nodeId in ('given', 'ignore') else 0)*nn+12*nn, os.SEEK_CUR)
+            # element blocks until the next part
+            while not _peekPart(f):
+                eltype = _readString(f)
+                if eltype not in _goldElementSizes: raise NotImplementedError('%s: element type "%s" not supported'%(name, eltype))
+                ne = int(_readArray(f, order+'i4', 1)[0])
+                rec[eltype] = ne
+                npe = _goldElementSizes[eltype]
+                if elemId in ('given', 'ignore'): f.seek(4*ne, os.SEEK_CUR)
+                if read and eltype in _goldCellTypes:
+                    cellTypes.append(numpy.full(ne, _goldCellTypes[eltype], dtype=numpy.int64))
+                    cellVertices.append(_readArray(f, order+'i4', ne*npe).reshape(ne, npe).astype(numpy.int64)+(nv-1))
+                else:
+                    if read: print("Element type %s not suported" % (eltype))
+                    f.seek(4*ne*npe, os.SEEK_CUR)
+            if read: nv += nn
+    empty = [numpy.zeros((0, 3))]
+    return _makeMesh(numpy.concatenate(coords+empty), numpy.concatenate(labels+[numpy.zeros(0, dtype=numpy.int64)]), cellTypes, cellVertices, compact)
+
+
+def readEnsightGoldField(name, parts, partRec, type, fieldID, mesh, units, time):
+    """
+    Reads either per-node or per-element Ensight Gold binary variable file and returns corresponding Field representation.
+
+    :param str name: Input file name with variable data
+    :param tuple parts: Only parts with id contained in parts will be imported; must be the same as when reading the geometry
+    :param list partRec: Information about parts, as returned by :func:`readEnsightGoldGeo`
+    :param int type: Number of components: 1 scalar, 3 vector, 6 symmetric tensor (11,22,33,12,13,23), 9 tensor (row by row)
+    :param FieldID fieldID: Field type (displacement, strain, temperature ...)
+    :param Mesh mesh: Corresponding mesh
+    :param PhysicalUnit units: field units
+    :param PhysicalQuantity time: time
+    :return: new field
+    :rtype: Field
+    """
+    if (type == 1):
+        ftype = ValueType.Scalar
+    elif (type == 3):
+        ftype = ValueType.Vector
+    else:
+        ftype = ValueType.Tensor
+    recs = dict((rec['part'], rec) for rec in partRec)
+    values = []
+    fieldType = Field.FieldType.FT_vertexBased
+    with open(name, 'rb') as f:
+        desc = _readString(f)
+        order = None
+        while True:
+            kw = _readString(f)
+            if kw is None: break
+            if not kw.startswith('part'): raise ValueError('%s: part record expected (not "%s")'%(name, kw))
+            partnum, order = _readPartNumber(f, order)
+            rec = recs[partnum]
+            while not _peekPart(f):
+                kw = _readString(f)
+                if kw == 'coordinates': n = rec['coordinates']
+                elif kw in rec:
+                    n = rec[kw]
+                    fieldType = Field.FieldType.FT_cellBased
+                else: raise NotImplementedError('%s: section "%s" of part %d not supported'%(name, kw, partnum))
+                if partnum in parts and (kw == 'coordinates' or kw in _goldCellTypes):
+                    # components are stored one after another
+                    values.append(_readArray(f, order+'f4', n*type).reshape(type, n).T)
+                else:
+                    f.seek(4*n*type, os.SEEK_CUR)
+    values = numpy.concatenate(values+[numpy.zeros((0, type), dtype=numpy.float32)]).astype(numpy.float64)
+    return Field.Field(mesh, fieldID, ftype, units, time, values, fieldType)
+
+
+class EnsightGoldWriter(object):
+    """
+    Writer of transient results in Ensight Gold binary format: the mesh is written once (``<base>.geo``), each field ID is a variable written at every step (``<base>_<variable>.<step>``), and the ``<base>.case`` index, rewritten after every step, refers to all of them.
+
+    All fields must be defined on the same mesh, and all steps must contain the same field IDs. Cells are grouped by their type in the geometry file, and values of cell-based fields are reordered accordingly.
+
+    .. automethod:: __init__
+    """
+    def __init__(self, caseFile, description='MuPIF output'):
+        """
+        :param str caseFile: case file name; names of other files are derived from it
+        :param str description: description written to the geometry file
+        """
+        self.caseFile = caseFile
+        self.baseName = os.path.splitext(caseFile)[0]
+        self.description = description
+        self.mesh = None
+        self.meshDigest = None
+        self.blocks = None # (element type, cell numbers) of cell blocks in the geometry file
+        self.variables = collections.OrderedDict() # variable name -> (variable type, fieldID)
+        self.times = []
+
+    def _variableFile(self, name, step=None):
+        ret = '%s_%s.'%(self.baseName, name)
+        return ret+('*****' if step is None else '%05d'%step)
+
+    def writeGeometry(self, mesh):
+        """
+        Write the geometry file. Called automatically with the mesh of the first field appended.
+
+        :param Mesh mesh: mesh to be written
+        """
+        mvc, (mct, mci) = mesh.getVertices(), mesh.getCells()
+        goldTypes = dict((cgt, t) for t, cgt in _goldCellTypes.items())
+        if numpy.setdiff1d(mct, list(goldTypes.keys())).size: raise ValueError('Cell geometry types %s cannot be written to Ensight'%numpy.setdiff1d(mct, list(goldTypes.keys())))
+        self.blocks = []
+        with open(self.baseName+'.geo', 'wb') as f:
+            for s in 'C Binary', self.description, 'mupif mesh', 'node id off', 'element id off', 'part': _writeString(f, s)
+            numpy.array([1], dtype='<i4').tofile(f)
+            _writeString(f, 'mesh')
+            _writeString(f, 'coordinates')
+            numpy.array([mvc.shape[0]], dtype='<i4').tofile(f)
+            numpy.ascontiguousarray(mvc.T, dtype='<f4').tofile(f)
+            for cgt, sel, nv in Mesh.Mesh._giveCellTypeGroups(mct, mci):
+                self.blocks.append((goldTypes[cgt], sel))
+                _writeString(f, goldTypes[cgt])
+                numpy.array([sel.shape[0]], dtype='<i4').tofile(f)
+                (mci[sel, :nv]+1).astype('<i4').tofile(f)
+        self.mesh = mesh
+        self.meshDigest = mesh.internalArraysDigest()
+
+    def _writeVariable(self, field, fileName):
+        """
+        Write values of the field to the variable file.
+        """
+        values = field._giveValueArray()
+        if values.shape[1] == 2: values = numpy.hstack((values, numpy.zeros((values.shape[0], 1)))) # 2D vectors
+        with open(fileName, 'wb') as f:
+            for s in FieldID(field.getFieldID()).name, 'part': _writeString(f, s)
+            numpy.array([1], dtype='<i4').tofile(f)
+            if field.getFieldType() == Field.FieldType.FT_vertexBased:
+                _writeString(f, 'coordinates')
+                numpy.ascontiguousarray(values[:self.mesh.getNumberOfVertices()].T, dtype='<f4').tofile(f)
+            else:
+                for eltype, sel in self.blocks:
+                    _writeString(f, eltype)
+                    numpy.ascontiguousarray(values[sel].T, dtype='<f4').tofile(f)
+
+    def appendFields(self, fields, time=None):
+        """
+        Write all fields as the next step.
+
+        :param [Field,] fields: fields, all defined on the same mesh (equal to the one written, not necessarily the same instance)
+        :param time: time of the step; time of the first field is used if not given
+        :type time: Physics.PhysicalQuantity or float
+        :return: index of the step written
+        :rtype: int
+        """
+        if not fields: raise ValueError('At least one field must be passed.')
+        if self.mesh is None: self.writeGeometry(fields[0].getMesh())
+        if any(f.getMesh() is not self.mesh and f.getMesh().internalArraysDigest() != self.meshDigest for f in fields): raise ValueError('All fields must be defined on the mesh written to %s.geo'%self.baseName)
+        names = [FieldID(f.getFieldID()).name.replace('FID_', '', 1) for f in fields]
+        if not self.times:
+            for name, f in zip(names, fields):
+                ncomp = 3 if f.getRecordSize() == 2 else f.getRecordSize()
+                if ncomp not in _goldVariableTypes: raise ValueError('Values of %s with %d components cannot be written to Ensight'%(name, ncomp))
+                self.variables[name] = ('%s per %s'%(_goldVariableTypes[ncomp], 'node' if f.getFieldType() == Field.FieldType.FT_vertexBased else 'element'), f.getFieldID())
+        elif sorted(names) != sorted(self.variables.keys()): raise ValueError('Fields %s written in every step, not %s'%(list(self.variables.keys()), names))
+        step = len(self.times)
+        for name, f in zip(names, fields): self._writeVariable(f, self._variableFile(name, step))
+        if time is None: time = fields[0].getTime()
+        self.times.append(time.getValue() if PhysicalQuantities.isPhysicalQuantity(time) else time)
+        self._writeCase()
+        return step
+
+    def append(self, field, time=None):
+        """
+        Write the field as the next step, see :func:`appendFields`.
+        """
+        return self.appendFields([field], time)
+
+    def _writeCase(self):
+        """
+        Write the case file.
+        """
+        with open(self.caseFile, 'w') as f:
+            f.write('FORMAT\ntype: ensight gold\n\nGEOMETRY\nmodel: %s.geo\n\nVARIABLE\n'%os.path.basename(self.baseName))
+            for name, (vtype, fid) in self.variables.items():
+                f.write('%s: 1 %s %s\n'%(vtype, name, os.path.basename(self._variableFile(name))))
+            f.write('\nTIME\ntime set: 1\nnumber of steps: %d\nfilename start number: 0\nfilename increment: 1\ntime values:\n'%len(self.times))
+            for t in self.times: f.write('%.12g\n'%t)
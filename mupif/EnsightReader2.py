@@ -25,10 +25,12 @@ from __future__ import division
 from builtins import range
 
 import re
+import numpy
 
 from . import Mesh
 from . import Vertex
 from . import Cell
+from . import CellGeometryType
 from . import BBox
 from . import Field
 from . import FieldID
@@ -36,154 +38,203 @@ from . import ValueType
 
 debug = 0
 
+# supported Ensight element types: (cell geometry type, number of vertices)
+_ensightCellTypes = {
+    'hexa8': (CellGeometryType.CGT_HEXAHEDRON, 8),
+    'quad4': (CellGeometryType.CGT_QUAD, 4),
+}
+_partRe = re.compile(br'\s*part\s+(\d+)')
 
-def readEnsightGeo(name, partFilter, partRec):
+
+def _readFixedWidth(f, nlines, width):
+    """
+    Read *nlines* lines of fixed-width records at once. Lines of the same length (all except possibly the last one, as is the case with fixed-width files) are read as a single block, others are read one by one.
+
+    :param File f: File object opened in binary mode
+    :param int nlines: number of lines
+    :param int width: record width; shorter lines are padded by spaces, longer are truncated
+    :return: concatenated records (nlines*width bytes), to be split by numpy.frombuffer
+    :rtype: bytes
+    """
+    if nlines <= 0: return b''
+    start = f.tell()
+    first = f.readline()
+    length, content = len(first), len(first.rstrip(b'\r\n'))
+    if nlines > 2 and content < length:
+        lines = numpy.frombuffer(first+f.read((nlines-2)*length), dtype=numpy.uint8)
+        if lines.size == (nlines-1)*length:
+            lines = lines.reshape(nlines-1, length)
+            # all lines must end with the same line terminator at the same position
+            if (lines[:, content:] == lines[0, content:]).all():
+                ret = numpy.full((nlines, width), ord(' '), dtype=numpy.uint8)
+                ret[:-1, :min(width, content)] = lines[:, :min(width, content)]
+                last = f.readline().rstrip(b'\r\n')[:width]
+                ret[-1, :len(last)] = numpy.frombuffer(last, dtype=numpy.uint8)
+                return ret.tobytes()
+    f.seek(start)
+    return b''.join([f.readline().rstrip(b'\r\n').ljust(width)[:width] for i in range(nlines)])
+
+def _readValues(f, size):
+    """
+    Read *size* float values stored 6 per line in 12 characters wide columns (format 12.5e).
+
+    :return: values
+    :rtype: numpy.array
+    """
+    buf = _readFixedWidth(f, (size+5)//6, 72)
+    return numpy.frombuffer(buf, dtype='S12')[:size].astype(numpy.float64)
+
+def _skipLines(f, nlines):
+    """
+    Skip *nlines* lines. Lines of fixed-width records all have the same length, in which case the file is seeked past them directly; otherwise the lines are read.
+    """
+    if nlines <= 0: return
+    start = f.tell()
+    length = len(f.readline())
+    if nlines > 1 and length > 0:
+        # check that the lines end where they would if all had the same length
+        f.seek(start+(nlines-1)*length-1)
+        if f.read(1) == b'\n':
+            f.seek(start+nlines*length-1)
+            if f.read(1) == b'\n': return
+        f.seek(start+length)
+    for i in range(nlines-1): f.readline()
+
+def _readGeoPart(f, line, rec, read):
+    """
+    Read element sections of a single part of Ensight geometry file.
+
+    :param File f: File object
+    :param bytes line: Current line to process (should contain element type)
+    :param dict rec: Output argument, number of elements of each element type is stored here
+    :param bool read: Read elements of the part; elements are skipped if False
+    :return: next line (the next part record) and list of (element type, element ids, node ids) of supported element types
+    :rtype: (bytes, list)
+    """
+    blocks = []
+    # if the next line is not next part record, then should be element section
+    while line and not _partRe.search(line):
+        eltype = line.strip().decode()
+        if not eltype:
+            line = f.readline()
+            continue
+        nelem = int(f.readline())
+        rec[eltype] = nelem
+        if debug:
+            print("(", eltype, nelem, ")")
+        if read and eltype in _ensightCellTypes:
+            nv = _ensightCellTypes[eltype][1]
+            data = numpy.frombuffer(_readFixedWidth(f, nelem, 8*(nv+1)), dtype='S8').reshape(nelem, nv+1).astype(numpy.int64)
+            blocks.append((eltype, data[:, 0], data[:, 1:]))
+        else:
+            if read: print("Element type %s not suported" % (eltype))
+            _skipLines(f, nelem)
+        line = f.readline()
+    return line, blocks
+
+
+def readEnsightGeo(name, partFilter, partRec, compact=False):
     """
     Reads Ensight geometry file (Ensight6 format) and returns corresponding Mesh object instance. Supports only unstructured meshes.
 
+    Coordinates and element sections are parsed in bulk. Parts are read one after another; parts not in *partFilter* are skipped without parsing.
+
     :param str name: Path to Ensight geometry file (\*.geo)
     :param tuple partFiler: Only parts with id contained in partFiler will be imported
     :param list partRec: A list containing info about individual parts (number of elements). Needed by readEnsightField
+    :param bool compact: Return :obj:`Mesh.CompactUnstructuredMesh` instead of :obj:`Mesh.UnstructuredMesh` (much faster for large meshes)
     :return: mesh
     :rtype: Mesh
     """
-    vertexMapping = {}
-    vertices = []
-    cells = []
-    vnum = 0
-    enum = 0
-
     # open the geo file
-    f = open(name, 'r')
-    if debug: 
-        print("Importing geometry from %s"%(name))
-
-    mesh = Mesh.UnstructuredMesh()
-
-    #process header (6 lines)
-    desc1 = f.readline()
-    desc2 = f.readline()
-    nodeidrec = f.readline()
-    # check if nodal ids given -> required
-    if ( not re.match('node\s+id\s+given',nodeidrec)):
-        print ("Given node ids required")
-        return
-
-    elemidrec = f.readline()
-    # check if element ids given -> required
-    if (not re.match('element\s+id\s+given',elemidrec)):
-        print ("Given element ids required")
-        return
-    coordkwdrec = f.readline()
-    numberOfUnstructuredNodes = int (f.readline())
-    #check
-    #read unstructured coordinates
-    for i in range(numberOfUnstructuredNodes):
+    with open(name, 'rb') as f:
+        if debug:
+            print("Importing geometry from %s"%(name))
+        #process header (6 lines)
+        desc1 = f.readline()
+        desc2 = f.readline()
+        nodeidrec = f.readline()
+        # check if nodal ids given -> required
+        if (not re.match(br'node\s+id\s+given', nodeidrec)):
+            print ("Given node ids required")
+            return
+        elemidrec = f.readline()
+        # check if element ids given -> required
+        if (not re.match(br'element\s+id\s+given', elemidrec)):
+            print ("Given element ids required")
+            return
+        coordkwdrec = f.readline()
+        numberOfUnstructuredNodes = int(f.readline())
+        #read unstructured coordinates
+        nodes = numpy.frombuffer(_readFixedWidth(f, numberOfUnstructuredNodes, 44), dtype=[('id', 'S8'), ('coords', 'S12', (3,))])
+        nodeIds = nodes['id'].astype(numpy.int64)
+        coords = nodes['coords'].astype(numpy.float64)
+        #read parts in sequential order
+        blocks = []
         line = f.readline()
-        match=re.match('(.{8})(.{12})(.{12})(.{12})', line)
-        #print line
-        if match:
-            id = int(match.group(1))
-            x  = float(match.group(2))
-            y  = float(match.group(3))
-            z  = float(match.group(4))
-            #print id, x, y, z
-            vertexMapping[id]=vnum; # remember mapping id -> vertex number
-            vertices.append(Vertex.Vertex(vnum, id, (x,y,z)))
-            #increment vertex counter
-            vnum = vnum+1
-    #read parts in sequential order
-    line = f.readline()
-    while line:
-        match = re.search('\s*part\s+(\d+)', line)
-        if match:
+        while line:
+            match = _partRe.search(line)
+            if not match:
+                line = f.readline()
+                continue
             partnum = int(match.group(1))
             partRec.append({}) #add empty dict for each part containing number of elements for each elemeet type
-            if (partnum in partFilter):
-                if debug:
-                    print("Importing part %d"%(partnum))
-                partdesc = f.readline().rstrip('\r\n')
-                # process part 
-                # get element type
-                line = f.readline()
-                (line, enum) = readEnsightGeo_Part (f, line, mesh, enum, cells, vertexMapping, partnum, partdesc, partRec)
-            else:
-                line = f.readline() 
-        else:
-           line = f.readline() 
+            if debug and partnum in partFilter:
+                print("Importing part %d"%(partnum))
+            partdesc = f.readline().rstrip(b'\r\n')
+            (line, partBlocks) = _readGeoPart(f, f.readline(), partRec[partnum-1], partnum in partFilter)
+            blocks += partBlocks
 
+    # map node ids to vertex numbers (the last node wins if ids are repeated)
+    order = numpy.argsort(nodeIds, kind='mergesort')
+    sortedIds = nodeIds[order]
+    cellTypes, cellVertices = [], []
+    for eltype, elnums, elnodes in blocks:
+        pos = numpy.searchsorted(sortedIds, elnodes, side='right')-1
+        if (pos < 0).any() or (sortedIds[pos] != elnodes).any(): raise KeyError('Element(s) of type %s refer to undefined node id(s) %s'%(eltype, numpy.setdiff1d(elnodes, nodeIds)))
+        cellTypes.append(numpy.full(elnodes.shape[0], _ensightCellTypes[eltype][0], dtype=numpy.int64))
+        cellVertices.append(order[pos])
     if debug:
-        print("Setting up mesh: %d vertices, %d cells"%(vnum, enum))
-        print(len(vertices), len(cells))
-    mesh.setup(vertices, cells)
-    return mesh
+        print("Setting up mesh: %d vertices, %d cells"%(nodeIds.shape[0], sum(len(t) for t in cellTypes)))
+    return _makeMesh(coords, nodeIds, cellTypes, cellVertices, compact)
 
 
-def readEnsightGeo_Part (f, line, mesh, enum, cells, vertexMapping, partnum, partdesc, partRec):
+def _makeMesh(coords, vertexLabels, cellTypes, cellVertices, compact):
     """
-    Reads single cell part geometry from an Ensight file.
+    Create mesh from arrays; cells are numbered (and labeled) sequentially.
 
-    :param File f: File object
-    :param str line: Current line to process (should contain element type)
-    :param Mesh mesh: Mupif mesh object to accommodate new cells
-    :param int enum: Accumulated cell number
-    :param list cells: List of individual Cells
-    :param dict vertexMapping: Map from vertex label (as given in Ensight file) to local number
-    :param int partnum: Part number
-    :param list partdesc: Partition description record
-    :param list partRec: Output agrument (list) containing info about individual parts (number of elements). Needed by readEnsightField
-    :return: tuple (line, cell number)
-    :rtype: tuple (line, enum)
+    :param numpy.array coords: (N,3) vertex coordinates
+    :param numpy.array vertexLabels: vertex labels
+    :param list cellTypes: arrays of cell geometry types, one for each block of cells
+    :param list cellVertices: (n,nv) arrays of vertex numbers, one for each block of cells
+    :param bool compact: Return :obj:`Mesh.CompactUnstructuredMesh` instead of :obj:`Mesh.UnstructuredMesh`
+    :rtype: Mesh
     """
-    # if the next line is not next part record, then should be element section
-    while (not re.search('\s*part\s+(\d+)', line)):
-        if(line == ''):
-            break
-        # ok no "part" keyword, parse element section
-        eltype=line.rstrip('\r\n')
-        if debug: 
-            print("(",eltype,")")
-        line = f.readline()
-        nelem = int(line.rstrip('\r\n'))
-        # remember info to partRec
-        partRec[partnum-1][eltype]=nelem
-        if debug:
-            print("part %s nelem %d" % (partdesc, nelem))
-        #read individual elements
-        for i in range(nelem):
-            elemRec = f.readline()
-            if (eltype == "hexa8"):
-                match = re.match('(.{8})(.{8})(.{8})(.{8})(.{8})(.{8})(.{8})(.{8})(.{8})', elemRec)
-                if match:
-                    elnum = int(match.group(1))
-                    elnodes = (int(match.group(2)), int(match.group(3)), int(match.group(4)), int(match.group(5)), 
-                               int(match.group(6)), int(match.group(7)), int(match.group(8)), int(match.group(9)))
-                    #print ("Brick: %d (%d %d %d %d %d %d %d %d)"%(elnum, elnodes[0],elnodes[1],elnodes[2],elnodes[3],elnodes[4],elnodes[5],elnodes[6],elnodes[7]))
-                    _vert = [vertexMapping[i] for i in elnodes]
-                    cells.append(Cell.Brick_3d_lin(mesh, enum, enum, tuple(_vert)))
-                    enum=enum+1
-            elif (eltype == "quad4"):
-                match = re.match('(.{8})(.{8})(.{8})(.{8})(.{8})', elemRec)
-                if match:
-                    elnum = int(match.group(1))
-                    elnodes = (int(match.group(2)), int(match.group(3)), int(match.group(4)), int(match.group(5)))
-                    if debug:
-                        print ("Quad: %d (%d %d %d %d)"%(elnum, elnodes[0],elnodes[1],elnodes[2],elnodes[3]))
-                    _vert = [vertexMapping[i] for i in elnodes]
-                    cells.append(Cell.Quad_2d_lin(mesh, enum, enum, tuple(_vert)))
-                    enum=enum+1
-            else:
-                pass
-                print ("Element type %s not suported" % (eltype))
-        #finished parsing part for specific element type
-        line = f.readline()
-    # next part record found
-    return (line, enum)
-    
+    if compact:
+        empty = [numpy.zeros(0, dtype=numpy.int64)]
+        counts = numpy.concatenate([numpy.full(vv.shape[0], vv.shape[1], dtype=numpy.int64) for vv in cellVertices]+empty)
+        mesh = Mesh.CompactUnstructuredMesh()
+        mesh.setupFromArrays(coords, numpy.concatenate(cellTypes+empty), numpy.concatenate([vv.ravel() for vv in cellVertices]+empty),
+            cellOffsets=numpy.concatenate(([0], numpy.cumsum(counts))), vertexLabels=vertexLabels)
+        return mesh
+    mesh = Mesh.UnstructuredMesh()
+    vertices = [Vertex.Vertex(vnum, id, tuple(xyz)) for vnum, (id, xyz) in enumerate(zip(vertexLabels.tolist(), coords.tolist()))]
+    cells = []
+    for tt, vv in zip(cellTypes, cellVertices):
+        klass = Cell.Cell.getClassForCellGeometryType(tt[0]) if tt.shape[0] else None
+        for _vert in vv.tolist():
+            enum = len(cells)
+            cells.append(klass(mesh, enum, enum, tuple(_vert)))
+    mesh.setup(vertices, cells)
+    return mesh
+
+
 def readEnsightField (name, parts, partRec, type, fieldID, mesh, units, time):
     """
     Reads either Per-node or Per-element variable file and returns corresponding Field representation.
 
+    Values are parsed in bulk; element sections of parts not in *parts* are skipped without parsing.
+
     :param str name: Input field name with variable data
     :param tuple parts: Only parts with id contained in partFiler will be imported
     :param list partRec: A list containing info about individual parts (number of elements per each element type).
@@ -195,11 +246,6 @@ def readEnsightField (name, parts, partRec, type, fieldID, mesh, units, time):
     :return: FieldID for unknowns
     :rtype: Field
     """
-    vertexVals = []
-    cellVals=[]
-    indx = list(range(6))
-    values=[]
-
     if (type == 1):
         ftype = ValueType.Scalar
     elif (type == 3):
@@ -207,106 +253,51 @@ def readEnsightField (name, parts, partRec, type, fieldID, mesh, units, time):
     else:
         ftype = ValueType.Tensor
 
+    # open the variable file
+    with open(name, 'rb') as f:
+        #get variable name (1st line)
+        varname = f.readline().rstrip(b'\r\n')
+        if (debug):
+            print("Importing %s from %s"%(varname, name))
 
-    # open the geo file
-    f = open(name, 'r')
-
-    #get variable name (1st line)
-    varname = f.readline().rstrip('\r\n')
-    if (debug):
-        print("Importing %s from %s"%(varname, name))
-    
-    #now check if nodal records available or part (cell records)
-    line = f.readline()
-    match = re.match('part\s+(\d+)',line)
-    if (not match):
-        # nodal (vertex based specification)
-        size = mesh.getNumberOfVertices()* type
-        print("Expecting ", mesh.getNumberOfVertices(), " nodal records in ", size//6, " lines")
-        # read nodeal variables
-        for i in range (size//6): #six values per row in fixed format 12.5e
-            for j in indx:
-                try:
-                    vertexVals.append(float(line[j*12:(j+1)*12]))
-                except:
-                    print("exception....", j, line, ">", line[j*12:(j+1)*12])
-            line = f.readline()
-        
-        #parse remaining values
-        #line = f.readline()
-        for j in range(size%6):
-            vertexVals.append(float(line[j*12:(j+1)*12]))
-        if (size%6 > 0):
-            line=f.readline()
-        #done parsing nodal record(s)
-        # so this should be per-vertex variable file -> vertex based field
-        # convert vertexVals into form required by field 
-        for i in range(mesh.getNumberOfVertices()):
-            if (type == 1): #scalar
-                values.append((vertexVals[i],))
-            elif (type == 3): #vector
-                values.append((vertexVals[i*3], vertexVals[i*3+1], vertexVals[i*3+2]))
-            elif (type == 6): #tensor
-                values.append((vertexVals[i*6], vertexVals[i*6+1], 
-                               vertexVals[i*6+2],vertexVals[i*6+3],
-                               vertexVals[i*6+4],vertexVals[i*6+4]))
-
-        field = Field.Field(mesh, fieldID, ftype, units, time, values, Field.FieldType.FT_vertexBased )
-        return field
+        #now check if nodal records available or part (cell records)
+        pos = f.tell()
+        line = f.readline()
+        if (not re.match(br'part\s+(\d+)', line)):
+            # nodal (vertex based specification), six values per row in fixed format 12.5e
+            f.seek(pos)
+            nv = mesh.getNumberOfVertices()
+            values = _readValues(f, nv*type).reshape(nv, type)
+            # so this should be per-vertex variable file -> vertex based field
+            return Field.Field(mesh, fieldID, ftype, units, time, values, Field.FieldType.FT_vertexBased)
 
-    else:
         # ok nodal section missing, parts should provide per-cell variables
+        values = []
         while line:
-            match = re.search('\s*part\s+(\d+)', line)
-            if match:
-                partnum = int(match.group(1))
-                if (partnum in parts):
-                    if debug:
-                        print("Importing part %d"%(partnum))
-                    # get element type
+            match = _partRe.search(line)
+            if not match:
+                line = f.readline()
+                continue
+            partnum = int(match.group(1))
+            rec = partRec[partnum-1] if partnum <= len(partRec) else {}
+            if debug and partnum in parts:
+                print("Importing part %d"%(partnum))
+            line = f.readline()
+            # if the next line is not next part record, then should be element section
+            while line and not _partRe.search(line):
+                eltype = line.strip().decode()
+                if not eltype or (eltype not in rec and partnum not in parts):
+                    # unknown section of a part not imported; look for the next part record
                     line = f.readline()
-                    # if the next line is not next part record, then should be element section
-                    while (not re.search('\s*part\s+(\d+)', line)):
-                        # ok no "part" keyword, parse element section
-                        eltype=line.rstrip('\r\n')
-                        if debug:
-                            print ("eltype:", eltype)
-                        nelem = partRec[partnum-1][eltype] #get number of elements in part
-                        if debug:
-                            print("(",eltype, nelem,")")
-                        size = nelem * type
-                        cellVals=[] # empty values for each element group
-                        for i in range (size//6): #six values per row in fixed format 12.5e
-                            line = f.readline()
-                            #print ".",
-                            for j in indx:
-                                cellVals.append(float(line[j*12:(j+1)*12]))
-                        #parse remaining values
-                        line = f.readline()
-                        for j in range(size%6):
-                            cellVals.append(float(line[j*12:(j+1)*12]))
-                        if (size%6 > 0):
-                            line=f.readline()
-                        #print "%"
-                        # now convert that into format required by filed
-                        for i in range(nelem):
-                            if (type == 1): #scalar
-                                values.append((cellVals[i],))
-                            elif (type == 3): #vector
-                                values.append((cellVals[i*3], cellVals[i*3+1], cellVals[i*3+2]))
-                            elif (type == 6): #tensor
-                                values.append((cellVals[i*6], cellVals[i*6+1], 
-                                               cellVals[i*6+2],cellVals[i*6+3],
-                                               cellVals[i*6+4],cellVals[i*6+4]))
-                        if debug:
-                            print("done importing element section")
-                        #done parsing cell record(s) in part 
-
-                else: # if (partnum in parts):   proceed to next part 
-                    line= f.readline()
-            else:
-                line=f.readline()
-        # so this should be per-cell variable file -> cell based field
-        field = Field.Field(mesh, fieldID, ftype, units, time, values, Field.FieldType.FT_cellBased )
-        return field
-
+                    continue
+                nelem = rec[eltype] #get number of elements in part
+                if debug:
+                    print("(", eltype, nelem, ")")
+                if partnum in parts and eltype in _ensightCellTypes:
+                    values.append(_readValues(f, nelem*type).reshape(nelem, type))
+                else:
+                    _skipLines(f, (nelem*type+5)//6)
+                line = f.readline()
+    # so this should be per-cell variable file -> cell based field
+    values = numpy.concatenate(values) if values else numpy.zeros((0, type))
+    return Field.Field(mesh, fieldID, ftype, units, time, values, Field.FieldType.FT_cellBased)
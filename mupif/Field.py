@@ -30,12 +30,16 @@ from . import BBox
 from . import APIError
 from . import MupifObject
 from . import Mesh
+from . import PointLocalizer
+from . import Octree
+from . import CellGeometryType
 from .Physics import PhysicalQuantities 
 from .Physics.PhysicalQuantities import PhysicalQuantity
 
 from numpy import array, arange, random, zeros
 import numpy
 import copy
+import collections
 import Pyro4
 import logging
 log = logging.getLogger()
@@ -56,6 +60,272 @@ class FieldType(object):
     FT_vertexBased = 1
     FT_cellBased   = 2
 
+# sparse operators built by Field.transferTo, keyed by (method, source field type, eps, source mesh digest, target mesh digest)
+_transferOperators=collections.OrderedDict()
+# maximum number of cached transfer operators; least recently used ones are dropped first
+transferOperatorCacheSize=16
+
+def _cellValueIndices(mesh):
+    """
+    Return indices into cell-based field values of all cells of the mesh (cell numbers, as used by :func:`Field._evaluate`).
+    """
+    numbers=mesh._giveCellNumbers()
+    return numpy.arange(mesh.getNumberOfCells()) if numbers is None else numbers
+
+def _cellValueArray(mesh, values):
+    """
+    Return cell-based field values ordered as cells of the mesh; values are returned as they are if cells are numbered sequentially.
+    """
+    numbers=mesh._giveCellNumbers()
+    return values if numbers is None else values[numbers]
+
+def _giveHdf5Mesh(meshes, h5obj):
+    """
+    Return mesh stored in the HDF5 object, restoring it (as :obj:`Mesh.CompactUnstructuredMesh` where possible) only if not yet in *meshes*, a dict keyed by mhash.
+    """
+    mhash=h5obj.attrs['mhash']
+    if mhash not in meshes: meshes[mhash]=Mesh.Mesh.makeFromHdf5Object(h5obj,compact=True)
+    return meshes[mhash]
+
+def _giveHdf5Values(dataset):
+    """
+    Return values in the HDF5 dataset as numpy array; contiguous datasets are memory-mapped (copy-on-write, so that the file is never modified), others are read.
+    """
+    offset=dataset.id.get_offset()
+    if dataset.chunks is None and dataset.compression is None and offset is not None and dataset.dtype.isnative:
+        return numpy.memmap(dataset.file.filename,dtype=dataset.dtype,mode='c',offset=offset,shape=dataset.shape)
+    return dataset[...]
+
+def _samplingOperator(mesh, fieldType, points, eps):
+    """
+    Return sparse matrix evaluating field of given type defined on the mesh at given points.
+
+    :param Mesh mesh: source mesh
+    :param FieldType fieldType: source field type
+    :param numpy.array points: (N,3) array of positions
+    :param float eps: tolerance for locating points in cells
+    :rtype: scipy.sparse.csr_matrix
+    """
+    import scipy.sparse
+    if fieldType==FieldType.FT_vertexBased:
+        from .InterpolationPlan import InterpolationPlan
+        return InterpolationPlan(mesh,points,eps).getMatrix()
+    # cell-based: average of values of all cells containing the point
+    ip,ic,weights=mesh._locatePointsInCells(points,eps)
+    count=numpy.bincount(ip,minlength=points.shape[0])
+    missing=numpy.nonzero(count==0)[0]
+    if missing.size:
+        log.error('Field::transferTo - no source cell found for %d positions, first at %s'%(missing.size,str(points[missing[0]])))
+        raise ValueError('Field::transferTo - no source cell found for position ' + str(points[missing[0]]))
+    return scipy.sparse.csr_matrix((1./count[ip],(ip,_cellValueIndices(mesh)[ic])),shape=(points.shape[0],mesh.getNumberOfCells()))
+
+# decomposition of cells into simplices (triangles or tetrahedra) for computing cell intersections: (dimension, vertex indices of simplices);
+# curved edges of quadratic triangles are replaced by straight ones, hexahedra are split along the diagonal from vertex 4 to vertex 2
+_cellSimplices={
+    CellGeometryType.CGT_TRIANGLE_1:(2,((0,1,2),)),
+    CellGeometryType.CGT_TRIANGLE_2:(2,((0,1,2),)),
+    CellGeometryType.CGT_QUAD:(2,((0,1,2),(0,2,3))),
+    CellGeometryType.CGT_TETRA:(3,((0,1,2,3),)),
+    CellGeometryType.CGT_HEXAHEDRON:(3,((4,2,0,1),(4,2,1,5),(4,2,5,6),(4,2,6,7),(4,2,7,3),(4,2,3,0))),
+}
+
+def _giveSimplices(mesh):
+    """
+    Decompose all cells of the mesh into simplices, see :obj:`_cellSimplices`.
+
+    :return: (dim,xyz,owner) where dim is dimension of the cells, xyz is (N,dim+1,3) array of simplex vertex coordinates and owner is (N,) array of cell indices
+    :rtype: (int,numpy.array,numpy.array)
+    :except: ValueError for cell types which can not be decomposed or for cells of different dimensions
+    """
+    mvc,(mct,mci)=mesh._giveGeometryArrays()
+    dims,xyz,owner=set(),[],[]
+    for cgt in numpy.unique(mct):
+        if cgt not in _cellSimplices: raise ValueError('Field::transferTo - cell geometry type %d not supported by conservative transfer'%cgt)
+        dim,simplices=_cellSimplices[cgt]
+        sel=numpy.nonzero(mct==cgt)[0]
+        dims.add(dim)
+        for simplex in simplices:
+            xyz.append(mvc[mci[sel][:,simplex]])
+            owner.append(sel)
+    if len(dims)>1: raise ValueError('Field::transferTo - mesh with cells of different dimensions not supported by conservative transfer')
+    if not xyz: return 0,numpy.empty((0,1,3)),numpy.empty(0,dtype=numpy.int64)
+    return dims.pop(),numpy.concatenate(xyz),numpy.concatenate(owner)
+
+def _simplexHalfSpaces(dim, xyz):
+    """
+    Return half-spaces bounding the simplices: (N,dim+1,4) array of (nx,ny,nz,d), with unit normals pointing inside, so that the point x is inside if n.x+d>=0. Triangles are bounded in the xy-plane only. Degenerate simplices get zero normals and must be skipped.
+    """
+    n=numpy.zeros((xyz.shape[0],dim+1,3))
+    for i in range(dim+1):
+        face=[j for j in range(dim+1) if j!=i]
+        if dim==2:
+            e=xyz[:,face[1]]-xyz[:,face[0]]
+            n[:,i,0],n[:,i,1]=-e[:,1],e[:,0]
+        else: n[:,i]=numpy.cross(xyz[:,face[1]]-xyz[:,face[0]],xyz[:,face[2]]-xyz[:,face[0]])
+        # orient towards the opposite vertex
+        n[:,i]*=numpy.where(numpy.einsum('nk,nk->n',n[:,i],xyz[:,i]-xyz[:,face[0]])<0,-1.,1.)[:,None]
+        norm=numpy.sqrt((n[:,i]**2).sum(axis=1))
+        n[:,i]/=numpy.where(norm>0,norm,1.)[:,None]
+    d=-numpy.einsum('nik,nik->ni',n,xyz[:,[(i+1)%(dim+1) for i in range(dim+1)]])
+    return numpy.concatenate((n,d[:,:,None]),axis=2)
+
+def _clipPolygon(poly, plane, tol):
+    """
+    Clip convex polygon (list of 3-tuples) by half-space (nx,ny,nz,d) (Sutherland-Hodgman); points within tol from the plane are inside.
+    """
+    nx,ny,nz,d=plane
+    dist=[nx*x+ny*y+nz*z+d for x,y,z in poly]
+    ret=[]
+    for i in range(len(poly)):
+        dp,dq=dist[i-1],dist[i]
+        if (dp>=-tol)!=(dq>=-tol):
+            p,q,t=poly[i-1],poly[i],dp/(dp-dq)
+            ret.append((p[0]+t*(q[0]-p[0]),p[1]+t*(q[1]-p[1]),p[2]+t*(q[2]-p[2])))
+        if dq>=-tol: ret.append(poly[i])
+    return ret
+
+def _isDegenerate(poly, tol):
+    """
+    Return True if the polygon (list of 3-tuples) has (almost) zero area, i.e. its width is below tol.
+    """
+    if len(poly)<3: return True
+    p=numpy.array(poly)
+    p=p[1:]-p[0]
+    area=.5*numpy.sqrt((numpy.cross(p[:-1],p[1:]).sum(axis=0)**2).sum())
+    return area<=tol*numpy.fabs(p).max()
+
+def _clipPolyhedron(faces, plane, tol):
+    """
+    Clip convex polyhedron, given as list of faces (lists of 3-tuples), by half-space (nx,ny,nz,d); the section is closed by a new face.
+    """
+    nx,ny,nz,d=plane
+    onPlane=lambda pt: abs(nx*pt[0]+ny*pt[1]+nz*pt[2]+d)<=tol
+    # faces touching the plane only by an edge or vertex are dropped
+    ret=[f for f in (_clipPolygon(f,plane,tol) for f in faces) if not _isDegenerate(f,tol)]
+    # face lying in the plane closes the polyhedron already
+    if not ret or any(all(onPlane(pt) for pt in f) for f in ret): return ret
+    cap=numpy.array([pt for f in ret for pt in f if onPlane(pt)]).reshape(-1,3)
+    if cap.shape[0]<3: return ret
+    # order section points by angle around their centroid
+    normal=numpy.array((nx,ny,nz))
+    u=numpy.cross(normal,numpy.eye(3)[numpy.argmin(numpy.fabs(normal))])
+    w=numpy.cross(normal,u)
+    c=cap-cap.mean(axis=0)
+    cap=cap[numpy.argsort(numpy.arctan2(c.dot(w),c.dot(u)))]
+    # drop duplicates
+    keep=(numpy.sqrt(((cap-numpy.roll(cap,1,axis=0))**2).sum(axis=1))>tol)
+    if keep.sum()>=3: ret.append([tuple(pt) for pt in cap[keep]])
+    return ret
+
+def _intersectSimplices(dim, simplex, halfSpaces, tol):
+    """
+    Intersect the simplex ((dim+1,3) array) with convex polytope given by half-spaces and return the intersection split into simplices (list of tuples of dim+1 points).
+    """
+    pts=[tuple(pt) for pt in simplex.tolist()]
+    if dim==2:
+        poly=pts
+        for plane in halfSpaces:
+            poly=_clipPolygon(poly,plane,tol)
+            if len(poly)<3: return []
+        return [(poly[0],poly[i],poly[i+1]) for i in range(1,len(poly)-1)]
+    faces=[[pts[j] for j in range(4) if j!=i] for i in range(4)]
+    if _isDegenerate(faces[0],tol): return []
+    for plane in halfSpaces:
+        faces=_clipPolyhedron(faces,plane,tol)
+        if len(faces)<4: return []
+    c=tuple(numpy.array([pt for f in faces for pt in f]).mean(axis=0))
+    return [(c,f[0],f[i],f[i+1]) for f in faces for i in range(1,len(f)-1)]
+
+def _simplexMeasures(dim, xyz):
+    """
+    Return areas (dim=2, in the xy-plane) or volumes (dim=3) of simplices given by (N,dim+1,3) array of vertex coordinates.
+    """
+    e=xyz[:,1:,:dim]-xyz[:,:1,:dim]
+    return numpy.fabs(numpy.linalg.det(e))/(2. if dim==2 else 6.) if xyz.shape[0] else numpy.zeros(0)
+
+def _conservativeOperator(mesh, fieldType, targetMesh, eps):
+    """
+    Return sparse matrix of cell averages over target cells, computed from intersections of source and target cells (decomposed into simplices, see :obj:`_cellSimplices`): areas (volumes) of the intersections for cell-based fields, integrals of source shape functions over them for vertex-based fields. The receiver is taken as zero outside of its mesh, so that its integral over the common part of both meshes is preserved.
+    """
+    import scipy.sparse
+    from . import IntegrationRule
+    dim,sxyz,sowner=_giveSimplices(mesh)
+    tdim,txyz,towner=_giveSimplices(targetMesh)
+    nt=targetMesh.getNumberOfCells()
+    ncols=mesh.getNumberOfVertices() if fieldType==FieldType.FT_vertexBased else mesh.getNumberOfCells()
+    tmeasures=_simplexMeasures(tdim,txyz)
+    tvol=numpy.bincount(towner,weights=tmeasures,minlength=nt)
+    # degenerate target simplices have no half-spaces
+    txyz,towner=txyz[tmeasures>0],towner[tmeasures>0]
+    if sxyz.shape[0]==0 or txyz.shape[0]==0: return scipy.sparse.csr_matrix((nt,ncols))
+    if dim!=tdim: raise ValueError('Field::transferTo - conservative transfer between meshes of different dimensions')
+    # candidate pairs of simplices with intersecting bounding boxes
+    ip,iq=Octree.BulkOctree(numpy.stack((sxyz.min(axis=1),sxyz.max(axis=1)),axis=1)).giveItemIndicesInBBoxes(txyz.min(axis=1)-eps,txyz.max(axis=1)+eps)
+    tol=1e-12*max(1.,numpy.fabs(sxyz).max(),numpy.fabs(txyz).max())
+    halfSpaces=_simplexHalfSpaces(dim,txyz).tolist()
+    sub,rows,cells=[],[],[]
+    for t,q in zip(ip.tolist(),iq.tolist()):
+        ss=_intersectSimplices(dim,sxyz[q],halfSpaces[t],tol)
+        sub.extend(ss)
+        rows.extend([towner[t]]*len(ss))
+        cells.extend([sowner[q]]*len(ss))
+    sub=numpy.array(sub,dtype=numpy.float64).reshape(-1,dim+1,3)
+    rows,cells=numpy.array(rows,dtype=numpy.int64),numpy.array(cells,dtype=numpy.int64)
+    measures=_simplexMeasures(dim,sub)
+    if fieldType==FieldType.FT_cellBased:
+        A=scipy.sparse.csr_matrix((measures,(rows,_cellValueIndices(mesh)[cells])),shape=(nt,ncols))
+    else:
+        # source shape functions integrated over the intersections by Gauss rule of second order
+        klass=Cell.Triangle_2d_lin if dim==2 else Cell.Tetrahedron_3d_lin
+        pnts=IntegrationRule.GaussIntegrationRule().getIntegrationPoints(CellGeometryType.CGT_TRIANGLE_1 if dim==2 else CellGeometryType.CGT_TETRA,3 if dim==2 else 4)
+        wq=numpy.array([p[1] for p in pnts])
+        Nq=klass.evalNBatch(numpy.array([p[0] for p in pnts],dtype=numpy.float64))
+        x=numpy.einsum('qk,nkd->nqd',Nq,sub).reshape(-1,3)
+        w=(measures[:,None]*wq/wq.sum()).ravel()
+        pcells,prows=numpy.repeat(cells,wq.size),numpy.repeat(rows,wq.size)
+        mvc,(mct,mci)=mesh._giveGeometryArrays()
+        data,ii,jj=[],[],[]
+        for cgt,sel,nv in mesh._giveCellTypeGroups(mct,mci):
+            p=numpy.nonzero(numpy.isin(pcells,sel))[0]
+            if p.size==0: continue
+            lc,inside=Cell.Cell.getClassForCellGeometryType(cgt).glob2locBatch(mvc[mci[pcells[p],:nv]],x[p])
+            N=Cell.Cell.getClassForCellGeometryType(cgt).evalNBatch(lc)
+            data.append((w[p,None]*N).ravel())
+            ii.append(numpy.repeat(prows[p],nv))
+            jj.append(mci[pcells[p],:nv].ravel())
+        if data: A=scipy.sparse.csr_matrix((numpy.concatenate(data),(numpy.concatenate(ii),numpy.concatenate(jj))),shape=(nt,ncols))
+        else: A=scipy.sparse.csr_matrix((nt,ncols))
+    return scipy.sparse.diags(numpy.where(tvol>0,1./numpy.where(tvol>0,tvol,1.),0.)).dot(A).tocsr()
+
+def _transferOperator(mesh, fieldType, targetMesh, method, eps):
+    """
+    Return (possibly cached) sparse matrix mapping values of field of given type on the mesh to values on targetMesh, see :func:`Field.transferTo`.
+    """
+    import scipy.sparse
+    if method not in ('interpolation','nearest','conservative'): raise ValueError('Field::transferTo - unknown method "%s"'%method)
+    key=(method,fieldType,eps,mesh.internalArraysDigest(),targetMesh.internalArraysDigest())
+    if key in _transferOperators:
+        _transferOperators.move_to_end(key)
+        return _transferOperators[key]
+    if method=='interpolation':
+        op=_samplingOperator(mesh,fieldType,targetMesh.getVertices(),eps)
+    elif method=='nearest':
+        if fieldType==FieldType.FT_vertexBased:
+            loc=mesh.giveVertexLocalizer() if hasattr(mesh,'giveVertexLocalizer') else None
+            if not isinstance(loc,PointLocalizer.PointLocalizer): loc=PointLocalizer.PointLocalizer(mesh.getVertices())
+            cols=numpy.arange(mesh.getNumberOfVertices())
+        else:
+            loc=PointLocalizer.PointLocalizer(mesh.getCellCentroids())
+            cols=_cellValueIndices(mesh)
+        dist,nearest=loc.giveNearest(targetMesh.getVertices())
+        n=targetMesh.getNumberOfVertices()
+        op=scipy.sparse.csr_matrix((numpy.ones(n),(numpy.arange(n),cols[nearest[:,0]])),shape=(n,cols.shape[0]))
+    else: op=_conservativeOperator(mesh,fieldType,targetMesh,eps)
+    _transferOperators[key]=op
+    while len(_transferOperators)>transferOperatorCacheSize: _transferOperators.popitem(last=False)
+    return op
+
+
 @Pyro4.expose
 class Field(MupifObject.MupifObject, PhysicalQuantity):
     """
@@ -92,7 +362,7 @@ class Field(MupifObject.MupifObject, PhysicalQuantity):
         self.uri = None   #pyro uri; used in distributed setting
         #self.log = logging.getLogger()
         self.fieldType = fieldType
-        if values == None:
+        if values is None:
             if (self.fieldType == FieldType.FT_vertexBased):
                 ncomponents = mesh.getNumberOfVertices()
             else:
@@ -189,12 +459,16 @@ class Field(MupifObject.MupifObject, PhysicalQuantity):
         """
         Evaluates the receiver at given spatial position(s).
 
+        Positions passed as 2D numpy.array (one position per row) are evaluated in batch mode (see :func:`_evaluateBatch`), which is much faster for many points; the value is then (N,recordSize) numpy.array.
+
         :param position: 1D/2D/3D position vectors
-        :type position: tuple, a list of tuples
+        :type position: tuple, a list of tuples, numpy.array of shape (N,3)
         :param float eps: Optional tolerance for probing whether the point belongs to a cell (should really not be used)
         :return: field value(s)
         :rtype: Physics.PhysicalQuantity with given value or tuple of values
         """
+        if isinstance(positions, numpy.ndarray) and positions.ndim==2:
+            return PhysicalQuantity(self._evaluateBatch(positions, eps), self.unit)
         # test if positions is a list of positions
         if isinstance(positions, list):
             ans=[]
@@ -205,6 +479,35 @@ class Field(MupifObject.MupifObject, PhysicalQuantity):
             # single position passed
             return PhysicalQuantity(self._evaluate(positions, eps), self.unit)
 
+    def _giveContainingCells(self, cells, position, first=False):
+        """
+        Tests candidate cells for containing given position. Candidates of the same type are tested at once by :func:`Cell.Cell.glob2locBatch`; cell types without vectorized implementation fall back to :func:`Cell.Cell.containsPoint`.
+
+        :param cells: candidate cells
+        :param tuple position: 1D/2D/3D position vector
+        :param bool first: stop at the first cell found
+        :return: list of (cell,N) tuples for cells containing the position, where N is array of cell shape functions evaluated at the position
+        :rtype: list
+        """
+        point=PointLocalizer._pointArray([position])
+        groups=collections.OrderedDict()
+        for icell in cells:
+            groups.setdefault(icell.__class__,[]).append(icell)
+        answer=[]
+        for klass,group in groups.items():
+            try:
+                vertexCoords=PointLocalizer._pointArray([v.getCoordinates() for c in group for v in c.getVertices()])
+                lc,inside=klass.glob2locBatch(vertexCoords.reshape(len(group),-1,3),numpy.repeat(point,len(group),axis=0))
+                for i in numpy.nonzero(inside)[0]:
+                    answer.append((group[i],klass.evalNBatch(lc[i:i+1])[0]))
+            except NotImplementedError:
+                for icell in group:
+                    if icell.containsPoint(position):
+                        answer.append((icell,numpy.array(icell.interpolate(position,numpy.eye(len(icell.getVertices()))))))
+            if first and answer:
+                return answer[:1]
+        return answer
+
     def _evaluate(self, position, eps):
         """
         Evaluates the receiver at a single spatial position.
@@ -220,24 +523,18 @@ class Field(MupifObject.MupifObject, PhysicalQuantity):
         ## answer=None
         if len(cells):
             if (self.fieldType == FieldType.FT_vertexBased):
-                for icell in cells:
+                found=self._giveContainingCells(cells, position, first=True)
+                if found:
+                    icell,N=found[0]
+                    if debug:
+                        log.debug(icell.getVertices())
                     try:
-                        if icell.containsPoint(position):
-                            if debug:
-                                log.debug(icell.getVertices())
-                            try:
-                                answer = icell.interpolate(position, [self.value[i.number] for i in icell.getVertices()])
-                            except IndexError:
-                                log.error('Field::evaluate failed, inconsistent data at cell %d'%(icell.label))
-                                raise
-                            return answer
-
-                    except ZeroDivisionError:
-                        print('ZeroDivisionError?')
-                        log.debug(icell.number)
-                        log.debug(position)
-                        cell.debug=1
-                        log.debug(icell.containsPoint(position), icell.glob2loc(position))
+                        vertexValues=numpy.array([self.value[i.number] for i in icell.getVertices()],dtype=numpy.float64)
+                    except IndexError:
+                        log.error('Field::evaluate failed, inconsistent data at cell %d'%(icell.label))
+                        raise
+                    # summed in vertex order, as in Cell.interpolate
+                    return tuple(sum(N[i]*vertexValues[i] for i in range(N.size)))
 
                 log.error('Field::evaluate - no source cell found for position %s' % str(position) )
                 for icell in cells:
@@ -250,24 +547,23 @@ class Field(MupifObject.MupifObject, PhysicalQuantity):
                 #in case of cell based fields do compute average of cell values containing point
                 #this typically happens when point is on the shared edge or vertex
                 count=0
-                for icell in cells:
-                    if icell.containsPoint(position):
-                        if debug:
-                            log.debug(icell.getVertices())
-
-                        try:
-                            tmp = self.value[icell.number]
-                            if count==0:
-                                answer = list(tmp)
-                            else:
-                                for i in answer:
-                                   answer = [x+y for x in answer for y in tmp]
-                            count+=1
-
-                        except IndexError:
-                            log.error('Field::evaluate failed, inconsistent data at cell %d'%(icell.label))
-                            log.error(icell.getVertices())
-                            raise
+                for icell,N in self._giveContainingCells(cells, position):
+                    if debug:
+                        log.debug(icell.getVertices())
+
+                    try:
+                        tmp = self.value[icell.number]
+                        if count==0:
+                            answer = list(tmp)
+                        else:
+                            for i in answer:
+                               answer = [x+y for x in answer for y in tmp]
+                        count+=1
+
+                    except IndexError:
+                        log.error('Field::evaluate failed, inconsistent data at cell %d'%(icell.label))
+                        log.error(icell.getVertices())
+                        raise
                 # end loop over icells
                 if count == 0:
                     log.error('Field::evaluate - no source cell found for position %s', str(position))
@@ -284,6 +580,124 @@ class Field(MupifObject.MupifObject, PhysicalQuantity):
 
 
 
+    def _evaluateBatch(self, positions, eps):
+        """
+        Evaluates the receiver at many spatial positions at once.
+
+        Point location, conversion to local coordinates and interpolation are done in vectorized passes grouped by cell geometry type, see :func:`Mesh.Mesh.locatePoints`.
+
+        :param numpy.array positions: (N,3) array of positions (1D/2D coordinates are padded by zeros)
+        :param float eps: Optional tolerance
+        :return: field values
+        :rtype: numpy.array of shape (N,recordSize)
+        :except: ValueError if some position is not inside any cell
+        """
+        values=numpy.asarray(self.value,dtype=numpy.float64)
+        if (self.fieldType == FieldType.FT_vertexBased):
+            cells,weights=self.mesh.locatePoints(positions,eps)
+            missing=numpy.nonzero(cells<0)[0]
+            if missing.size:
+                log.error('Field::evaluate - no source cell found for %d positions, first at %s'%(missing.size,str(positions[missing[0]])))
+                raise ValueError('Field::evaluate - no source cell found for position ' + str(positions[missing[0]]))
+            mci=self.mesh._giveGeometryArrays()[1][1][cells]
+            # excess vertices (-1) have zero weight
+            return numpy.einsum('ij,ijk->ik',weights,values[numpy.where(mci>=0,mci,0)])
+        else:
+            #in case of cell based fields do compute average of cell values containing point
+            ip,ic,weights=self.mesh._locatePointsInCells(positions,eps)
+            count=numpy.bincount(ip,minlength=positions.shape[0])
+            missing=numpy.nonzero(count==0)[0]
+            if missing.size:
+                log.error('Field::evaluate - no source cell found for %d positions, first at %s'%(missing.size,str(positions[missing[0]])))
+                raise ValueError('Field::evaluate - no source cell found for position ' + str(positions[missing[0]]))
+            # cell values are indexed by cell number, as in _evaluate
+            answer=numpy.zeros((positions.shape[0],values.shape[1]))
+            numpy.add.at(answer,ip,_cellValueArray(self.mesh,values)[ic])
+            return answer/count[:,None]
+
+    def transferTo(self, targetMesh, method='interpolation', eps=0.0):
+        """
+        Maps the receiver onto another mesh, returning a new field defined on targetMesh.
+
+        Supported methods are:
+
+        * ``'interpolation'``: the receiver is evaluated at target vertices; the result is vertex-based
+        * ``'nearest'``: each target vertex takes the value of the nearest source vertex (nearest source cell centroid for cell-based fields); the result is vertex-based and target vertices may lie outside of the source mesh
+        * ``'conservative'``: average of the receiver over each target cell (L2 projection on piecewise constant functions), computed from intersections of source and target cells; the result is cell-based, with values ordered as target mesh cells. The receiver is taken as zero outside of its mesh, so that its integral over the common part of both meshes is preserved. Cells are split into triangles (tetrahedra) for the intersection, which is exact for cells with planar faces; edges of quadratic triangles are taken as straight
+
+        The transfer is a sparse matrix, which is cached with the method and :func:`Mesh.Mesh.internalArraysDigest` of both meshes as key, so that repeated transfers between the same meshes only cost a matrix-vector product. Requires scipy.
+
+        :param Mesh targetMesh: mesh to map the receiver onto
+        :param str method: transfer method, one of 'interpolation', 'nearest', 'conservative'
+        :param float eps: Optional tolerance for locating points in source cells
+        :return: new field with the same ID, value type, units and time
+        :rtype: Field
+        :except: ValueError for unknown method, when target vertices are not inside of the source mesh (interpolation) or for meshes of different dimensions (conservative)
+        """
+        op=_transferOperator(self.mesh,self.fieldType,targetMesh,method,eps)
+        values=op.dot(numpy.asarray(self.value,dtype=numpy.float64))
+        fieldType=FieldType.FT_cellBased if method=='conservative' else FieldType.FT_vertexBased
+        return Field(targetMesh,self.fieldID,self.valueType,self.unit,self.time,values=values,fieldType=fieldType)
+
+    def integrate(self, order=2, cellwise=False):
+        """
+        Integrates the receiver over its mesh, using integration points (:obj:`IntegrationRule.GaussIntegrationRule`) evaluated for all cells of the same type at once. Integration weights of vertex (cell) values are cached in the mesh geometry cache (see :func:`Mesh.Mesh.enableGeometryCache`), so that repeated integration only costs a dot product.
+
+        :param int order: polynomial order (in local coordinates) which is integrated exactly
+        :param bool cellwise: return integrals over individual cells instead of their sum
+        :return: integral of the receiver, in receiver units (multiplied by volume unit of the mesh); if cellwise is True, (N,recordSize) array of integrals over cells
+        :rtype: Physics.PhysicalQuantity
+        """
+        values=self._giveValueArray()
+        if cellwise:
+            ret=numpy.zeros((self.mesh.getNumberOfCells(),values.shape[1]))
+            if (self.fieldType == FieldType.FT_vertexBased):
+                mci=self.mesh._giveGeometryArrays()[1][1]
+                for sel,nv,N,x,w in self.mesh._giveIntegrationPoints(order):
+                    ret[sel]=numpy.einsum('nk,nkr->nr',w.dot(N),values[mci[sel,:nv]])
+            else:
+                ret=self.mesh._giveIntegrationWeights(order)[1][:,None]*_cellValueArray(self.mesh,values)
+            return PhysicalQuantity(ret, self.unit)
+        if (self.fieldType == FieldType.FT_vertexBased): ret=self.mesh._giveIntegrationWeights(order)[0].dot(values)
+        else: ret=self.mesh._giveIntegrationWeights(order)[1].dot(_cellValueArray(self.mesh,values))
+        return PhysicalQuantity(tuple(ret), self.unit)
+
+    def getMean(self, order=2):
+        """
+        Returns mean value of the receiver over its mesh, i.e. its integral (see :func:`integrate`) divided by the mesh volume.
+
+        :param int order: integration order
+        :return: mean value
+        :rtype: Physics.PhysicalQuantity
+        """
+        volume=self.mesh._giveIntegrationWeights(order)[1].sum()
+        return PhysicalQuantity(tuple(numpy.array(self.integrate(order).getValue())/volume), self.unit)
+
+    def getL2Norm(self, order=2):
+        """
+        Returns L2 norm of the receiver over its mesh, i.e. square root of integral of squared (euclidean) norm of field values.
+
+        :param int order: integration order; note that squared values need twice the order of the field interpolation
+        :return: L2 norm
+        :rtype: Physics.PhysicalQuantity
+        """
+        values=self._giveValueArray()
+        if (self.fieldType == FieldType.FT_vertexBased):
+            mci=self.mesh._giveGeometryArrays()[1][1]
+            ret=0.
+            for sel,nv,N,x,w in self.mesh._giveIntegrationPoints(order):
+                v=numpy.einsum('qk,nkr->nqr',N,values[mci[sel,:nv]])
+                ret+=numpy.einsum('nq,nqr->',w,v*v)
+        else:
+            ret=self.mesh._giveIntegrationWeights(order)[1].dot((_cellValueArray(self.mesh,values)**2).sum(axis=1))
+        return PhysicalQuantity(numpy.sqrt(ret), self.unit)
+
+    def _giveValueArray(self):
+        """
+        Return values of the receiver as (N,recordSize) float array.
+        """
+        return numpy.asarray(self.value,dtype=numpy.float64).reshape(len(self.value),-1)
+
     def getVertexValue(self, componentID):
         """
         Returns the value associated with a given vertex component
@@ -439,6 +853,25 @@ class Field(MupifObject.MupifObject, PhysicalQuantity):
             tensor.append(numpy.reshape (i, (3,3)))
         return tensor
 
+    # attribute holding field values in the instance dictionary
+    _valueAttr='value'
+
+    def __getstate__(self):
+        """
+        Customized method returning dictionary for pickling (also used by Pyro). Values are pickled as one contiguous array, so that the payload is close to the size of the raw data; values given as list of tuples are restored as such by :func:`__setstate__`. The mesh is pickled as arrays as well, see :func:`Mesh.UnstructuredMesh.__getstate__`.
+        """
+        state=self.__dict__.copy()
+        state[self._valueAttr],asTuples=_packValues(state[self._valueAttr])
+        if asTuples: state['_valueAsTuples']=True
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restore the instance from :func:`__getstate__`.
+        """
+        if state.pop('_valueAsTuples',False): state[self._valueAttr]=[tuple(v) for v in state[self._valueAttr].tolist()]
+        self.__dict__.update(state)
+
     def dumpToLocalFile(self, fileName, protocol=pickle.HIGHEST_PROTOCOL):
         """
         Dump Field to a file using a Pickle serialization module.
@@ -652,7 +1085,7 @@ class Field(MupifObject.MupifObject, PhysicalQuantity):
         newgrp=lowestUnused(trsf=lambda i:'mesh_%02d'%i,predicate=lambda t:t in gg)
         mh5=self.getMesh().asHdf5Object(parentgroup=gg,newgroup=newgrp)
 
-        if self.value:
+        if len(self.value):
             fieldGrp=hdf.create_group(lowestUnused(trsf=lambda i,group=group: group+'/field_%02d'%i,predicate=lambda t: t in hdf))
             fieldGrp['mesh']=mh5
             fieldGrp.attrs['fieldID']=self.fieldID
@@ -663,53 +1096,55 @@ class Field(MupifObject.MupifObject, PhysicalQuantity):
             fieldGrp.attrs['units']=numpy.void(pickle.dumps(self.unit))
             fieldGrp.attrs['time']=numpy.void(pickle.dumps(self.time))
             #fieldGrp.attrs['time']=self.time.getValue()
+            # values are written as contiguous datasets, which makeFromHdf5(...,lazy=True) memory-maps
             if self.fieldType==FieldType.FT_vertexBased:
-                val=numpy.empty(shape=(self.getMesh().getNumberOfVertices(),self.getRecordSize()),dtype=numpy.float)
-                for vert in range(self.getMesh().getNumberOfVertices()): val[vert]=self.getVertexValue(vert).getValue()
-                fieldGrp['vertex_values']=val
+                fieldGrp['vertex_values']=self._giveValueArray()[:self.getMesh().getNumberOfVertices()]
             elif self.fieldType==FieldType.FT_cellBased:
-                # raise NotImplementedError("Saving cell-based fields to HDF5 is not yet implemented.")
-                val=numpy.empty(shape=(self.getMesh().getNumberOfCells(),self.getRecordSize()),dtype=numpy.float)
-                for cell in range(self.getMesh().getNumberOfCells()):
-                    val[cell]=self.getCellValue(cell)
-                fieldGrp['cell_values']=val
+                fieldGrp['cell_values']=self._giveValueArray()[:self.getMesh().getNumberOfCells()]
             else: raise RuntimeError("Unknown fieldType %d."%(self.fieldType))
 
     @staticmethod
-    def makeFromHdf5(fileName,group='component1/part1'):
+    def makeFromHdf5(fileName,group='component1/part1',lazy=False):
         """
         Restore Fields from HDF5 file.
 
+        With *lazy*, no data are read when the fields are created: each field is a :obj:`LazyField`, whose values are memory-mapped (or read, if the dataset is chunked or compressed) on first access, and meshes are restored on first access, each only once per mhash (as :obj:`Mesh.CompactUnstructuredMesh`, not building vertex and cell objects). The file stays open until all fields are loaded or deleted.
+
         :param str fileName: HDF5 file
         :param str group: HDF5 group the data will be read from (IOError is raised if the group does not exist).
+        :param bool lazy: return fields loading their data on demand
         :return: list of new :obj:`Field` instances
         :rtype: [Field,Field,...]
 
 
         .. note:: This method has not been tested yet.
         """
-        import h5py, hashlib
+        import h5py, functools
         hdf=h5py.File(fileName,'r',libver='latest')
         grp=hdf[group]
         # load mesh and field data from HDF5
         meshObjs=[obj for name,obj in grp.items() if name.startswith('mesh_')]
         fieldObjs=[obj for name,obj in grp.items() if name.startswith('field_')]
-        # construct all meshes as mupif objects
-        meshes=[Mesh.Mesh.makeFromHdf5Object(meshObj) for meshObj in meshObjs]
+        # construct all meshes as mupif objects; lazy fields construct them on demand, one per mhash
+        if lazy: meshes={}
+        else: meshes=[Mesh.Mesh.makeFromHdf5Object(meshObj) for meshObj in meshObjs]
         # construct all fields as mupif objects
         ret=[]
         for f in fieldObjs:
             if 'vertex_values' in f: fieldType,values=FieldType.FT_vertexBased,f['vertex_values']
-            elif 'cell_values' in f: fieldType,values=FieldType.FT_cellBase,f['cell_values']
-            else: ValueError("HDF5/mupif format error: unable to determine field type.")
-            fieldID,valueType,units,time=FieldID(f.attrs['fieldID']),f.attrs['valueType'],f.attrs['units'].tostring(),f.attrs['time'].tostring()
-            if units=='': units=None # special case, handled at saving time
+            elif 'cell_values' in f: fieldType,values=FieldType.FT_cellBased,f['cell_values']
+            else: raise ValueError("HDF5/mupif format error: unable to determine field type.")
+            fieldID,valueType,units,time=FieldID(f.attrs['fieldID']),f.attrs['valueType'],f.attrs['units'].tobytes(),f.attrs['time'].tobytes()
+            if units==b'': units=None # special case, handled at saving time
             else: units=pickle.loads(units)
-            if time=='': time=None # special case, handled at saving time
+            if time==b'': time=None # special case, handled at saving time
             else: time=pickle.loads(time)
-           
+            if lazy:
+                ret.append(LazyField(meshLoader=functools.partial(_giveHdf5Mesh,meshes,f['mesh']),valueLoader=functools.partial(_giveHdf5Values,values),
+                    fieldID=fieldID,units=units,time=time,valueType=valueType,fieldType=fieldType))
+                continue
             meshIndex=meshObjs.index(f['mesh']) # find which mesh object this field refers to
-            ret.append(Field(mesh=meshes[meshIndex],fieldID=fieldID,units=units,time=time,valueType=valueType,values=values,fieldType=fieldType))
+            ret.append(Field(mesh=meshes[meshIndex],fieldID=fieldID,units=units,time=time,valueType=valueType,values=values[...],fieldType=fieldType))
         return ret
 
     def toVTK2(self,fileName,format='ascii'):
@@ -791,22 +1226,22 @@ class Field(MupifObject.MupifObject, PhysicalQuantity):
         :param bool compress: apply compression to the data
         '''
         import vtk
+        from vtk.util import numpy_support
         if not fields: raise ValueError('At least one field must be passed.')
         # check if all fields are defined on the same mesh
         if len(set([f.mesh for f in fields]))!=1: raise RuntimeError('Not all fields are sharing the same Mesh object (and could not be saved to a single .vtu file')
         # convert mesh to VTK UnstructuredGrid
         mesh=fields[0].getMesh()
         vtkgrid=mesh.asVtkUnstructuredGrid()
-        # add fields as arrays
+        # add fields as arrays; values are handed over to VTK as a whole, without copying
         for f in fields:
-            arr=vtk.vtkDoubleArray()
-            arr.SetNumberOfComponents(f.getRecordSize())
-            arr.SetName(f.getFieldIDName())
             assert f.getFieldType() in (FieldType.FT_vertexBased,FieldType.FT_cellBased) # other future types not handled
             if f.getFieldType()==FieldType.FT_vertexBased: nn=mesh.getNumberOfVertices()
             else: nn=mesh.getNumberOfCells()
-            arr.SetNumberOfValues(nn)
-            for i in range(nn): arr.SetTuple(i,f._giveValue(i).getValue())
+            values=numpy.ascontiguousarray(f._giveValueArray()[:nn])
+            if values.shape!=(nn,f.getRecordSize()): raise ValueError("Field '%s' has %d values of size %d, %d values of size %d expected."%(f.getFieldIDName(),values.shape[0],values.shape[1],nn,f.getRecordSize()))
+            arr=numpy_support.numpy_to_vtk(values,deep=0,array_type=vtk.VTK_DOUBLE)
+            arr.SetName(f.getFieldIDName())
             if f.getFieldType()==FieldType.FT_vertexBased: vtkgrid.GetPointData().AddArray(arr)
             else: vtkgrid.GetCellData().AddArray(arr)
         # write the unstructured grid to file
@@ -815,7 +1250,7 @@ class Field(MupifObject.MupifObject, PhysicalQuantity):
         if ascii: writer.SetDataModeToAscii()
         writer.SetFileName(fileName)
         # change between VTK5 and VTK6
-        if vtk.vtkVersion().GetVTKMajorVersion()==6: writer.SetInputData(vtkgrid)
+        if vtk.vtkVersion().GetVTKMajorVersion()>=6: writer.SetInputData(vtkgrid)
         else: writer.SetInput(vtkgrid)
         writer.Write()
         # finito
@@ -906,3 +1341,67 @@ class Field(MupifObject.MupifObject, PhysicalQuantity):
 #                value = getattr(self, attr)
 #                setattr(dpcpy, attr, copy.deepcopy(value, memo))
 #        return dpcpy
+
+
+def _packValues(value):
+    """
+    Return field values for pickling as (values, asTuples): values given as list of tuples of the same length are converted to one contiguous array (asTuples is True), arrays are made contiguous; other values are returned as they are.
+    """
+    if isinstance(value,numpy.ndarray):
+        # memory-mapped values are pickled as regular arrays
+        return (numpy.array(value) if isinstance(value,numpy.memmap) else numpy.ascontiguousarray(value)),False
+    if isinstance(value,list) and value and all(type(v) is tuple for v in value) and len(set(len(v) for v in value))==1:
+        try: return numpy.array(value,dtype=numpy.float64),True
+        except (ValueError,TypeError): pass
+    return value,False
+
+
+@Pyro4.expose
+class LazyField(Field):
+    """
+    Field whose mesh and values are only obtained when first accessed, e.g. when opening large result files (see :func:`Field.makeFromHdf5`). Once loaded, the instance behaves as a regular :obj:`Field`; it is loaded completely when pickled.
+
+    .. automethod:: __init__
+    """
+    def __init__(self, meshLoader, valueLoader, fieldID, valueType, units, time, fieldType=FieldType.FT_vertexBased):
+        """
+        Initializes the field instance.
+
+        :param callable meshLoader: called without arguments to return the mesh
+        :param callable valueLoader: called without arguments to return field values
+        :param FieldID fieldID: Field type (displacement, strain, temperature ...)
+        :param ValueType valueType: Type of field values (scalear, vector, tensor)
+        :param Physics.PhysicalUnits units: Field value units
+        :param Physics.PhysicalQuantity time: Time associated with field values
+        :param FieldType fieldType: Optional, determines field type (values specified as vertex or cell values), default is FT_vertexBased
+        """
+        super(LazyField, self).__init__(mesh=None, fieldID=fieldID, valueType=valueType, units=units, time=time, values=(), fieldType=fieldType)
+        self._mesh,self._meshLoader=None,meshLoader
+        self._value,self._valueLoader=None,valueLoader
+
+    @property
+    def mesh(self):
+        if self._meshLoader is not None: self._mesh,self._meshLoader=self._meshLoader(),None
+        return self._mesh
+    @mesh.setter
+    def mesh(self, mesh): self._mesh,self._meshLoader=mesh,None
+
+    @property
+    def value(self):
+        if self._valueLoader is not None: self._value,self._valueLoader=self._valueLoader(),None
+        return self._value
+    @value.setter
+    def value(self, value): self._value,self._valueLoader=value,None
+
+    def isLoaded(self):
+        """
+        :return: True if both mesh and values were already loaded
+        :rtype: bool
+        """
+        return self._meshLoader is None and self._valueLoader is None
+
+    _valueAttr='_value'
+
+    def __getstate__(self):
+        self.mesh,self.value # trigger loading
+        return Field.__getstate__(self)
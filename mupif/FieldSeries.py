@@ -0,0 +1,397 @@
+#
+#           MuPIF: Multi-Physics Integration Framework
+#               Copyright (C) 2010-2015 Borek Patzak
+#
+#    Czech Technical University, Faculty of Civil Engineering,
+#  Department of Structural Mechanics, 166 29 Prague, Czech Republic
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor,
+# Boston, MA  02110-1301  USA
+#
+"""
+Time series of fields stored in a single HDF5 file.
+
+The HDF hierarchy is like this::
+
+    group
+      |
+      +--- mesh_01 {mhash=25aa0aa04457}
+      |      +--- [vertex_coords]
+      |      +--- [cell_types]
+      |      \\--- [cell_vertices]
+      +--- FID_Temperature {fieldID,valueType,fieldType,units}
+      |      +--- -> mesh_01
+      |      +--- [time] {units}
+      |      \\--- [values]
+      +--- FID_Displacement
+      |      +--- -> mesh_01
+      |      +--- [time]
+      |      \\--- [values]
+      \\--- ...
+
+where ``[time]`` is (nsteps,) array of times and ``[values]`` is (nsteps,n,recordSize) array of field values, n being the number of vertices or cells; both are extendible along the first axis and chunked by steps, so that appending a step does not touch data already written. Meshes are written by :func:`Mesh.Mesh.asHdf5Object` and hardlinked (``->``) from all series defined on them.
+
+:obj:`XdmfWriter` writes the same layout and an XDMF file referring to it, so that the series can be opened in ParaView and other XDMF readers.
+"""
+from builtins import object
+import os
+import functools
+import numpy
+from xml.sax.saxutils import quoteattr
+from . import CellGeometryType
+from . import Field
+from . import Mesh
+from .fieldID import FieldID
+from .Physics import PhysicalQuantities
+
+# XDMF topology types of cell geometry types
+_xdmfCellTypes = {
+    CellGeometryType.CGT_TRIANGLE_1: 4,
+    CellGeometryType.CGT_QUAD: 5,
+    CellGeometryType.CGT_TETRA: 6,
+    CellGeometryType.CGT_HEXAHEDRON: 9,
+    CellGeometryType.CGT_TRIANGLE_2: 36,
+}
+# XDMF attribute types by number of components
+_xdmfAttributeTypes = {1: 'Scalar', 3: 'Vector', 6: 'Tensor6', 9: 'Tensor'}
+
+def _unitName(unit):
+    """
+    Return name of the unit, which can be turned into the unit again with :func:`_unitFromName`.
+    """
+    return unit.name() if PhysicalQuantities.isPhysicalUnit(unit) else str(unit)
+
+def _unitFromName(name):
+    """
+    Return physical unit with given name, see :func:`_unitName`.
+    """
+    if name=='1': return PhysicalQuantities.getDimensionlessUnit()
+    return PhysicalQuantities._findUnit(name)
+
+
+class FieldSeriesWriter(object):
+    """
+    Writer of time series of fields into HDF5; see the module documentation for the file layout.
+
+    The file is kept open between writes. Each field ID is one series, which is appended a step by :func:`append`; all fields of the same series must be defined on meshes with the same number of vertices (cells). Every mesh is stored only once, meshes are recognized by their object identity (a mesh modified in place after its first write must be passed as a new object). Data can be appended to series already present in the file, e.g. when restarting a computation.
+
+    The writer can be used as context manager, which closes the file at exit. See :func:`Workflow.Workflow.addFieldSeries` for appending fields while a workflow is being solved.
+
+    .. automethod:: __init__
+    """
+    def __init__(self, fileName, group='series', compression='gzip', compressionLevel=4, chunkSize=2**20, libver='latest'):
+        """
+        Opens the file (which is created if it does not exist).
+
+        :param str fileName: HDF5 file
+        :param str group: HDF5 group the series are written under
+        :param str compression: compression filter of value datasets (``None`` for no compression)
+        :param int compressionLevel: level of the compression, where applicable
+        :param int chunkSize: approximate size of value chunks in bytes; chunks never span more than one step
+        :param libver: HDF5 file format version bounds, see h5py.File
+        """
+        import h5py
+        self.fileName=fileName
+        self.hdf=h5py.File(fileName,'a',libver=libver)
+        self.group=self.hdf.require_group(group)
+        self.compression=compression
+        self.compressionLevel=compressionLevel if compression=='gzip' else None
+        self.chunkSize=chunkSize
+        # stored meshes, by mhash (the group is scanned only once, here) and by id of mesh objects already written
+        self.meshGroups=dict((g.attrs['mhash'],g) for name,g in self.group.items() if name.startswith('mesh_'))
+        self.meshIds={}
+
+    def __enter__(self): return self
+    def __exit__(self, exc_type, exc_value, traceback): self.close()
+
+    def _giveMeshGroup(self, mesh):
+        """
+        Return HDF5 group of the mesh, writing the mesh if not yet stored.
+        """
+        if id(mesh) in self.meshIds: return self.meshIds[id(mesh)][1]
+        mhash=mesh.internalArraysDigest()
+        if mhash not in self.meshGroups:
+            i=len(self.meshGroups)+1
+            while 'mesh_%02d'%i in self.group: i+=1
+            self.meshGroups[mhash]=mesh.asHdf5Object(parentgroup=self.group,newgroup='mesh_%02d'%i)
+        # keep the mesh referenced, so that its id is not reused by another object
+        self.meshIds[id(mesh)]=(mesh,self.meshGroups[mhash])
+        return self.meshGroups[mhash]
+
+    def _giveSeriesGroup(self, field, time, n, recordSize):
+        """
+        Return HDF5 group of the series the field belongs to, creating it if not existing.
+        """
+        name=FieldID(field.getFieldID()).name
+        if name in self.group:
+            grp=self.group[name]
+            if grp['values'].shape[1:]!=(n,recordSize): raise ValueError("Field '%s' has %d values of size %d, but the series stored has %d values of size %d."%((name,n,recordSize)+grp['values'].shape[1:]))
+            return grp
+        grp=self.group.create_group(name)
+        grp['mesh']=self._giveMeshGroup(field.getMesh())
+        grp.attrs['fieldID']=int(field.getFieldID())
+        grp.attrs['valueType']=field.getValueType()
+        grp.attrs['fieldType']=field.getFieldType()
+        grp.attrs['units']=_unitName(field.getUnits())
+        rows=max(1,min(n,self.chunkSize//(8*recordSize)))
+        grp.create_dataset('values',shape=(0,n,recordSize),maxshape=(None,n,recordSize),dtype=numpy.float64,chunks=(1,rows,recordSize),
+            compression=self.compression,compression_opts=self.compressionLevel,shuffle=self.compression is not None)
+        tt=grp.create_dataset('time',shape=(0,),maxshape=(None,),dtype=numpy.float64,chunks=(1024,))
+        tt.attrs['units']=_unitName(time.unit) if PhysicalQuantities.isPhysicalQuantity(time) else ''
+        return grp
+
+    def append(self, field, time=None):
+        """
+        Append the field as a new step of its series.
+
+        :param Field field: field to be written
+        :param time: time of the step; the field's time is used if not given; float is taken in units of the series; steps without time are stored as NaN
+        :type time: Physics.PhysicalQuantity or float
+        :return: index of the step written
+        :rtype: int
+        """
+        if field.getFieldType() not in (Field.FieldType.FT_vertexBased,Field.FieldType.FT_cellBased): raise ValueError("Unknown fieldType %d."%(field.getFieldType()))
+        values=field._giveValueArray()
+        if time is None: time=field.getTime()
+        grp=self._giveSeriesGroup(field,time,values.shape[0],values.shape[1])
+        tt,vv=grp['time'],grp['values']
+        if PhysicalQuantities.isPhysicalQuantity(time):
+            if tt.attrs['units']:
+                factor,offset=time.unit.conversionTupleTo(_unitFromName(tt.attrs['units']))
+                time=(time.getValue()+offset)*factor
+            else: time=time.getValue()
+        elif time is None: time=numpy.nan
+        step=tt.shape[0]
+        tt.resize((step+1,))
+        vv.resize(step+1,axis=0)
+        tt[step]=time
+        vv[step]=values
+        return step
+
+    def appendFields(self, fields, time=None):
+        """
+        Append all fields, each to its series, see :func:`append`.
+
+        :param [Field,] fields: fields to be written
+        :param time: time of the step; the field's time is used if not given
+        """
+        for f in fields: self.append(f,time)
+
+    def flush(self):
+        """
+        Write buffered data to the disk, so that the file can be read while the writer is still open.
+        """
+        self.hdf.flush()
+
+    def close(self):
+        """
+        Close the file. No data can be written afterwards.
+        """
+        if self.hdf:
+            self.hdf.close()
+            self.hdf=self.group=None
+            self.meshIds.clear()
+            self.meshGroups.clear()
+
+
+class FieldSeriesReader(object):
+    """
+    Reader of time series of fields written by :obj:`FieldSeriesWriter`. Each mesh is restored only once and shared by all fields defined on it.
+
+    .. automethod:: __init__
+    """
+    def __init__(self, fileName, group='series'):
+        """
+        Opens the file for reading.
+
+        :param str fileName: HDF5 file
+        :param str group: HDF5 group the series were written under (KeyError is raised if the group does not exist)
+        """
+        import h5py
+        self.hdf=h5py.File(fileName,'r',libver='latest')
+        self.group=self.hdf[group]
+        self.meshes={}
+
+    def __enter__(self): return self
+    def __exit__(self, exc_type, exc_value, traceback): self.close()
+
+    def _giveSeries(self, fieldID):
+        return self.group[FieldID(fieldID).name]
+
+    def getFieldIDs(self):
+        """
+        :return: IDs of all series stored
+        :rtype: [FieldID,]
+        """
+        return [FieldID(g.attrs['fieldID']) for name,g in self.group.items() if 'fieldID' in g.attrs]
+
+    def getNumberOfSteps(self, fieldID):
+        """
+        :param FieldID fieldID: series ID
+        :return: number of steps of the series
+        :rtype: int
+        """
+        return self._giveSeries(fieldID)['time'].shape[0]
+
+    def getTimes(self, fieldID):
+        """
+        :param FieldID fieldID: series ID
+        :return: times of all steps of the series
+        :rtype: numpy.array
+        """
+        return self._giveSeries(fieldID)['time'][...]
+
+    def getMesh(self, fieldID):
+        """
+        :param FieldID fieldID: series ID
+        :return: mesh of the series, restored on the first call
+        :rtype: Mesh.Mesh
+        """
+        m=self._giveSeries(fieldID)['mesh']
+        mhash=m.attrs['mhash']
+        if mhash not in self.meshes: self.meshes[mhash]=Mesh.Mesh.makeFromHdf5Object(m,compact=True)
+        return self.meshes[mhash]
+
+    def getField(self, fieldID, step=-1, lazy=False):
+        """
+        Return field of the series at given step.
+
+        :param FieldID fieldID: series ID
+        :param int step: step index; negative values count from the end
+        :param bool lazy: return :obj:`Field.LazyField`, which reads the mesh and values of the step only when accessed
+        :return: new field, with values as (n,recordSize) numpy.array
+        :rtype: Field.Field
+        """
+        grp=self._giveSeries(fieldID)
+        tt=grp['time']
+        step=range(tt.shape[0])[step] # raises IndexError if out of range
+        time=tt[step]
+        if tt.attrs['units']: time=PhysicalQuantities.PhysicalQuantity(time,_unitFromName(tt.attrs['units']))
+        kw=dict(fieldID=FieldID(grp.attrs['fieldID']),valueType=grp.attrs['valueType'],units=_unitFromName(grp.attrs['units']),time=time,fieldType=grp.attrs['fieldType'])
+        if lazy: return Field.LazyField(meshLoader=functools.partial(self.getMesh,fieldID),valueLoader=functools.partial(grp['values'].__getitem__,step),**kw)
+        return Field.Field(mesh=self.getMesh(fieldID),values=grp['values'][step],**kw)
+
+    def close(self):
+        """
+        Close the file.
+        """
+        if self.hdf:
+            self.hdf.close()
+            self.hdf=self.group=None
+
+
+class XdmfWriter(FieldSeriesWriter):
+    """
+    Writer of time series of fields into HDF5 (see :obj:`FieldSeriesWriter`), with an XDMF index which visualization tools (such as ParaView) open directly.
+
+    Meshes are written once and values of every step are appended to the series datasets; the XDMF file only refers to them (values of a step by a hyperslab of the series). Steps of all series having the same time value (in the units of the series) are put into the same grid of the temporal collection. The XDMF file is regenerated from the HDF5 content by :func:`flush` and :func:`close`, and also covers data appended in earlier runs.
+
+    Supported cell geometry types are linear triangles, quads, tetrahedra, hexahedra and quadratic triangles.
+
+    .. automethod:: __init__
+    """
+    def __init__(self, fileName, hdf5FileName=None, group='series', libver=('earliest','v110'), **kw):
+        """
+        :param str fileName: XDMF file
+        :param str hdf5FileName: HDF5 file (*fileName* with the ``.h5`` extension by default), should be in the same directory as the XDMF file
+        :param str group: HDF5 group the series are written under
+        :param libver: HDF5 file format version bounds; the default keeps the file readable by older HDF5 libraries bundled with visualization tools
+        :param kw: other parameters passed to :obj:`FieldSeriesWriter`
+        """
+        self.xdmfFileName=fileName
+        if hdf5FileName is None: hdf5FileName=os.path.splitext(fileName)[0]+'.h5'
+        FieldSeriesWriter.__init__(self,hdf5FileName,group=group,libver=libver,**kw)
+        self.hdf5Ref=os.path.relpath(hdf5FileName,os.path.dirname(os.path.abspath(fileName)) or '.')
+
+    def _giveTopology(self, meshGroup):
+        """
+        Return dataset with XDMF mixed topology of the mesh (for each cell its XDMF type followed by vertex numbers), creating it if needed.
+        """
+        if 'xdmf_topology' in meshGroup: return meshGroup['xdmf_topology']
+        mct,mci=meshGroup['cell_types'][...],meshGroup['cell_vertices'][...]
+        xct=numpy.full(mct.shape[0],-1,dtype=numpy.int64)
+        for cgt,xt in _xdmfCellTypes.items(): xct[mct==cgt]=xt
+        if (xct<0).any(): raise ValueError('Cell geometry types %s cannot be written to XDMF.'%numpy.unique(mct[xct<0]).tolist())
+        # cell type and vertices row by row, then entries of unused (-1) vertices are dropped
+        tt=numpy.hstack((xct[:,None],mci.reshape(mct.shape[0],-1)))
+        return meshGroup.create_dataset('xdmf_topology',data=tt[tt>=0])
+
+    def _dataItem(self, dataset, dims=None):
+        dims=dataset.shape if dims is None else dims
+        nt={'f':'Float','i':'Int','u':'UInt'}[dataset.dtype.kind]
+        return '<DataItem Dimensions="%s" NumberType="%s" Precision="%d" Format="HDF">%s:%s</DataItem>'%(' '.join(str(d) for d in dims),nt,dataset.dtype.itemsize,self.hdf5Ref,dataset.name)
+
+    def _gridXml(self, name, meshGroup, attrs, time=None):
+        """
+        Return XML of uniform grid on the mesh with given attributes, which are (series group, step) pairs.
+        """
+        mvc,topo=meshGroup['vertex_coords'],self._giveTopology(meshGroup)
+        ret=['<Grid Name=%s GridType="Uniform">'%quoteattr(name),
+            '<Topology TopologyType="Mixed" NumberOfElements="%d">%s</Topology>'%(meshGroup['cell_types'].shape[0],self._dataItem(topo)),
+            '<Geometry GeometryType="%s">%s</Geometry>'%('XYZ' if mvc.shape[1]==3 else 'XY',self._dataItem(mvc))]
+        if time is not None: ret.insert(1,'<Time Value="%.17g"/>'%time)
+        for grp,step in attrs:
+            vv=grp['values']
+            n,rs=vv.shape[1:]
+            ret+=['<Attribute Name=%s AttributeType="%s" Center="%s">'%(quoteattr(grp.name.split('/')[-1].replace('FID_','',1)),_xdmfAttributeTypes.get(rs,'Matrix'),'Node' if grp.attrs['fieldType']==Field.FieldType.FT_vertexBased else 'Cell'),
+                '<DataItem ItemType="HyperSlab" Dimensions="%d %d">'%(n,rs),
+                '<DataItem Dimensions="3 3" Format="XML">%d 0 0 1 1 1 1 %d %d</DataItem>'%(step,n,rs),
+                self._dataItem(vv),'</DataItem>','</Attribute>']
+        ret.append('</Grid>')
+        return ret
+
+    def writeXdmf(self):
+        """
+        Write the XDMF file describing all series stored in the HDF5 file. Called by :func:`flush`.
+
+        Steps stored without time (NaN) are grouped by their index in the series, which is written as their time (after the timed steps).
+        """
+        # (series group, step) of each time, grouped by mesh; keyed by (0,time), or (1,step) for steps without time
+        steps={}
+        for name,grp in self.group.items():
+            if 'fieldID' not in grp.attrs: continue
+            mhash=grp['mesh'].attrs['mhash']
+            for step,t in enumerate(grp['time'][...].tolist()):
+                key=(1,step) if numpy.isnan(t) else (0,t)
+                steps.setdefault(key,{}).setdefault(mhash,[]).append((grp,step))
+        # steps are spatial collections if there is more than one mesh, so that all steps are of the same kind
+        spatial=len(set(mhash for ss in steps.values() for mhash in ss))>1
+        xml=['<?xml version="1.0" ?>','<Xdmf Version="2.0">','<Domain>','<Grid Name="series" GridType="Collection" CollectionType="Temporal">']
+        for i,key in enumerate(sorted(steps.keys())):
+            t=key[1]
+            meshes=sorted(steps[key].items(),key=lambda m: self.meshGroups[m[0]].name)
+            if not spatial:
+                xml+=self._gridXml('step_%d'%i,self.meshGroups[meshes[0][0]],meshes[0][1],time=t)
+                continue
+            xml+=['<Grid Name="step_%d" GridType="Collection" CollectionType="Spatial">'%i,'<Time Value="%.17g"/>'%t]
+            for mhash,attrs in meshes: xml+=self._gridXml('step_%d_%s'%(i,self.meshGroups[mhash].name.split('/')[-1]),self.meshGroups[mhash],attrs)
+            xml.append('</Grid>')
+        xml+=['</Grid>','</Domain>','</Xdmf>','']
+        with open(self.xdmfFileName,'w') as f: f.write('\n'.join(xml))
+
+    def flush(self):
+        """
+        Write the XDMF file and buffered data to the disk, so that results can be viewed while the writer is still open.
+        """
+        if self.hdf:
+            self.writeXdmf()
+            FieldSeriesWriter.flush(self)
+
+    def close(self):
+        """
+        Write the XDMF file and close the HDF5 file. No data can be written afterwards.
+        """
+        self.flush()
+        FieldSeriesWriter.close(self)
@@ -24,6 +24,7 @@ from __future__ import division
 from builtins import object
 
 from . import CellGeometryType
+from . import APIError
 
 class IntegrationRule(object):
     """ 
@@ -58,7 +59,7 @@ class GaussIntegrationRule(IntegrationRule):
         """
         See :func:`IntegrationRule.getIntegrationPoints`.
         """
-        if (cgt == CellGeometryType.CGT_TRIANGLE_1):
+        if (cgt == CellGeometryType.CGT_TRIANGLE_1 or cgt == CellGeometryType.CGT_TRIANGLE_2):
             if (npt == 1):
                 return [((0.333333333333, 0.333333333333), 0.5)]
             elif (npt == 3):
@@ -83,6 +84,34 @@ class GaussIntegrationRule(IntegrationRule):
 
             else:
                 raise APIError.APIError("getIntegrationPoints (CGT_QUAD, %d) not implemented"%(npt))
+        elif (cgt == CellGeometryType.CGT_TETRA):
+            if (npt == 1):
+                return [((0.25, 0.25, 0.25), 0.166666666666667)]
+            elif (npt == 4):
+                return [((0.585410196624968, 0.138196601125010, 0.138196601125010), 0.041666666666667),
+                        ((0.138196601125010, 0.585410196624968, 0.138196601125010), 0.041666666666667),
+                        ((0.138196601125010, 0.138196601125010, 0.585410196624968), 0.041666666666667),
+                        ((0.138196601125010, 0.138196601125010, 0.138196601125010), 0.041666666666667)]
+            elif (npt == 5):
+                return [((0.250000000000000, 0.250000000000000, 0.250000000000000), -0.133333333333333),
+                        ((0.500000000000000, 0.166666666666667, 0.166666666666667),  0.075000000000000),
+                        ((0.166666666666667, 0.500000000000000, 0.166666666666667),  0.075000000000000),
+                        ((0.166666666666667, 0.166666666666667, 0.500000000000000),  0.075000000000000),
+                        ((0.166666666666667, 0.166666666666667, 0.166666666666667),  0.075000000000000)]
+            else:
+                raise APIError.APIError("getIntegrationPoints (CGT_TETRA, %d) not implemented"%(npt))
+        elif (cgt == CellGeometryType.CGT_HEXAHEDRON):
+            # tensor product of 1D Gauss rules
+            if (npt == 1):
+                return [((0.0, 0.0, 0.0), 8.0)]
+            elif (npt == 8):
+                g = (-0.577350269189626, 0.577350269189626)
+                return [((u, v, w), 1) for u in g for v in g for w in g]
+            elif (npt == 27):
+                g = ((-0.774596669241483, 0.555555555555556), (0.0, 0.888888888888889), (0.774596669241483, 0.555555555555556))
+                return [((u, v, w), wu*wv*ww) for (u, wu) in g for (v, wv) in g for (w, ww) in g]
+            else:
+                raise APIError.APIError("getIntegrationPoints (CGT_HEXAHEDRON, %d) not implemented"%(npt))
         else:
             raise APIError.APIError("getIntegrationPoints: geometry not supported")
 
@@ -90,7 +119,7 @@ class GaussIntegrationRule(IntegrationRule):
         """
         See :func:`IntegrationRule.getRequiredNumberOfPoints`.
         """
-        if (cgt == CellGeometryType.CGT_TRIANGLE_1):
+        if (cgt == CellGeometryType.CGT_TRIANGLE_1 or cgt == CellGeometryType.CGT_TRIANGLE_2):
             if ( order <= 1 ):
                 return 1
             elif ( order <= 2 ):
@@ -105,5 +134,21 @@ class GaussIntegrationRule(IntegrationRule):
                 return -1;
             else:
                 return requiredNIP*2
+        elif (cgt == CellGeometryType.CGT_TETRA):
+            if ( order <= 1 ):
+                return 1
+            elif ( order <= 2 ):
+                return 4
+            elif ( order <= 3 ):
+                return 5
+            else:
+                return -1
+        elif (cgt == CellGeometryType.CGT_HEXAHEDRON):
+            # points per direction; the jacobian of trilinear geometry is not constant, use at least 2
+            requiredNIP = max( ( order + 2 ) // 2, 2 )
+            if (requiredNIP > 3):
+                return -1
+            else:
+                return requiredNIP**3
 
 
@@ -0,0 +1,109 @@
+# 
+#           MuPIF: Multi-Physics Integration Framework 
+#               Copyright (C) 2010-2015 Borek Patzak
+# 
+#    Czech Technical University, Faculty of Civil Engineering,
+#  Department of Structural Mechanics, 166 29 Prague, Czech Republic
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, 
+# Boston, MA  02110-1301  USA
+#
+from builtins import object
+
+import numpy
+import logging
+from . import Field
+from .Physics.PhysicalQuantities import PhysicalQuantity
+log = logging.getLogger()
+
+class InterpolationPlan(object):
+    """
+    Precomputed operator interpolating vertex-based fields defined on a fixed mesh into a fixed set of points.
+
+    Cell search and conversion to local coordinates are done only once, when the plan is constructed; the containing cell and shape function weights of every point are stored as a sparse (CSR) matrix of shape (number of points, number of mesh vertices). Applying the plan to a field is then a single sparse matrix-vector product. Requires scipy.
+
+    Typical use is repeated data transfer between two fixed meshes, e.g. evaluating a temperature field at target mesh vertices in every time step::
+
+        plan=InterpolationPlan(thermalMesh,mechanicalMesh.getVertices())
+        for step in ...:
+            t=plan.apply(thermal.getField(FieldID.FID_Temperature,time))
+
+    .. automethod:: __init__
+    """
+    def __init__(self, mesh, points, eps=0.0):
+        """
+        Constructor; locates all points in the mesh and assembles the interpolation matrix.
+
+        :param Mesh mesh: source mesh
+        :param points: (N,3) numpy.array (or sequence) of 1D/2D/3D target positions
+        :param float eps: Optional tolerance by which cell bounding boxes are enlarged
+        :except: ValueError if some position is not inside any cell
+        """
+        import scipy.sparse
+        points=numpy.array(points,dtype=numpy.float64,ndmin=2)
+        cells,weights=mesh.locatePoints(points,eps)
+        missing=numpy.nonzero(cells<0)[0]
+        if missing.size:
+            log.error('InterpolationPlan: no source cell found for %d positions, first at %s'%(missing.size,str(points[missing[0]])))
+            raise ValueError('InterpolationPlan: no source cell found for position ' + str(points[missing[0]]))
+        mci=mesh.getCells()[1][cells]
+        rows=numpy.repeat(numpy.arange(points.shape[0]),mci.shape[1]).reshape(mci.shape)
+        valid=mci>=0 # excess vertices (-1) are not stored
+        self.matrix=scipy.sparse.csr_matrix((weights[valid],(rows[valid],mci[valid])),shape=(points.shape[0],mesh.getNumberOfVertices()))
+        self.mesh=mesh
+        self.cells=cells
+
+    def getMesh(self):
+        """
+        :return: Returns the source mesh
+        :rtype: Mesh
+        """
+        return self.mesh
+
+    def getNumberOfPoints(self):
+        """
+        :return: Returns the number of target points
+        :rtype: int
+        """
+        return self.matrix.shape[0]
+
+    def getCells(self):
+        """
+        :return: Returns indices of source cells containing target points
+        :rtype: numpy.array
+        """
+        return self.cells
+
+    def getMatrix(self):
+        """
+        :return: Returns the interpolation matrix of shape (number of points, number of mesh vertices)
+        :rtype: scipy.sparse.csr_matrix
+        """
+        return self.matrix
+
+    def apply(self, field):
+        """
+        Evaluates given field at all target points.
+
+        :param Field field: vertex-based field defined on the source mesh (or on a mesh with identical vertex numbering)
+        :return: field values as (N,recordSize) numpy.array
+        :rtype: Physics.PhysicalQuantity
+        :except: TypeError for cell-based fields, ValueError if the field mesh does not match the plan
+        """
+        if field.getFieldType()!=Field.FieldType.FT_vertexBased:
+            raise TypeError('InterpolationPlan: only vertex-based fields can be interpolated')
+        if field.getMesh() is not self.mesh and field.getMesh().getNumberOfVertices()!=self.matrix.shape[1]:
+            raise ValueError('InterpolationPlan: field mesh has %d vertices, plan was built for %d'%(field.getMesh().getNumberOfVertices(),self.matrix.shape[1]))
+        return PhysicalQuantity(self.matrix.dot(numpy.asarray(field.value,dtype=numpy.float64)),field.getUnits())
@@ -24,6 +24,7 @@ from __future__ import absolute_import
 from builtins import str, range, object
 
 import threading
+import bisect
 import subprocess
 import socket
 import time as timeTime
@@ -39,12 +40,6 @@ JOBMAN_ERR = 99
 
 #
 # TODO:
-#  - locking for thread safe operation lock.acquire()
-#    try:
-#       ... access shared resource
-#    finally:
-#       lock.release() # release lock, no matter what
-#
 #  - how to kill the locked threads > this is an issue
 
 
@@ -71,27 +66,61 @@ class JobManager(object):
     * To cancel the given job
     * To register its interface to pyro name server
 
+    Requests which can not be served immediately wait in a queue, see :func:`allocateJob`. Waiting requests block the calling thread, so the job manager has to be served by a thread pool based daemon (see :func:`PyroUtil.runDaemon`).
+
+    Besides the number of jobs, the job manager may account for resources (cores, memory, ...) the jobs declare in :func:`allocateJob`. Cores are assigned as particular CPUs, so that the jobs can be pinned to them.
+
     .. automethod:: __init__
     """
-    def __init__ (self, appName, jobManWorkDir, maxJobs=1):
+    def __init__ (self, appName, jobManWorkDir, maxJobs=1, resources=None):
         """
         Constructor. Initializes the receiver.
 
         :param str appName: Name of receiver (used also by NS)
         :param str jobManWorkDir: Absolute path for storing data, if necessary
         :param int maxJobs: Maximum number of jobs to run simultaneously
+        :param dict resources: optional resources available for jobs, e.g. {'cores': 16, 'memory': 64000}. Cores are given by their number (the first CPUs available to job manager are used) or as a list of CPU ids. Other resources are amounts in arbitrary units (e.g. MB of memory). If not given, only maxJobs limits the jobs.
+        :except: ValueError if more cores are given than available
         """
         self.applicationName = appName
         self.maxJobs = maxJobs
+        # available resources, and CPU ids if cores are given
+        self.resources = {}
+        self.cpuIDs = None
+        for name, value in (resources or {}).items():
+            if name == 'cores':
+                if isinstance(value, int):
+                    available = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count()))
+                    if value > len(available):
+                        raise ValueError('%d cores requested, only %d available' % (value, len(available)))
+                    value = available[:value]
+                self.cpuIDs = sorted(value)
+                value = len(self.cpuIDs)
+            self.resources[name] = value
+        # resources assigned to pending and active jobs
+        self.jobResources = {}
         self.activeJobs = {}  # dictionary of active jobs
+        self.pendingJobs = {}  # jobs being started, their resources are allocated already
         self.jobManWorkDir = jobManWorkDir
+        self.lock = threading.Lock()
+        # notified when resources are freed or the queue changes
+        self.resourcesFreed = threading.Condition(self.lock)
+        # requests waiting for resources as (-priority, request number, user, time of arrival, requested resources), sorted
+        self.queue = []
+        self.requestCounter = 0
+        # average duration of finished jobs (used to estimate waiting time) and number of finished jobs
+        self.avgJobDuration = None
+        self.finishedJobs = 0
 
-    def allocateJob (self, user, natPort):
+    def allocateJob (self, user, natPort, wait=0., priority=0, resources=None):
         """
         Allocates a new job.
 
         :param str user: user name
         :param int natPort: NAT port used in ssh tunnel
+        :param float wait: maximum time in seconds to wait in queue for resources, None means no limit. By default, JobManNoResourcesException is raised immediately if there are no resources available.
+        :param int priority: requests with higher priority are served first, requests of the same priority in order of arrival
+        :param dict resources: resources required by the job, e.g. {'cores': 4, 'memory': 2000}, see :func:`__init__`. A job requires a single core if not given otherwise (and cores are managed).
 
         :return: tuple (error code, None). errCode = (JOBMAN_OK, JOBMAN_ERR, JOBMAN_NO_RESOURCES).             JOBMAN_OK indicates sucessfull allocation and JobID contains the PYRO name, under which the new instance is registered (composed of application name and a job number (allocated by jobmanager), ie, Miccress23). JOBMAN_ERR indicates an internal error, JOBMAN_NO_RESOURCES means that job manager is not able to allocate new instance of application (no more recources available)
         :rtype: tuple
@@ -100,6 +129,160 @@ class JobManager(object):
         log.debug('JobManager:allocateJob is abstract')
         return (JOBMAN_ERR, None)
 
+    def _resourceRequest(self, resources):
+        """
+        Checks the resources required by a job, see :func:`allocateJob`.
+
+        :param dict resources: required resources
+        :return: required resources, including the default ones
+        :rtype: dict
+        :except: JobManException if resource is not managed, JobManNoResourcesException if more is required than available in total
+        """
+        request = dict(resources or {})
+        if 'cores' in self.resources:
+            request.setdefault('cores', 1)
+        for name, amount in request.items():
+            if name not in self.resources:
+                raise JobManException('%s: resource %s is not available' % (self.__class__.__name__, name))
+            if amount > self.resources[name]:
+                raise JobManNoResourcesException('%s: %s %s required, only %s available' % (self.__class__.__name__, amount, name, self.resources[name]))
+        return request
+
+    def _freeResources(self):
+        """
+        :return: amounts of resources not assigned to jobs
+        :rtype: dict
+        """
+        free = dict(self.resources)
+        for assigned in self.jobResources.values():
+            for name, amount in assigned.items():
+                free[name] -= len(amount) if name == 'cores' else amount
+        return free
+
+    def _hasResources(self, request=None):
+        """
+        :param dict request: resources required by the job
+        :return: True if resources for a new job are available
+        :rtype: bool
+        """
+        if len(self.activeJobs)+len(self.pendingJobs) >= self.maxJobs:
+            return False
+        free = self._freeResources()
+        return all(amount <= free[name] for name, amount in (request or {}).items())
+
+    def _waitForResources(self, user, wait=0., priority=0, resources=None):
+        """
+        Waits in the queue until the request is first and resources for a new job are available. Must be called with :attr:`lock` acquired. Requests are not overtaken by smaller ones, which keeps the queue fair for large jobs.
+
+        See :func:`allocateJob` for parameters.
+
+        :return: required resources, to be assigned by :func:`_assignResources`
+        :rtype: dict
+        :except: JobManNoResourcesException if resources are not available within given time
+        """
+        self.requestCounter += 1
+        request = (-priority, self.requestCounter, user, timeTime.time(), self._resourceRequest(resources))
+        bisect.insort(self.queue, request)
+        try:
+            deadline = None if wait is None else request[3]+wait
+            while self.queue[0] is not request or not self._hasResources(request[4]):
+                remaining = None if deadline is None else deadline-timeTime.time()
+                if remaining is not None and remaining <= 0:
+                    log.error('%s: no more resources, activeJobs:%d, pendingJobs:%d, maxJobs:%d, queued requests:%d' % (self.__class__.__name__, len(self.activeJobs), len(self.pendingJobs), self.maxJobs, len(self.queue)))
+                    raise JobManNoResourcesException('%s: no more resources' % self.__class__.__name__)
+                self.resourcesFreed.wait(remaining)
+        finally:
+            self.queue.remove(request)
+            # the next request may be served
+            self.resourcesFreed.notify_all()
+        return request[4]
+
+    def _assignResources(self, jobID, request):
+        """
+        Assigns resources to a job. Must be called with :attr:`lock` acquired, after :func:`_waitForResources`.
+
+        Cores are assigned from the smallest block of neighbouring free CPUs the job fits in, so that free blocks are kept for large jobs; if there is no such block, the lowest free CPUs are used.
+
+        :param str jobID: job
+        :param dict request: required resources
+        :return: assigned resources, cores as a list of CPU ids
+        :rtype: dict
+        """
+        assigned = dict(request)
+        if 'cores' in request:
+            used = set(cpu for res in self.jobResources.values() for cpu in res.get('cores', ()))
+            free = [cpu for cpu in self.cpuIDs if cpu not in used]
+            blocks = []
+            for cpu in free:
+                if blocks and cpu == blocks[-1][-1]+1:
+                    blocks[-1].append(cpu)
+                else:
+                    blocks.append([cpu])
+            fitting = [block for block in blocks if len(block) >= request['cores']]
+            assigned['cores'] = (min(fitting, key=len) if fitting else free)[:request['cores']]
+        self.jobResources[jobID] = assigned
+        return assigned
+
+    def _releaseResources(self, jobID):
+        """
+        Releases resources of a job and wakes up waiting requests. Must be called with :attr:`lock` acquired.
+
+        :param str jobID: job
+        """
+        self.jobResources.pop(jobID, None)
+        self.resourcesFreed.notify_all()
+
+    def _jobFinished(self, jobID, startTime):
+        """
+        Records the duration of finished job, releases its resources and wakes up waiting requests. Must be called with :attr:`lock` acquired.
+
+        :param str jobID: job
+        :param float startTime: time the job was started
+        """
+        self._releaseResources(jobID)
+        duration = timeTime.time()-startTime
+        self.finishedJobs += 1
+        if self.avgJobDuration is None:
+            self.avgJobDuration = duration
+        else:
+            self.avgJobDuration += (duration-self.avgJobDuration)/self.finishedJobs
+        self.resourcesFreed.notify_all()
+
+    def _queueStatus(self, startTimes):
+        """
+        Returns the status of requests waiting in the queue. The waiting time is estimated from the average duration of finished jobs, assuming that waiting requests are served one after another as the running jobs finish.
+
+        :param startTimes: start times of the active jobs
+        :return: a list of tuples (None, waiting time, user, position in queue, estimated wait or None if unknown, required resources)
+        :rtype: a list of (None, float, str, int, float, dict)
+        """
+        tnow = timeTime.time()
+        queue = list(self.queue)
+        slots = None
+        if self.avgJobDuration is not None and self.maxJobs > 0:
+            # times when the (running or free) job slots become available
+            slots = sorted([max(self.avgJobDuration-(tnow-start), 0.) for start in startTimes]+[0.]*max(self.maxJobs-len(startTimes), 0))
+        status = []
+        for position, request in enumerate(queue):
+            estimate = None
+            if slots:
+                estimate = slots[position%len(slots)]+(position//len(slots))*self.avgJobDuration
+            status.append((None, tnow-request[3], request[2], position, estimate, request[4]))
+        return status
+
+    def getResourceUtilisation(self):
+        """
+        Returns the utilisation of resources by running and starting jobs.
+
+        :return: dictionary of resource name: (used, available), including 'jobs': (number of jobs, maxJobs)
+        :rtype: dict
+        """
+        with self.lock:
+            free = self._freeResources()
+            utilisation = dict((name, (amount-free[name], amount)) for name, amount in self.resources.items())
+            utilisation['jobs'] = (len(self.activeJobs)+len(self.pendingJobs), self.maxJobs)
+        return utilisation
+
     def terminateJob (self, jobID):
         """
         Terminates the given job, frees the associated recources.
@@ -121,6 +304,7 @@ class JobManager(object):
         """
     def getStatus (self):
         """
+        Returns the status of running jobs, followed by the status of requests waiting in the queue, see :func:`_queueStatus`. See also :func:`getResourceUtilisation`.
         """
     def getNSName (self):
         return self.applicationName
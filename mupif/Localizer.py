@@ -61,3 +61,40 @@ class Localizer(object):
         :rtype: tuple
         """
         return []
+
+    def asHdf5Object(self, parentgroup, newgroup):
+        """
+        Return the instance as HDF5 object. Complementary to :obj:`makeFromHdf5Object` which will restore the instance from that data.
+
+        This is only supported by localizers which are stored in flat arrays (their state returned by ``__getstate__`` consists of numpy arrays and scalars), such as :obj:`Octree.BulkOctree` and :obj:`PointLocalizer.PointLocalizer`.
+
+        :param parentgroup: hdf5 group in which the new group is created
+        :param str newgroup: name of the new group
+        :return: the new group
+        """
+        import numpy
+        gg=parentgroup.create_group(name=newgroup)
+        for name,data in self.__getstate__().items():
+            if data is None: continue
+            if isinstance(data,numpy.ndarray): gg[name]=data
+            else: gg.attrs[name]=data
+        gg.attrs['__class__']=self.__class__.__name__
+        gg.attrs['__module__']=self.__class__.__module__
+        return gg
+
+    @staticmethod
+    def makeFromHdf5Object(h5obj):
+        """
+        Create new localizer instance from given hdf5 object. Complementary to :obj:`asHdf5Object`.
+
+        :return: new instance
+        :rtype: :obj:`Localizer` subclass
+        """
+        import importlib
+        klass=getattr(importlib.import_module(h5obj.attrs['__module__']),h5obj.attrs['__class__'])
+        ret=klass.__new__(klass)
+        state=dict((name,h5obj[name][...]) for name in h5obj.keys())
+        state.update((name,val) for name,val in h5obj.attrs.items() if name not in ('__class__','__module__'))
+        ret.__setstate__(state)
+        return ret
+
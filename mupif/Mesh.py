@@ -25,10 +25,15 @@ from builtins import str, zip, range, object
 
 from . import APIError
 from . import Octree
+from . import Localizer
+from .Octree import _raggedArange
+from . import PointLocalizer
+from .PointLocalizer import _pointArray
 from . import BBox
 import copy
 import time
 import sys
+import itertools
 import numpy
 import Pyro4
 from . import CellGeometryType
@@ -102,6 +107,43 @@ class MeshIterator(object):
             """
             return self.__next__()   #Python 2.x compatibility
 
+
+# VTK cell types (names of constants in the vtk module) of supported cell geometry types
+_vtkCellTypes={
+    CellGeometryType.CGT_TRIANGLE_1: 'VTK_TRIANGLE',
+    CellGeometryType.CGT_QUAD:       'VTK_QUAD',
+    CellGeometryType.CGT_TETRA:      'VTK_TETRA',
+    CellGeometryType.CGT_HEXAHEDRON: 'VTK_HEXAHEDRON',
+    CellGeometryType.CGT_TRIANGLE_2: 'VTK_QUADRATIC_TRIANGLE',
+}
+
+class GeometryCache(object):
+    """
+    Per-cell geometric data of a mesh, kept as contiguous arrays so that point location and integration do not recompute them for every query; see :func:`Mesh.enableGeometryCache`. Items are computed on first use and kept until :func:`clear` is called.
+
+    The class contains:
+
+    * arrays: vertex coordinates and cells, as returned by :func:`Mesh.getVertices` and :func:`Mesh.getCells`
+    * centroids: (N,3) array of cell centroids
+    * volumes: (N,) array of cell volumes (areas of 2D cells)
+    * affineMaps: tuple (index,maps); maps is a dictionary of inverse maps of cells with affine geometry (see :func:`Cell.Cell.affineMapBatch`) keyed by cell geometry type, index is (N,) array giving row of each cell in the maps of its type (-1 for cells without affine geometry)
+    * integrationPoints: dictionary of integration points of all cells (see :func:`Mesh._giveIntegrationPoints`) keyed by integration order
+    * cellNumbers: tuple holding cell numbers as returned by :func:`Mesh._giveCellNumbers`
+    """
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        """
+        Drop all cached data.
+        """
+        self.arrays=None
+        self.centroids=None
+        self.volumes=None
+        self.affineMaps=None
+        self.integrationPoints=None
+        self.cellNumbers=None
+
 @Pyro4.expose         
 class Mesh(object):
     """
@@ -115,6 +157,9 @@ class Mesh(object):
     """
     def __init__(self):
         self.mapping = None
+        self.geometryCache = None
+        # cached result of internalArraysDigest, dropped with the geometry cache
+        self.arraysDigest = None
 
     @classmethod
     def loadFromLocalFile(cls,fileName):
@@ -173,10 +218,14 @@ class Mesh(object):
 
         .. note:: This method has not been tested yet.
         """
-        nv=self.getNumberOfVertices()
-        ret=numpy.empty((nv,3),dtype=numpy.float)
-        for i in range(0,nv):
-            ret[i]=numpy.array(self.getVertex(i).getCoordinates())
+        coords=[self.getVertex(i).getCoordinates() for i in range(self.getNumberOfVertices())]
+        try:
+            ret=numpy.array(coords,dtype=numpy.float64).reshape(len(coords),-1)
+            # 2D coordinates are padded by zero
+            if ret.shape[1]<=3: return numpy.hstack((ret,numpy.zeros((ret.shape[0],3-ret.shape[1])))) if ret.shape[1]<3 else ret
+        except ValueError: pass # coordinates of different dimensions, or no vertices
+        ret=numpy.zeros((len(coords),3),dtype=numpy.float64)
+        for i,c in enumerate(coords): ret[i,:len(c)]=c # 2D coordinates are padded by zero
         return ret
 
     def getCell(self, i):
@@ -190,33 +239,314 @@ class Mesh(object):
 
     def getCells(self):
         """
-        Return all cells as 2x numpy.array; each i-th row contains vertex indices for i-th cell. Does in 2 passes, first to determine maximum number of vertices per cell (to shape the field accordingly). For cells with less vertices than the maximum, excess ones are assigned the invalid value of -1.
+        Return all cells as 2x numpy.array; each i-th row contains vertex indices for i-th cell. For cells with less vertices than the maximum, excess ones are assigned the invalid value of -1; so is cell type of cells without geometry type.
 
         :return: (cell_types,cell_vertices)
         :rtype: (numpy.array,numpy.array)
 
         .. note:: This method has not been tested yet.
         """
-        # determine the maximum number of vertices
-        mnv=0
         nc=self.getNumberOfCells()
-        for i in range(nc): mnv=max(mnv,self.getCell(i).getNumberOfVertices())
-        tt,cc=numpy.empty(shape=(nc,),dtype=numpy.int),numpy.full(shape=(nc,mnv),fill_value=-1,dtype=numpy.int)
-        for i in range(nc):
-            c=self.getCell(i)
-            tt[i]=c.getGeometryType()
-            vv=numpy.array([v.getNumber() for v in c.getVertices()],dtype=numpy.int)
-            cc[i,:len(vv)]=vv # excess elements in the row stay at -1
+        cells=[self.getCell(i) for i in range(nc)]
+        # abstract cells have no geometry type
+        tt=numpy.array([-1 if cgt is None else cgt for cgt in (c.getGeometryType() for c in cells)],dtype=numpy.int64).reshape(nc)
+        counts=numpy.array([len(c.vertices) for c in cells],dtype=numpy.int64).reshape(nc)
+        try: conn=numpy.fromiter(itertools.chain.from_iterable(c.vertices for c in cells),dtype=numpy.int64,count=counts.sum())
+        except TypeError:
+            # vertices are normally stored as numbers; fetch numbers of Vertex instances otherwise
+            conn=numpy.array([v if isinstance(v,(int,numpy.integer)) else v.getNumber() for c in cells for v in c.vertices],dtype=numpy.int64)
+        cc=numpy.full(shape=(nc,counts.max() if nc else 0),fill_value=-1,dtype=numpy.int64)
+        cc[numpy.repeat(numpy.arange(nc),counts),_raggedArange(counts)]=conn # excess elements in rows stay at -1
         return tt,cc
 
+    def getCellBBoxes(self, relPad=1e-5):
+        """
+        Return bounding boxes of all cells as (N,2,3) numpy.array; [i,0] and [i,1] are lower left and upper right corners of the i-th cell. The boxes are padded in the same way as :func:`Cell.Cell.getBBox`.
+
+        :param float relPad: relative padding of the box (see :func:`Cell.Cell.getBBox`)
+        :return: cell bounding boxes
+        :rtype: numpy.array
+        """
+        mvc,(mct,mci)=self._giveGeometryArrays()
+        if mci.shape[0]==0: return numpy.empty((0,2,3),dtype=numpy.float64)
+        # excess (-1) entries are replaced by the first vertex of the cell, which does not change the box
+        xyz=mvc[numpy.where(mci>=0,mci,mci[:,:1])]
+        ll,ur=xyz.min(axis=1),xyz.max(axis=1)
+        if relPad:
+            sizes=ur-ll
+            # replace zero size by maximum for the purposes of padding
+            sizes=numpy.where(sizes==0,sizes.max(axis=1)[:,None],sizes)
+            ll,ur=ll-relPad*sizes,ur+relPad*sizes
+        return numpy.stack((ll,ur),axis=1)
+
+    def getCellCentroids(self):
+        """
+        Return centroids of all cells, computed as average of cell vertex coordinates.
+
+        :return: (N,3) array of cell centroids
+        :rtype: numpy.array
+        """
+        def compute():
+            mvc,(mct,mci)=self._giveGeometryArrays()
+            if mci.shape[0]==0: return numpy.empty((0,3),dtype=numpy.float64)
+            valid=(mci>=0)
+            xyz=mvc[numpy.where(valid,mci,0)]*valid[:,:,None]
+            return xyz.sum(axis=1)/valid.sum(axis=1)[:,None]
+        return self._giveCachedGeometry('centroids',compute)
+
+    def getCellVolumes(self):
+        """
+        Return volumes (areas of 2D cells) of all cells, computed by :func:`Cell.Cell.evalVolumeBatch` for all cells of the same type at once.
+
+        :return: (N,) array of cell volumes; nan for cell types not supporting the computation
+        :rtype: numpy.array
+        """
+        def compute():
+            from . import Cell
+            mvc,(mct,mci)=self._giveGeometryArrays()
+            ret=numpy.full(mct.shape[0],numpy.nan)
+            for cgt,sel,nv in self._giveCellTypeGroups(mct,mci):
+                try: ret[sel]=Cell.Cell.getClassForCellGeometryType(cgt).evalVolumeBatch(mvc[mci[sel,:nv]])
+                except NotImplementedError: pass
+            return ret
+        return self._giveCachedGeometry('volumes',compute)
+
+    def enableGeometryCache(self, enable=True):
+        """
+        Switch caching of per-cell geometric data (see :obj:`GeometryCache`) on or off. The cache is off by default; it pays off when the mesh is queried repeatedly (point location, field evaluation, integration), at the cost of keeping the arrays in memory.
+
+        The cache is cleared when the mesh is changed through its methods (e.g. setup, merge). Code changing vertex coordinates in place must call :func:`invalidateGeometryCache` (which also drops the digest cached by :func:`internalArraysDigest`).
+
+        :param bool enable: True to switch the cache on, False to switch it off and drop cached data
+        """
+        if not enable: self.geometryCache=None
+        elif getattr(self,'geometryCache',None) is None: self.geometryCache=GeometryCache()
+
+    def invalidateGeometryCache(self):
+        """
+        Drop cached geometric data, if the cache is enabled (see :func:`enableGeometryCache`), and the cached digest (see :func:`internalArraysDigest`); they will be recomputed on next use.
+        """
+        if getattr(self,'geometryCache',None) is not None: self.geometryCache.clear()
+        self.arraysDigest=None
+
+    def _giveCachedGeometry(self, name, compute):
+        """
+        Return item of the geometry cache, computing it by compute() if not cached yet; if the cache is disabled, just return compute().
+        """
+        cache=getattr(self,'geometryCache',None)
+        if cache is None: return compute()
+        if getattr(cache,name) is None: setattr(cache,name,compute())
+        return getattr(cache,name)
+
+    def _giveGeometryArrays(self):
+        """
+        Return (vertices,(cellTypes,cells)) as from :func:`getVertices` and :func:`getCells`, cached if the geometry cache is enabled.
+        """
+        return self._giveCachedGeometry('arrays',lambda: (self.getVertices(),self.getCells()))
+
+    def _giveCellNumbers(self):
+        """
+        Return numbers of all cells, which index values of cell-based fields (see :func:`Field.Field._evaluate`), cached if the geometry cache is enabled.
+
+        :return: (N,) array of cell numbers, or None if i-th cell has number i for all cells
+        :rtype: numpy.array
+        """
+        def compute():
+            nc=self.getNumberOfCells()
+            numbers=numpy.fromiter((self.getCell(i).number for i in range(nc)),dtype=numpy.int64,count=nc)
+            return (None if numpy.array_equal(numbers,numpy.arange(nc)) else numbers,)
+        return self._giveCachedGeometry('cellNumbers',compute)[0]
+
+    def _giveAffineMaps(self):
+        """
+        Return inverse maps of cells with affine geometry, see :obj:`GeometryCache`.
+        """
+        def compute():
+            from . import Cell
+            mvc,(mct,mci)=self._giveGeometryArrays()
+            index=numpy.full(mct.shape[0],-1,dtype=numpy.int64)
+            maps={}
+            for cgt,sel,nv in self._giveCellTypeGroups(mct,mci):
+                try: maps[cgt]=Cell.Cell.getClassForCellGeometryType(cgt).affineMapBatch(mvc[mci[sel,:nv]])
+                except NotImplementedError: continue
+                index[sel]=numpy.arange(sel.size)
+            return index,maps
+        return self._giveCachedGeometry('affineMaps',compute)
+
+    def _giveIntegrationPoints(self, order):
+        """
+        Return integration points of all cells, given by :obj:`IntegrationRule.GaussIntegrationRule`. Global coordinates, shape functions and jacobians are evaluated for all cells of the same type at once.
+
+        :param int order: polynomial order (in local coordinates) which is integrated exactly
+        :return: list of (sel,nv,N,x,w) tuples, one for each cell geometry type, where sel are indices of the cells, nv their number of vertices, N is (nq,nv) array of shape functions at the nq integration points, x is (len(sel),nq,3) array of global coordinates of the points and w is (len(sel),nq) array of integration weights multiplied by the jacobian
+        :rtype: list
+        :except: APIError if there is no integration rule of the order for some cell type
+        """
+        cached=self._giveCachedGeometry('integrationPoints',dict)
+        if order in cached: return cached[order]
+        from . import Cell
+        from . import IntegrationRule
+        rule=IntegrationRule.GaussIntegrationRule()
+        mvc,(mct,mci)=self._giveGeometryArrays()
+        ret=[]
+        for cgt,sel,nv in self._giveCellTypeGroups(mct,mci):
+            klass=Cell.Cell.getClassForCellGeometryType(cgt)
+            npt=rule.getRequiredNumberOfPoints(cgt,order)
+            if npt is None or npt<0: raise APIError.APIError('Mesh::integrate - no integration rule of order %d for cell geometry type %d'%(order,cgt))
+            pnts=rule.getIntegrationPoints(cgt,int(npt))
+            lc=numpy.array([p[0] for p in pnts],dtype=numpy.float64)
+            N=klass.evalNBatch(lc)
+            vc=mvc[mci[sel,:nv]]
+            x=numpy.matmul(N,vc)
+            w=numpy.empty((sel.size,lc.shape[0]))
+            for q in range(lc.shape[0]):
+                w[:,q]=pnts[q][1]*numpy.fabs(klass.evalJacobianBatch(vc,lc[q]))
+            ret.append((sel,nv,N,x,w))
+        cached[order]=ret
+        return ret
+
+    def _giveIntegrationWeights(self, order):
+        """
+        Return weights integrating functions interpolated from vertex values or given by cell values: integral of such function is dot product of its values with the weights.
+
+        :param int order: integration order, see :func:`_giveIntegrationPoints`
+        :return: (vertexWeights,cellWeights) arrays of shape (nVertices,) and (nCells,)
+        :rtype: (numpy.array, numpy.array)
+        """
+        cached=self._giveCachedGeometry('integrationPoints',dict)
+        if ('weights',order) in cached: return cached[('weights',order)]
+        mci=self._giveGeometryArrays()[1][1]
+        vertexWeights=numpy.zeros(self.getNumberOfVertices())
+        cellWeights=numpy.zeros(mci.shape[0])
+        for sel,nv,N,x,w in self._giveIntegrationPoints(order):
+            cellWeights[sel]=w.sum(axis=1)
+            vertexWeights+=numpy.bincount(mci[sel,:nv].ravel(),weights=w.dot(N).ravel(),minlength=vertexWeights.shape[0])
+        cached[('weights',order)]=(vertexWeights,cellWeights)
+        return vertexWeights,cellWeights
+
+    def integrate(self, func, order=2, cellwise=False):
+        """
+        Integrates a function over the mesh, using :obj:`IntegrationRule.GaussIntegrationRule` in all cells. The function is called once for all integration points of cells of the same type.
+
+        :param func: function taking (M,3) array of global coordinates and returning (M,) or (M,k) array of values
+        :param int order: polynomial order (in local coordinates) which is integrated exactly
+        :param bool cellwise: return integrals over individual cells instead of their sum
+        :return: integral of func over the mesh, or (N,...) array of integrals over cells if cellwise is True
+        :rtype: float or numpy.array
+        """
+        ret=None
+        for sel,nv,N,x,w in self._giveIntegrationPoints(order):
+            values=numpy.asarray(func(x.reshape(-1,3)),dtype=numpy.float64)
+            values=values.reshape(w.shape+values.shape[1:])
+            integrals=numpy.einsum('nq,nq...->n...',w,values)
+            if ret is None: ret=numpy.zeros((self.getNumberOfCells(),)+integrals.shape[1:])
+            ret[sel]=integrals
+        if ret is None: ret=numpy.zeros((self.getNumberOfCells(),))
+        return ret if cellwise else ret.sum(axis=0)
+
+    @staticmethod
+    def _giveCellTypeGroups(mct,mci):
+        """
+        Return list of (cgt,sel,nv) for all cell geometry types in mct (abstract cells are skipped), where sel are indices of cells of that type and nv is their number of vertices.
+        """
+        ret=[]
+        for cgt in numpy.unique(mct):
+            if cgt<0: continue
+            sel=numpy.nonzero(mct==cgt)[0]
+            ret.append((int(cgt),sel,int(numpy.count_nonzero(mci[sel[0]]>=0))))
+        return ret
+
+    def _giveCellCandidates(self, points, eps=0.0):
+        """
+        Return all (point,cell) pairs where the point lies in the bounding box of the cell.
+
+        All points are looked up at once in the cell localizer if it is :obj:`Octree.BulkOctree`; otherwise a temporary one is built from :func:`getCellBBoxes`.
+
+        :param numpy.array points: (N,3) array of points
+        :param float eps: tolerance by which cell bounding boxes are enlarged
+        :return: (ip,ic) arrays of point and cell indices
+        :rtype: (numpy.array, numpy.array)
+        """
+        loc=self.giveCellLocalizer() if hasattr(self,'giveCellLocalizer') else None
+        if not isinstance(loc,Octree.BulkOctree): loc=Octree.BulkOctree(self.getCellBBoxes())
+        return loc.giveItemIndicesInBBoxes(points-eps,points+eps)
+
+    def _locatePointsInCells(self, points, eps=0.0):
+        """
+        Find all cells containing given points and evaluate their shape functions at those points.
+
+        Candidate cells are found by :func:`_giveCellCandidates`; candidates are then grouped by cell geometry type and tested using :func:`Cell.Cell.glob2locBatch` (or :func:`Cell.Cell.glob2locAffineBatch` with cached maps of affine cells, if the geometry cache is enabled). Cell types without vectorized implementation fall back to per-cell :func:`Cell.Cell.containsPoint` and :func:`Cell.Cell.interpolate`.
+
+        :param points: (N,3) array of points
+        :param float eps: tolerance by which cell bounding boxes are enlarged
+        :return: (ip,ic,weights) where ip and ic are point and cell indices of all matching pairs and weights is (len(ip),mnv) array of shape function values, ordered as cell vertices in :func:`getCells` (padded by zeros)
+        :rtype: (numpy.array, numpy.array, numpy.array)
+        """
+        from . import Cell
+        points=_pointArray(points)
+        mvc,(mct,mci)=self._giveGeometryArrays()
+        if getattr(self,'geometryCache',None) is not None: affineIndex,affineMaps=self._giveAffineMaps()
+        else: affineIndex,affineMaps=None,{}
+        ip,ic=self._giveCellCandidates(points,eps)
+        weights=numpy.zeros((ip.size,mci.shape[1]),dtype=numpy.float64)
+        found=numpy.zeros(ip.size,dtype=bool)
+        for cgt in numpy.unique(mct[ic]):
+            sel=numpy.nonzero(mct[ic]==cgt)[0]
+            klass=Cell.Cell.getClassForCellGeometryType(cgt)
+            nv=numpy.count_nonzero(mci[ic[sel[0]]]>=0)
+            pts=points[ip[sel]]
+            try:
+                if cgt in affineMaps: lc,inside=klass.glob2locAffineBatch(affineMaps[cgt][affineIndex[ic[sel]]],pts)
+                else: lc,inside=klass.glob2locBatch(mvc[mci[ic[sel],:nv]],pts)
+                w=klass.evalNBatch(lc[inside])
+            except NotImplementedError:
+                inside=numpy.zeros(sel.size,dtype=bool)
+                w=numpy.empty((0,nv))
+                ident=numpy.eye(nv)
+                rows=[]
+                for j in range(sel.size):
+                    cell=self.getCell(ic[sel[j]])
+                    if cell.containsPoint(pts[j]):
+                        inside[j]=True
+                        rows.append(cell.interpolate(pts[j],ident))
+                if rows: w=numpy.array(rows,dtype=numpy.float64)
+            weights[sel[inside],:nv]=w
+            found[sel[inside]]=True
+        return ip[found],ic[found],weights[found]
+
+    def locatePoints(self, points, eps=0.0):
+        """
+        Vectorized point location: for each point, find a cell containing it and evaluate shape functions of that cell at the point.
+
+        :param points: (N,3) array (or sequence) of 1D/2D/3D position vectors
+        :param float eps: Optional tolerance by which cell bounding boxes are enlarged
+        :return: (cells,weights) where cells is (N,) array of cell indices (-1 for points outside of the mesh) and weights is (N,mnv) array of shape function values, ordered as cell vertices in :func:`getCells` (padded by zeros)
+        :rtype: (numpy.array, numpy.array)
+        """
+        points=_pointArray(points)
+        ip,ic,w=self._locatePointsInCells(points,eps)
+        cells=numpy.full(points.shape[0],-1,dtype=numpy.int64)
+        weights=numpy.zeros((points.shape[0],w.shape[1]),dtype=numpy.float64)
+        # a point may be inside several cells (on shared boundaries): take the first match
+        first=numpy.unique(ip,return_index=True)[1]
+        cells[ip[first]]=ic[first]
+        weights[ip[first]]=w[first]
+        return cells,weights
+
     def internalArraysDigest(self):
-        '''Internal function returning hash digest of all internal data, for the purposes of identity test.'''
+        '''
+        Internal function returning hash digest of all internal data, for the purposes of identity test.
+
+        The digest is computed on the first call and cached until the mesh is changed through its methods (setup, merge); code changing the mesh in place must call :func:`invalidateGeometryCache`.
+        '''
+        if getattr(self,'arraysDigest',None) is not None: return self.arraysDigest
         def numpyHash(*args):
             'Return concatenated hash (hexdigest) of all args, which must be numpy arrays. This function is used to find an identical mesh which was already stored.'
             import hashlib
-            return ''.join([hashlib.sha1(arr.view(numpy.uint8)).hexdigest() for arr in args])
-        mvc,(mct,mci)=self.getVertices(),self.getCells()
-        return 'mesh_'+numpyHash(mvc,mct,mci)
+            return ''.join([hashlib.sha1(numpy.ascontiguousarray(arr).view(numpy.uint8)).hexdigest() for arr in args])
+        mvc,(mct,mci)=self._giveGeometryArrays()
+        self.arraysDigest='mesh_'+numpyHash(mvc,mct,mci)
+        return self.arraysDigest
 
     def asHdf5Object(self,parentgroup,newgroup):
         '''Return the instance as HDF5 object. Complementary to :obj:`makeFromHdf5Object` which will restore the instance from that data.'''
@@ -229,15 +559,20 @@ class Mesh(object):
         mvc,(mct,mci)=self.getVertices(),self.getCells()
         for name,data in ('vertex_coords',mvc),('cell_types',mct),('cell_vertices',mci): gg[name]=data
         gg.attrs['mhash']=mhash
+        # store localizers which were already built, so that they don't have to be rebuilt after loading
+        if hasattr(self,'_validateLocalizers'): self._validateLocalizers()
+        for name,loc in ('vertex_localizer',getattr(self,'vertexOctree',None)),('cell_localizer',getattr(self,'cellOctree',None)):
+            if isinstance(loc,(PointLocalizer.PointLocalizer,Octree.BulkOctree)): loc.asHdf5Object(gg,name).attrs['mhash']=mhash
         gg.attrs['__class__']=self.__class__.__name__
         gg.attrs['__module__']=self.__class__.__module__
         return gg
 
     @staticmethod
-    def makeFromHdf5Object(h5obj):
+    def makeFromHdf5Object(h5obj,compact=False):
         """
         Create new :obj:`Mesh` instance from given hdf5 object. Complementary to :obj:`asHdf5Object`.
 
+        :param bool compact: restore :obj:`UnstructuredMesh` (and subclasses) as :obj:`CompactUnstructuredMesh`, which is created from the stored arrays directly
         :return: new instance
         :rtype: :obj:`Mesh` or its subclass
         """
@@ -246,15 +581,26 @@ class Mesh(object):
         from mupif.Vertex import Vertex
         from mupif.Cell import Cell
         klass=getattr(importlib.import_module(h5obj.attrs['__module__']),h5obj.attrs['__class__'])
+        if compact and issubclass(klass,UnstructuredMesh): klass=CompactUnstructuredMesh
         ret=klass()
         mvc,mct,mci=h5obj['vertex_coords'],h5obj['cell_types'],h5obj['cell_vertices']
-        # construct vertices
-        vertices=[Vertex(number=vi,label=None,coords=tuple(mvc[vi])) for vi in range(mvc.shape[0])]
-        cells=[Cell.getClassForCellGeometryType(mct[ci])(mesh=ret,number=ci,label=None,
-            # vertices=tuple(mci[ci])
-            vertices=[vertices[i] for i in mci[ci]]
-            ) for ci in range(mct.shape[0])]
-        ret.setup(vertexList=vertices,cellList=cells)
+        if isinstance(ret,CompactUnstructuredMesh):
+            ret.setupFromArrays(vertexCoords=mvc[...],cellTypes=mct[...],cellConnectivity=mci[...])
+        else:
+            # construct vertices
+            vertices=[Vertex(number=vi,label=None,coords=tuple(mvc[vi])) for vi in range(mvc.shape[0])]
+            # cells refer to vertices by number (excess -1 entries are dropped); some cell types don't handle Vertex instances in glob2loc
+            mci=mci[...]
+            cells=[Cell.getClassForCellGeometryType(mct[ci])(mesh=ret,number=ci,label=None,
+                vertices=tuple(int(i) for i in mci[ci] if i>=0)
+                ) for ci in range(mct.shape[0])]
+            ret.setup(vertexList=vertices,cellList=cells)
+        # restore stored localizers; they are validated against mesh data on first use
+        if isinstance(ret,UnstructuredMesh):
+            for name,attr in ('vertex_localizer','vertexOctree'),('cell_localizer','cellOctree'):
+                if name in h5obj and h5obj[name].attrs['mhash']==h5obj.attrs['mhash']:
+                    setattr(ret,attr,Localizer.Localizer.makeFromHdf5Object(h5obj[name]))
+                    ret.localizerDigest=h5obj.attrs['mhash']
         return ret
 
     def asVtkUnstructuredGrid(self):
@@ -264,30 +610,33 @@ class Mesh(object):
         .. note:: This method uses the compiled vtk module (which is a wrapper atop the c++ VTK library) -- in contrast to :obj:`UnstructuredMesh.getVTKRepresentation`, which uses the pyvtk module (python-only implementation of VTK i/o supporting only VTK File Format version 2).
         '''
         import vtk
-        # vertices
+        from vtk.util import numpy_support
+        mvc,(mct,mci)=self._giveGeometryArrays()
+        # vertices; the coordinate array is handed over to VTK without copying
         pts=vtk.vtkPoints()
-        for ip in range(self.getNumberOfVertices()): pts.InsertNextPoint(self.getVertex(ip).getCoordinates())
-        # cells
-        cells,cellTypes=vtk.vtkCellArray(),[]
-        for ic in range(self.getNumberOfCells()):
-            c=self.getCell(ic)
-            cgt=c.getGeometryType()
-            cellGeomTypeMap={
-                CellGeometryType.CGT_TRIANGLE_1: (vtk.vtkTriangle,vtk.VTK_TRIANGLE),
-                CellGeometryType.CGT_QUAD:       (vtk.vtkQuad,vtk.VTK_QUAD),
-                CellGeometryType.CGT_TETRA:      (vtk.vtkTetra,vtk.VTK_TETRA),
-                CellGeometryType.CGT_HEXAHEDRON: (vtk.vtkHexahedron,vtk.VTK_HEXAHEDRON),
-                CellGeometryType.CGT_TRIANGLE_2: (vtk.vtkQuadraticTriangle,vtk.VTK_QUADRATIC_TRIANGLE)
-            }
-            c2klass,c2type=cellGeomTypeMap[cgt] # instantiate the VTK cell with the correct type
-            c2=c2klass()
-            verts=c.getVertices() # those should be all instances of Vertex...? Hopefully so.
-            for i,v in enumerate(verts): c2.GetPointIds().SetId(i,v.getNumber())
-            cells.InsertNextCell(c2)
-            cellTypes.append(c2type)
+        pts.SetData(numpy_support.numpy_to_vtk(numpy.ascontiguousarray(mvc,dtype=numpy.float64),deep=0))
+        # cells: types are mapped in bulk, connectivity is the cell-vertex array with padding (-1) removed
+        cgtMap=numpy.full(max(_vtkCellTypes)+1,-1,dtype=numpy.int64)
+        for cgt,vtkName in _vtkCellTypes.items(): cgtMap[cgt]=getattr(vtk,vtkName)
+        cellTypes=numpy.full(mct.shape[0],-1,dtype=numpy.int64)
+        known=(mct>=0)&(mct<cgtMap.shape[0])
+        cellTypes[known]=cgtMap[mct[known]]
+        if (cellTypes<0).any(): raise KeyError('Cell geometry type %s not supported by VTK export'%mct[numpy.argmax(cellTypes<0)])
+        cellTypes=cellTypes.astype(numpy.uint8)
+        counts=numpy.count_nonzero(mci>=0,axis=1)
+        conn=mci[mci>=0].astype(numpy.int64) # row-major order keeps vertices of each cell together
+        cells=vtk.vtkCellArray()
+        if vtk.vtkVersion().GetVTKMajorVersion()>=9:
+            offsets=numpy.zeros(counts.shape[0]+1,dtype=numpy.int64)
+            numpy.cumsum(counts,out=offsets[1:])
+            cells.SetData(numpy_support.numpy_to_vtkIdTypeArray(offsets,deep=0),numpy_support.numpy_to_vtkIdTypeArray(conn,deep=0))
+        else:
+            # legacy layout: number of vertices followed by vertex ids, for each cell
+            legacy=numpy.insert(conn,numpy.cumsum(counts)-counts,counts)
+            cells.SetCells(counts.shape[0],numpy_support.numpy_to_vtkIdTypeArray(legacy,deep=0))
         ret=vtk.vtkUnstructuredGrid()
         ret.SetPoints(pts)
-        ret.SetCells(cellTypes,cells)
+        ret.SetCells(numpy_support.numpy_to_vtk(cellTypes,deep=0,array_type=vtk.VTK_UNSIGNED_CHAR),cells)
         return ret
 
         
@@ -380,6 +729,8 @@ class UnstructuredMesh(Mesh):
         #label2local_number maps
         self.vertexDict   = None
         self.cellDict     = None
+        #digest of mesh data the localizers were built for, set on localizers restored from pickle/hdf5 until validated
+        self.localizerDigest = None
 
     def setup (self, vertexList, cellList):
         """
@@ -390,6 +741,7 @@ class UnstructuredMesh(Mesh):
         """
         self.vertexList = vertexList
         self.cellList = cellList
+        self.invalidateGeometryCache()
 
     def copy(self):
         """
@@ -408,15 +760,84 @@ class UnstructuredMesh(Mesh):
     def __getstate__(self):
         '''Customized method returning dictionary for pickling.
 
-        We don't want to pickle (and pass over the wire) cell and vertex localizers -- those may be based on c++ fastOctant, which the other side does not necessarily support.
+        Cell and vertex localizers stored in flat arrays (:obj:`Octree.BulkOctree`, :obj:`PointLocalizer.PointLocalizer`) are pickled with the mesh, so that the receiving side (e.g. over Pyro) does not have to rebuild them; they are stored together with :func:`Mesh.internalArraysDigest` of the mesh and validated against it on first use (see :func:`_validateLocalizers`). Other localizers (e.g. based on c++ fastOctant, which the other side does not necessarily support) are set to ``None``.
 
-        Therefore return ``__dict__`` (that's what pickle does in the absence of ``__getstate__``) but with ``vertexOctree`` and ``cellOctree`` set to ``None``.
+        Vertices and cells are pickled as arrays (see :func:`_packItems`) and re-created by :func:`__setstate__`; vertex coordinates are restored as tuples of floats (of the original dimension).
         '''
         # shallow copy of __dict__
         d2=self.__dict__.copy()
-        d2['vertexOctree']=d2['cellOctree']=None
+        if not isinstance(d2['vertexOctree'],PointLocalizer.PointLocalizer): d2['vertexOctree']=None
+        if not isinstance(d2['cellOctree'],Octree.BulkOctree): d2['cellOctree']=None
+        if d2['vertexOctree'] is not None or d2['cellOctree'] is not None:
+            d2['localizerDigest']=self.localizerDigest or self.internalArraysDigest()
+        # cached geometry is not transferred, it is cheaper to recompute
+        if d2.get('geometryCache',None) is not None: d2['geometryCache']=GeometryCache()
+        # vertices and cells can be changed in place on the receiving side, the digest is recomputed there
+        if 'vertexList' in d2: d2['arraysDigest']=None
+        # vertices and cells are sent as flat arrays where possible
+        if isinstance(d2.get('vertexList',None),list) and isinstance(d2.get('cellList',None),list):
+            packed=self._packItems()
+            if packed is not None:
+                del d2['vertexList'],d2['cellList']
+                d2['_packedItems']=packed
         return d2
 
+    def __setstate__(self, state):
+        '''
+        Restore the instance from :func:`__getstate__`, re-creating vertices and cells from arrays if they were packed.
+        '''
+        packed=state.pop('_packedItems',None)
+        self.__dict__.update(state)
+        if packed is not None: self._unpackItems(packed)
+
+    def _packItems(self):
+        '''
+        Return vertices and cells as contiguous arrays (coordinates, labels, cell vertices and offsets) and a list of cell classes, so that pickling costs about the size of the raw data instead of pickling every :obj:`Vertex.Vertex` and :obj:`Cell.Cell` instance. Returns None if items cannot be restored exactly from arrays (vertices of other classes or with other attributes, coordinates of different dimension, items not numbered sequentially, cells with additional attributes or vertices not given as numbers).
+        '''
+        from .Vertex import Vertex
+        vertexAttrs,cellAttrs=set(('number','label','coords')),set(('mesh','number','label','vertices'))
+        if any(type(v) is not Vertex or v.number!=i or set(v.__dict__)!=vertexAttrs for i,v in enumerate(self.vertexList)): return None
+        if any(c.number!=i or c.mesh is not self or set(c.__dict__)!=cellAttrs for i,c in enumerate(self.cellList)): return None
+        def packLabels(items):
+            labels=[i.label for i in items]
+            # other than integer labels are pickled as they are
+            if all(type(l) is int for l in labels): return numpy.array(labels,dtype=numpy.int64)
+            return labels
+        try:
+            coords=numpy.array([v.coords for v in self.vertexList],dtype=numpy.float64)
+            cellVertices=[c.vertices for c in self.cellList]
+            conn=numpy.fromiter((i for vv in cellVertices for i in vv),dtype=numpy.int64)
+        except (ValueError,TypeError): return None
+        if len(self.vertexList)>0 and coords.ndim!=2: return None
+        if not all(type(i) is int for vv in cellVertices for i in vv): return None
+        classes=list(set(type(c) for c in self.cellList))
+        classIndex=dict((k,i) for i,k in enumerate(classes))
+        return dict(coords=coords,vertexLabels=packLabels(self.vertexList),cellClasses=classes,
+            cellClassIndex=numpy.array([classIndex[type(c)] for c in self.cellList],dtype=numpy.int32),
+            cellOffsets=numpy.cumsum([0]+[len(vv) for vv in cellVertices]),cellConnectivity=conn,cellLabels=packLabels(self.cellList))
+
+    def _unpackItems(self, packed):
+        '''
+        Create vertices and cells from arrays returned by :func:`_packItems`.
+        '''
+        from .Vertex import Vertex
+        def labels(ll): return ll.tolist() if isinstance(ll,numpy.ndarray) else ll
+        self.vertexList=[Vertex(i,l,tuple(xyz)) for i,(l,xyz) in enumerate(zip(labels(packed['vertexLabels']),packed['coords'].tolist()))]
+        classes,conn,off=packed['cellClasses'],packed['cellConnectivity'].tolist(),packed['cellOffsets'].tolist()
+        self.cellList=[classes[k](self,i,l,conn[off[i]:off[i+1]]) for i,(k,l) in enumerate(zip(packed['cellClassIndex'].tolist(),labels(packed['cellLabels'])))]
+
+    def _validateLocalizers(self):
+        '''
+        Check localizers restored from pickle or hdf5 against the current mesh data; they are dropped (and will be rebuilt on request) if the digest of mesh data does not match. Otherwise, the localizers are attached to vertices and cells of the receiver.
+        '''
+        if not getattr(self,'localizerDigest',None): return
+        if self.localizerDigest!=self.internalArraysDigest():
+            self.vertexOctree=self.cellOctree=None
+        else:
+            if self.vertexOctree is not None: self.vertexOctree.items=self._giveVertexItems()
+            if self.cellOctree is not None: self.cellOctree.items=self._giveCellItems()
+        self.localizerDigest=None
+
     def getNumberOfVertices(self):
         """
         See :func:`Mesh.getNumberOfVertices`
@@ -443,96 +864,60 @@ class UnstructuredMesh(Mesh):
 
     def giveVertexLocalizer(self):
         """
+        Get the vertex localizer. It is built at once from vertex coordinates, see :obj:`PointLocalizer.PointLocalizer`.
+
         :return: Returns the vertex localizer.
-        :rtype: Octree
+        :rtype: PointLocalizer.PointLocalizer
         """
+        self._validateLocalizers()
         if self.vertexOctree: 
             return self.vertexOctree
-        else:
-            # loop over vertices to get bounding box first
-
-            # XXX: remove this
-            if 0:
-                init=True
-                minc=[]
-                maxc=[]
-                for vertex in self.vertices():
-                    if init:
-                        for i in range(len(vertex.coords)):
-                            minc[i]=maxc[i]=vertex.coords[i]
-                    else:
-                        for i in range(len(vertex.coords)):
-                            minc[i]=min(minc[i], vertex.coords[i])
-                            maxc[i]=max(maxc[i], vertex.coords[i])
-            else:
-                vvv=self.vertices()
-                c0=vvv.__iter__().__next__().getCoordinates() # use the first bbox as base
-                bb=BBox.BBox(c0,c0) # ope-pointed bbox
-                for vert in vvv: bb.merge(vert.getCoordinates()) # extend it with all other cells
-                minc,maxc=bb.coords_ll,bb.coords_ur
-
-            #setup vertex localizer
-            size = max ( y-x for x,y in zip (minc,maxc))
-            mask = [(y-x)>0.0 for x,y in zip (minc,maxc)]
-            self.vertexOctree = Octree.Octree(minc, size, mask) 
-            if debug: 
-                t0=time.clock()
-                print ("Mesh: setting up vertex octree ...\nminc=", minc,"size:", size, "mask:",mask,"\n")
-            # add mesh vertices into octree
-            for vertex in self.vertices():
-                self.vertexOctree.insert(vertex)
-            if debug: print ("done in ", time.clock() - t0, "[s]")
+        self.vertexOctree=PointLocalizer.PointLocalizer(self.getVertices(),items=self._giveVertexItems())
+        return self.vertexOctree
 
-            return self.vertexOctree
+    def _giveVertexItems(self):
+        """
+        :return: Returns sequence of vertices indexed by vertex number, stored in the vertex localizer.
+        """
+        return self.vertexList
+
+    def snapToVertices(self, points, tolerance):
+        """
+        Replace points lying within given distance from a mesh vertex by coordinates of the nearest vertex. This is useful e.g. for probe points which are slightly off the mesh due to round-off.
+
+        :param numpy.array points: (N,3) array of points
+        :param float tolerance: snapping distance
+        :return: (N,3) array of (possibly) snapped points
+        :rtype: numpy.array
+        """
+        points=_pointArray(points)
+        dist,nearest=self.giveVertexLocalizer().giveNearest(points)
+        snap=(dist[:,0]<=tolerance)
+        ret=points.copy()
+        ret[snap]=self.getVertices()[nearest[snap,0]]
+        return ret
 
     def giveCellLocalizer(self):
         """
-        Get the cell localizer.
+        Get the cell localizer. It is built at once from bounding boxes of all cells, see :obj:`Octree.BulkOctree`.
 
         :return: Returns the cell localizer.
-        :rtype: Octree
+        :rtype: Octree.BulkOctree
         """
-        if debug: t0=time.clock()
+        self._validateLocalizers()
         if self.cellOctree: 
             return self.cellOctree
-        else:
-            # loop over cell bboxes to get bounding box first
-            if debug: print('Start at: ',time.clock()-t0)
-
-            ## XXX: remove this
-            if 0:
-                init=True
-                minc=[]
-                maxc=[]
-                for cell in self.cells():
-                    #print "cell bbox:", cell.giveBBox()
-                    if init:
-                        minc = [c for c in cell.getBBox().coords_ll]
-                        maxc = [c for c in cell.getBBox().coords_ur]
-                        init=False
-                    else:
-                        for i in range(len(cell.getBBox().coords_ll)):
-                            minc[i]=min(minc[i], cell.getBBox().coords_ll[i])
-                            maxc[i]=max(maxc[i], cell.getBBox().coords_ur[i])
-            else:
-                ccc=self.cells()
-                bb=ccc.__iter__().__next__().getBBox() # use the first bbox as base
-                for cell in ccc: bb.merge(cell.getBBox()) # extend it with all other cells
-                minc,maxc=bb.coords_ll,bb.coords_ur
-            if debug: print('Cell bbox: ',time.clock()-t0)
-
-        #setup vertex localizer
-        size = max ( y-x for x,y in zip (minc,maxc))
-        mask = [(y-x)>0.0 for x,y in zip (minc,maxc)]
-        self.cellOctree = Octree.Octree(minc, size, mask) 
-        if debug: print('Octree ctor: ',time.clock()-t0)
-        if debug: 
-            print ("Mesh: setting up vertex octree ...\nminc=", minc,"size:", size, "mask:",mask,"\n")
-        for cell in self.cells():
-            self.cellOctree.insert(cell)
-        if debug: print ("done in ", time.clock() - t0, "[s]")
+        if debug: t0=time.time()
+        self.cellOctree=Octree.BulkOctree(self.getCellBBoxes(),items=self._giveCellItems())
+        if debug: print ("Mesh: cell octree set up in ", time.time() - t0, "[s], depth", self.cellOctree.giveDepth())
         return self.cellOctree
 
+    def _giveCellItems(self):
+        """
+        :return: Returns sequence of cells indexed by cell number, stored in the cell localizer.
+        """
+        return self.cellList
+
     def __buildVertexLabelMap__(self):
         """
         Create a custom dictionary between vertex's label and Vertex instance.
@@ -578,17 +963,19 @@ class UnstructuredMesh(Mesh):
         return self.cellDict[label]
 
 
-    def merge (self, mesh):
+    def merge (self, mesh, tolerance=None):
         """
         Merges receiver with a given mesh. This is based on merging mesh entities (vertices, cells) based on their labels, as they refer to global IDs of each entity, that should be unique.
 
         The procedure used here is based on creating a dictionary for every componenet from both meshes, where the key is component label so that the entities with the same ID could be easily identified.
 
         :param Mesh mesh: Source mesh for merging
+        :param float tolerance: Optional; if given, vertices of the source mesh lying within this distance from a receiver vertex are merged with it even if their labels differ
         """
         #build vertex2local reciver map first
         if (not self.vertexDict):
             self.__buildVertexLabelMap__()
+        if tolerance is not None: self._mapCoincidentVertices(mesh,tolerance)
         #
         #merge vertexLists
         #
@@ -634,6 +1021,17 @@ class UnstructuredMesh(Mesh):
         #last step: invalidate receiver 
         self.vertexOctree = None
         self.cellOctree = None
+        self.invalidateGeometryCache()
+
+    def _mapCoincidentVertices(self, mesh, tolerance):
+        """
+        Add labels of vertices of given mesh, which lie within tolerance from a receiver vertex, to the vertex label map, so that they are merged with the receiver vertex.
+        """
+        if self.getNumberOfVertices()==0: return
+        dist,nearest=self.giveVertexLocalizer().giveNearest(mesh.getVertices())
+        for j in numpy.nonzero(dist[:,0]<=tolerance)[0].tolist():
+            label=mesh.getVertex(j).label
+            if label not in self.vertexDict: self.vertexDict[label]=int(nearest[j,0])
 
     def getVTKRepresentation (self):
         """
@@ -651,11 +1049,11 @@ class UnstructuredMesh(Mesh):
         triangles = []
 
         #loop over receiver vertices and create list of vertex coordinates 
-        for v in range(len(self.vertexList)):
-            vertices.append(self.vertexList[v].coords)
+        for v in range(self.getNumberOfVertices()):
+            vertices.append(self.getVertex(v).coords)
         #loop over receiver cells 
-        for c in range(len(self.cellList)):
-            cell = self.cellList[c]
+        for c in range(self.getNumberOfCells()):
+            cell = self.getCell(c)
             cgt = cell.getGeometryType()
             if (cgt == CellGeometryType.CGT_TRIANGLE_1):
                 triangles.append(cell.vertices)
@@ -752,3 +1150,268 @@ class UnstructuredMesh(Mesh):
 
 
 
+
+
+class _MeshItems(object):
+    """
+    Read-only sequence of mesh vertices or cells created on demand by :func:`Mesh.getVertex` or :func:`Mesh.getCell`.
+    """
+    def __init__(self, mesh, type): self.mesh,self.type=mesh,type
+    def __len__(self): return self.mesh.getNumberOfVertices() if self.type==VERTICES else self.mesh.getNumberOfCells()
+    def __getitem__(self, i): return self.mesh.getVertex(i) if self.type==VERTICES else self.mesh.getCell(i)
+
+@Pyro4.expose
+class CompactUnstructuredMesh(UnstructuredMesh):
+    """
+    Unstructured mesh storing its data in numpy arrays instead of lists of :obj:`Vertex.Vertex` and :obj:`Cell.Cell` instances, which saves memory and makes :func:`getVertices` and :func:`getCells` (and everything based on them) cheap for large meshes.
+
+    The class contains:
+
+    * vertexCoords: (N,3) array of vertex coordinates
+    * vertexLabels: array of vertex labels, or None if labels are equal to vertex numbers
+    * cellTypes: array of cell geometry types (:obj:`CellGeometryType`)
+    * cellOffsets: array of offsets into cellConnectivity; vertices of the i-th cell are cellConnectivity[cellOffsets[i]:cellOffsets[i+1]]
+    * cellConnectivity: array of vertex numbers of all cells
+    * cellLabels: array of cell labels, or None if labels are equal to cell numbers
+
+    Vertices and cells returned by :func:`getVertex`, :func:`getCell`, :func:`vertices` and :func:`cells` are lightweight views created on demand; modifying them does not change the mesh.
+
+    .. automethod:: __init__
+    """
+    def __init__(self):
+        """
+        Constructor.
+        """
+        UnstructuredMesh.__init__(self)
+        self.vertexCoords=numpy.empty((0,3),dtype=numpy.float64)
+        self.vertexLabels=None
+        self.cellTypes=numpy.empty((0,),dtype=numpy.int64)
+        self.cellOffsets=numpy.zeros((1,),dtype=numpy.int64)
+        self.cellConnectivity=numpy.empty((0,),dtype=numpy.int64)
+        self.cellLabels=None
+
+    def setupFromArrays(self, vertexCoords, cellTypes, cellConnectivity, cellOffsets=None, vertexLabels=None, cellLabels=None):
+        """
+        Initializes the receiver from arrays.
+
+        :param numpy.array vertexCoords: (N,1..3) array of vertex coordinates (padded by zeros to 3D)
+        :param numpy.array cellTypes: cell geometry types
+        :param numpy.array cellConnectivity: vertex numbers of all cells, either flat (then cellOffsets must be given) or 2D with excess entries set to -1, as returned by :func:`Mesh.getCells`
+        :param numpy.array cellOffsets: offsets of cells in flat cellConnectivity
+        :param vertexLabels: Optional vertex labels (default to vertex numbers)
+        :param cellLabels: Optional cell labels (default to cell numbers)
+        """
+        self.vertexCoords=_pointArray(vertexCoords)
+        self.cellTypes=numpy.array(cellTypes,dtype=numpy.int64).reshape(-1)
+        cellConnectivity=numpy.asarray(cellConnectivity,dtype=numpy.int64)
+        if cellOffsets is None:
+            if cellConnectivity.ndim!=2: raise ValueError('CompactUnstructuredMesh: cellOffsets must be given for flat cellConnectivity')
+            valid=(cellConnectivity>=0)
+            cellOffsets=numpy.concatenate(([0],numpy.cumsum(valid.sum(axis=1))))
+            cellConnectivity=cellConnectivity[valid]
+        self.cellOffsets=numpy.array(cellOffsets,dtype=numpy.int64)
+        self.cellConnectivity=numpy.array(cellConnectivity,dtype=numpy.int64)
+        if self.cellOffsets.shape[0]!=self.cellTypes.shape[0]+1: raise ValueError('CompactUnstructuredMesh: cellOffsets must have one more item than cellTypes')
+        self.vertexLabels=None if vertexLabels is None else numpy.asarray(vertexLabels)
+        self.cellLabels=None if cellLabels is None else numpy.asarray(cellLabels)
+        self._invalidate()
+
+    def setup(self, vertexList, cellList):
+        """
+        Initializes the receiver from vertex and cell lists, see :func:`UnstructuredMesh.setup`. The instances are converted to arrays and not kept.
+
+        :param tuple vertexList: A tuple of vertices
+        :param tuple cellList: A tuple of cells
+        """
+        coords=[v.getCoordinates() for v in vertexList]
+        cellVertices=[[v if isinstance(v,(int,numpy.integer)) else v.getNumber() for v in c.vertices] for c in cellList]
+        counts=numpy.array([len(vv) for vv in cellVertices],dtype=numpy.int64)
+        def labels(items):
+            ll=[i.label for i in items]
+            return None if all(l is None for l in ll) else ll
+        self.setupFromArrays(
+            vertexCoords=numpy.array([tuple(c)+(0.,)*(3-len(c)) for c in coords],dtype=numpy.float64).reshape(-1,3),
+            cellTypes=[c.getGeometryType() for c in cellList],
+            cellConnectivity=numpy.array([v for vv in cellVertices for v in vv],dtype=numpy.int64),
+            cellOffsets=numpy.concatenate(([0],numpy.cumsum(counts))),
+            vertexLabels=labels(vertexList),
+            cellLabels=labels(cellList)
+        )
+
+    @staticmethod
+    def makeFromMesh(mesh):
+        """
+        Create new :obj:`CompactUnstructuredMesh` with the same content as given mesh.
+
+        :param Mesh mesh: source mesh
+        :return: new instance
+        :rtype: CompactUnstructuredMesh
+        """
+        ret=CompactUnstructuredMesh()
+        if isinstance(mesh,CompactUnstructuredMesh):
+            ret.setupFromArrays(mesh.vertexCoords,mesh.cellTypes,mesh.cellConnectivity,mesh.cellOffsets,mesh.vertexLabels,mesh.cellLabels)
+        else:
+            ret.setup([mesh.getVertex(i) for i in range(mesh.getNumberOfVertices())],[mesh.getCell(i) for i in range(mesh.getNumberOfCells())])
+        return ret
+
+    def _invalidate(self):
+        'Drop all data derived from mesh arrays (localizers, label maps, cached geometry).'
+        self.vertexOctree=None
+        self.cellOctree=None
+        self.vertexDict=None
+        self.cellDict=None
+        self.localizerDigest=None
+        self.invalidateGeometryCache()
+
+    def copy(self):
+        """
+        See :func:`Mesh.copy`
+        """
+        ans=CompactUnstructuredMesh()
+        ans.setupFromArrays(self.vertexCoords.copy(),self.cellTypes.copy(),self.cellConnectivity.copy(),self.cellOffsets.copy(),
+            None if self.vertexLabels is None else self.vertexLabels.copy(),None if self.cellLabels is None else self.cellLabels.copy())
+        return ans
+
+    def getNumberOfVertices(self):
+        """
+        See :func:`Mesh.getNumberOfVertices`
+        """
+        return self.vertexCoords.shape[0]
+
+    def getNumberOfCells(self):
+        """
+        See :func:`Mesh.getNumberOfCells`
+        """
+        return self.cellTypes.shape[0]
+
+    def getVertexLabel(self, i):
+        """
+        :param int i: vertex number
+        :return: Returns label of i-th vertex
+        """
+        if self.vertexLabels is None: return i
+        l=self.vertexLabels[i]
+        return l.item() if isinstance(l,numpy.generic) else l
+
+    def getCellLabel(self, i):
+        """
+        :param int i: cell number
+        :return: Returns label of i-th cell
+        """
+        if self.cellLabels is None: return i
+        l=self.cellLabels[i]
+        return l.item() if isinstance(l,numpy.generic) else l
+
+    def getVertex(self, i):
+        """
+        See :func:`Mesh.getVertex`; returns a new :obj:`Vertex.Vertex` view.
+        """
+        from . import Vertex
+        if i<0: i+=self.getNumberOfVertices()
+        return Vertex.Vertex(number=i,label=self.getVertexLabel(i),coords=tuple(self.vertexCoords[i].tolist()))
+
+    def getCell(self, i):
+        """
+        See :func:`Mesh.getCell`; returns a new :obj:`Cell.Cell` view, with vertices given as vertex numbers.
+        """
+        from . import Cell
+        if i<0: i+=self.getNumberOfCells()
+        klass=Cell.Cell.getClassForCellGeometryType(self.cellTypes[i])
+        return klass(mesh=self,number=i,label=self.getCellLabel(i),vertices=tuple(self.cellConnectivity[self.cellOffsets[i]:self.cellOffsets[i+1]].tolist()))
+
+    def _giveCellNumbers(self):
+        """
+        See :func:`Mesh._giveCellNumbers`; cells are always numbered sequentially.
+        """
+        return None
+
+    def _giveVertexItems(self):
+        """
+        See :func:`UnstructuredMesh._giveVertexItems`; vertices are created on demand.
+        """
+        return _MeshItems(self,VERTICES)
+
+    def _giveCellItems(self):
+        """
+        See :func:`UnstructuredMesh._giveCellItems`; cells are created on demand.
+        """
+        return _MeshItems(self,CELLS)
+
+    def getVertices(self):
+        """
+        See :func:`Mesh.getVertices`; returns the internal coordinate array, which should not be modified.
+        """
+        return self.vertexCoords
+
+    def getCells(self):
+        """
+        See :func:`Mesh.getCells`
+        """
+        nc=self.getNumberOfCells()
+        counts=numpy.diff(self.cellOffsets)
+        mnv=counts.max() if nc else 0
+        cc=numpy.full(shape=(nc,mnv),fill_value=-1,dtype=numpy.int64)
+        cc[numpy.repeat(numpy.arange(nc),counts),_raggedArange(counts)]=self.cellConnectivity
+        return self.cellTypes.copy(),cc
+
+    def __buildVertexLabelMap__(self):
+        """
+        See :func:`UnstructuredMesh.__buildVertexLabelMap__`
+        """
+        n=self.getNumberOfVertices()
+        labels=range(n) if self.vertexLabels is None else self.vertexLabels.tolist()
+        # the first vertex with given label wins, as in UnstructuredMesh
+        self.vertexDict=dict(zip(reversed(labels),range(n-1,-1,-1)))
+
+    def __buildCellLabelMap__(self):
+        """
+        See :func:`UnstructuredMesh.__buildCellLabelMap__`
+        """
+        n=self.getNumberOfCells()
+        labels=range(n) if self.cellLabels is None else self.cellLabels.tolist()
+        self.cellDict=dict(zip(reversed(labels),range(n-1,-1,-1)))
+
+    def merge(self, mesh, tolerance=None):
+        """
+        See :func:`UnstructuredMesh.merge`
+        """
+        if (not self.vertexDict): self.__buildVertexLabelMap__()
+        if (not self.cellDict): self.__buildCellLabelMap__()
+        if tolerance is not None: self._mapCoincidentVertices(mesh,tolerance)
+        other=mesh if isinstance(mesh,CompactUnstructuredMesh) else CompactUnstructuredMesh.makeFromMesh(mesh)
+        nv,nc=self.getNumberOfVertices(),self.getNumberOfCells()
+        # map vertices of the other mesh to (new) vertex numbers of the receiver
+        vmap=numpy.empty(other.getNumberOfVertices(),dtype=numpy.int64)
+        newVertices,newVertexLabels=[],[]
+        for j in range(other.getNumberOfVertices()):
+            label=other.getVertexLabel(j)
+            if label not in self.vertexDict:
+                self.vertexDict[label]=nv+len(newVertices)
+                newVertices.append(j)
+                newVertexLabels.append(label)
+            vmap[j]=self.vertexDict[label]
+        newCells,newCellLabels=[],[]
+        for j in range(other.getNumberOfCells()):
+            label=other.getCellLabel(j)
+            if label in self.cellDict: continue
+            self.cellDict[label]=nc+len(newCells)
+            newCells.append(j)
+            newCellLabels.append(label)
+        newCells=numpy.array(newCells,dtype=numpy.int64)
+        counts=numpy.diff(other.cellOffsets)[newCells]
+        conn=other.cellConnectivity[numpy.repeat(other.cellOffsets[newCells],counts)+_raggedArange(counts)]
+        def mergeLabels(labels,n,new):
+            if labels is None and new==list(range(n,n+len(new))): return None
+            old=list(range(n)) if labels is None else labels.tolist()
+            return old+new
+        vertexDict,cellDict=self.vertexDict,self.cellDict
+        self.setupFromArrays(
+            vertexCoords=numpy.concatenate((self.vertexCoords,other.vertexCoords[numpy.array(newVertices,dtype=numpy.int64)])),
+            cellTypes=numpy.concatenate((self.cellTypes,other.cellTypes[newCells])),
+            cellConnectivity=numpy.concatenate((self.cellConnectivity,vmap[conn])),
+            cellOffsets=numpy.concatenate((self.cellOffsets,self.cellOffsets[-1]+numpy.cumsum(counts))),
+            vertexLabels=mergeLabels(self.vertexLabels,nv,newVertexLabels),
+            cellLabels=mergeLabels(self.cellLabels,nc,newCellLabels)
+        )
+        # label maps were updated above and remain valid
+        self.vertexDict,self.cellDict=vertexDict,cellDict
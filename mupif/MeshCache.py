@@ -0,0 +1,130 @@
+# 
+#           MuPIF: Multi-Physics Integration Framework 
+#               Copyright (C) 2010-2015 Borek Patzak
+# 
+#    Czech Technical University, Faculty of Civil Engineering,
+#  Department of Structural Mechanics, 166 29 Prague, Czech Republic
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, 
+# Boston, MA  02110-1301  USA
+#
+"""
+Content-addressed cache of meshes, so that meshes are not transferred again with every field obtained from a remote application.
+
+The receiver keeps meshes it obtained in a :obj:`MeshCache` and passes their digests (:func:`Mesh.Mesh.internalArraysDigest`) with the request (see :func:`Application.Application.getFieldCached`); the sender replaces the mesh of the field by :obj:`MeshReference` if the receiver already holds it, and the receiver puts its cached mesh back with :func:`MeshCache.resolve`. :obj:`Application.RemoteApplication` does this transparently in its :func:`getField`.
+"""
+from builtins import object
+import collections
+
+
+class MeshReference(object):
+    """
+    Placeholder sent instead of a mesh which the receiver already holds.
+
+    .. automethod:: __init__
+    """
+    def __init__(self, digest):
+        """
+        :param str digest: :func:`Mesh.Mesh.internalArraysDigest` of the mesh referred to
+        """
+        self.digest=digest
+
+    def __repr__(self): return 'MeshReference(%r)'%self.digest
+
+
+def stripMesh(field, knownDigests):
+    """
+    Return the field with its mesh replaced by :obj:`MeshReference` if the digest of the mesh is in *knownDigests*, otherwise the field itself. The field passed is not modified (a shallow copy is returned).
+
+    :param Field.Field field: field to be sent
+    :param knownDigests: digests of meshes held by the receiver
+    :rtype: Field.Field
+    """
+    if not knownDigests: return field
+    digest=field.getMesh().internalArraysDigest()
+    if digest not in knownDigests: return field
+    ret=object.__new__(type(field))
+    ret.__dict__.update(field.__dict__)
+    ret.mesh=MeshReference(digest)
+    return ret
+
+
+class MeshCache(object):
+    """
+    Meshes keyed by their digest, least recently used are dropped when the cache is full.
+
+    Fields resolved by the cache share the cached mesh instance; meshes must not be modified in place once cached.
+
+    .. automethod:: __init__
+    """
+    def __init__(self, maxSize=8):
+        """
+        :param int maxSize: maximum number of meshes kept
+        """
+        self.maxSize=maxSize
+        # digest -> mesh, least recently used first
+        self.meshes=collections.OrderedDict()
+
+    def __len__(self): return len(self.meshes)
+    def __contains__(self, digest): return digest in self.meshes
+
+    def getDigests(self):
+        """
+        :return: digests of cached meshes, to be passed to the sender
+        :rtype: list of str
+        """
+        return list(self.meshes.keys())
+
+    def add(self, mesh):
+        """
+        Add mesh to the cache. If a mesh with the same digest is cached already, the cached instance is kept.
+
+        :param Mesh.Mesh mesh: mesh to be cached
+        :return: the cached mesh, which should be used instead of *mesh*
+        :rtype: Mesh.Mesh
+        """
+        digest=mesh.internalArraysDigest()
+        mesh=self.meshes.pop(digest,mesh)
+        self.meshes[digest]=mesh
+        while len(self.meshes)>self.maxSize: self.meshes.popitem(last=False)
+        return mesh
+
+    def get(self, digest):
+        """
+        :param str digest: mesh digest
+        :return: cached mesh; KeyError is raised if not cached
+        :rtype: Mesh.Mesh
+        """
+        mesh=self.meshes.pop(digest)
+        self.meshes[digest]=mesh
+        return mesh
+
+    def resolve(self, field):
+        """
+        Replace :obj:`MeshReference` of the received field by the cached mesh; a mesh received with the field is cached (or replaced by the cached instance with the same digest).
+
+        :param Field.Field field: field received
+        :return: the field, modified in place
+        :rtype: Field.Field
+        """
+        if isinstance(field.mesh,MeshReference): field.mesh=self.get(field.mesh.digest)
+        else: field.mesh=self.add(field.mesh)
+        return field
+
+    def clear(self):
+        """
+        Remove all meshes from the cache.
+        """
+        self.meshes.clear()
@@ -24,12 +24,14 @@ from __future__ import print_function, division
 from builtins import str, range, object
 
 import math, itertools
+import numpy
 from . import BBox
 from . import Localizer
 import Pyro4
 
 debug = 0
 refineLimit = 400 # refine cell if number of items exceeds this treshold value
+bulkRefineLimit = 32 # the same for BulkOctree, where small terminal octants are cheap and make batch queries faster
 
 class Octant(object):
     """
@@ -290,6 +292,205 @@ class Octree(Localizer.Localizer):
         return self.root.giveDepth()
 
 
+def _raggedArange(counts):
+    """
+    Return concatenated ranges ``arange(c)`` for all ``c`` in *counts* (index of each item within its group).
+
+    :param numpy.array counts: non-negative group sizes
+    :rtype: numpy.array
+    """
+    counts=numpy.asarray(counts,dtype=numpy.int64)
+    return numpy.arange(counts.sum())-numpy.repeat(numpy.cumsum(counts)-counts,counts)
+
+class BulkOctree(Localizer.Localizer):
+    """
+    Static octree built at once from arrays of item bounding boxes.
+
+    The tree is stored in flat arrays instead of :obj:`Octant` instances, and is built top-down, one level at a time, with vectorized operations over all items of the level; this is much faster than inserting items one by one into :obj:`Octree`. As in :obj:`Octree`, octants containing more than refineLimit items are subdivided (only in directions where the bounding box of all items is not flat) and every item is stored in all terminal octants its bounding box intersects.
+
+    The tree stores item indices; if a sequence of items is given, :func:`giveItemsInBBox` returns the items themselves so that the tree can be used as a drop-in replacement of :obj:`Octree` for queries. Items cannot be inserted or deleted, the tree must be rebuilt instead.
+
+    The class contains:
+
+    * itemBBoxes: (N,2,3) array of item bounding boxes
+    * items: optional sequence of items corresponding to bounding boxes
+    * mask: subdivision mask, see :obj:`Octree`
+    * origin, size, firstChild: node arrays; children of the i-th node (if any) are nodes firstChild[i]...firstChild[i]+2**dim-1
+    * leafStart, leafItems: items of the i-th node are leafItems[leafStart[i]:leafStart[i+1]]
+
+    .. automethod:: __init__
+    """
+    def __init__(self, bboxes, items=None, refineLimit=bulkRefineLimit, maxDepth=20):
+        """
+        Builds the tree.
+
+        :param numpy.array bboxes: (N,2,D) array of item bounding boxes; [i,0] and [i,1] are lower left and upper right corners of the i-th item (D<3 is padded by zeros)
+        :param items: Optional sequence of N items returned by :func:`giveItemsInBBox`
+        :param int refineLimit: maximum number of items in a terminal octant
+        :param int maxDepth: maximum subdivision depth
+        """
+        bb=numpy.zeros((len(bboxes),2,3),dtype=numpy.float64)
+        if len(bboxes): 
+            bboxes=numpy.asarray(bboxes,dtype=numpy.float64)
+            bb[:,:,:bboxes.shape[2]]=bboxes
+        self.itemBBoxes=bb
+        self.items=items
+        n=bb.shape[0]
+        lo,hi=(bb[:,0,:].min(axis=0),bb[:,1,:].max(axis=0)) if n else (numpy.zeros(3),numpy.zeros(3))
+        self.mask=tuple(int(m) for m in (hi-lo)>0.)
+        size=(hi-lo).max()
+        # node arrays are grown level by level
+        origins,sizes=[lo[None,:]],[numpy.array([size if size>0 else 1.])]
+        fc=numpy.array([-1],dtype=numpy.int64)
+        # children offsets in units of the half size of the parent
+        self._offsets=numpy.array([ijk for ijk in itertools.product(*[range(m+1) for m in self.mask])],dtype=numpy.float64)
+        nch=self._offsets.shape[0]
+        leafNodes,leafItems=[],[]
+        # (node,item) pairs on the current level
+        node,item=numpy.zeros(n,dtype=numpy.int64),numpy.arange(n,dtype=numpy.int64)
+        self.depth=0
+        while node.size:
+            origin,size=numpy.concatenate(origins),numpy.concatenate(sizes)
+            count=numpy.bincount(node,minlength=fc.size)
+            divide=(count[node]>refineLimit)
+            if self.depth>=maxDepth or nch==1: divide[:]=False
+            if divide.any():
+                # distribute items of overfull octants into children
+                sel=numpy.nonzero(divide)[0]
+                pi,c=self._distribute(origin,size,node[sel],bb[item[sel],0,:],bb[item[sel],1,:])
+                parent=node[sel][pi]
+                # do not divide octants where some child would receive all items (no progress)
+                parents,pinv=numpy.unique(parent,return_inverse=True)
+                childCount=numpy.bincount(pinv*nch+c,minlength=parents.size*nch).reshape(-1,nch)
+                useful=childCount.max(axis=1)<count[parents]
+                divide&=~numpy.isin(node,parents[~useful])
+                keep=useful[pinv]
+                src,parent,c,parents=sel[pi[keep]],parent[keep],c[keep],parents[useful]
+            # terminal octants
+            leafNodes.append(node[~divide])
+            leafItems.append(item[~divide])
+            if not divide.any(): break
+            # allocate children of divided octants
+            nNodes=fc.size
+            fc[parents]=nNodes+nch*numpy.arange(parents.size)
+            fc=numpy.concatenate((fc,numpy.full(nch*parents.size,-1,dtype=numpy.int64)))
+            half=size[parents]/2.
+            origins.append((origin[parents][:,None,:]+self._offsets[None,:,:]*half[:,None,None]).reshape(-1,3))
+            sizes.append(numpy.repeat(half,nch))
+            item=item[src]
+            node=fc[parent]+c
+            self.depth+=1
+        self.origin,self.size=numpy.concatenate(origins),numpy.concatenate(sizes)
+        self.firstChild=fc
+        leafNodes=numpy.concatenate(leafNodes) if leafNodes else numpy.zeros(0,dtype=numpy.int64)
+        leafItems=numpy.concatenate(leafItems) if leafItems else numpy.zeros(0,dtype=numpy.int64)
+        order=numpy.argsort(leafNodes,kind='mergesort')
+        self.leafItems=leafItems[order]
+        self.leafStart=numpy.concatenate(([0],numpy.cumsum(numpy.bincount(leafNodes,minlength=fc.size)))).astype(numpy.int64)
+
+    def _distribute(self, origin, size, node, lo, hi):
+        """
+        Find children of given octants intersected by given boxes.
+
+        :return: (i,c) arrays; box i intersects c-th child of node[i]
+        """
+        half=size[node]/2.
+        mask=numpy.array(self.mask,dtype=bool)
+        ii,cc=[],[]
+        for c,off in enumerate(self._offsets):
+            cmin=origin[node]+off[None,:]*half[:,None]
+            cmax=cmin+half[:,None]
+            ok=numpy.all(((lo<=cmax)&(hi>=cmin))[:,mask],axis=1)
+            ii.append(numpy.nonzero(ok)[0])
+            cc.append(numpy.full(ii[-1].size,c,dtype=numpy.int64))
+        return numpy.concatenate(ii),numpy.concatenate(cc)
+
+    def giveItemIndicesInBBoxes(self, lo, hi):
+        """
+        Returns all pairs of query boxes and items with intersecting bounding boxes; all queries are processed at once.
+
+        :param numpy.array lo: (M,D) array of lower left corners of query boxes (D<3 is padded by zeros)
+        :param numpy.array hi: (M,D) array of upper right corners of query boxes
+        :return: (iq,ii) arrays of query and item indices, sorted by query
+        :rtype: (numpy.array,numpy.array)
+        """
+        def pad(x):
+            x=numpy.array(x,dtype=numpy.float64,ndmin=2)
+            return numpy.hstack((x,numpy.zeros((x.shape[0],3-x.shape[1]))))
+        lo,hi=pad(lo),pad(hi)
+        nq=lo.shape[0]
+        if self.itemBBoxes.shape[0]==0 or nq==0: return numpy.zeros(0,dtype=numpy.int64),numpy.zeros(0,dtype=numpy.int64)
+        query,node=numpy.arange(nq,dtype=numpy.int64),numpy.zeros(nq,dtype=numpy.int64)
+        lq,ln=[],[]
+        while query.size:
+            internal=self.firstChild[node]>=0
+            lq.append(query[~internal]); ln.append(node[~internal])
+            query,node=query[internal],node[internal]
+            if not query.size: break
+            i,c=self._distribute(self.origin,self.size,node,lo[query],hi[query])
+            query,node=query[i],self.firstChild[node[i]]+c
+        query,node=numpy.concatenate(lq),numpy.concatenate(ln)
+        start=self.leafStart[node]
+        cnt=self.leafStart[node+1]-start
+        iq=numpy.repeat(query,cnt)
+        ii=self.leafItems[numpy.repeat(start,cnt)+_raggedArange(cnt)]
+        # exact test against item boxes, then remove duplicates (items stored in several octants)
+        ok=numpy.all((lo[iq]<=self.itemBBoxes[ii,1,:])&(hi[iq]>=self.itemBBoxes[ii,0,:]),axis=1)
+        nItems=self.itemBBoxes.shape[0]
+        key=numpy.unique(iq[ok]*nItems+ii[ok])
+        return key//nItems,key%nItems
+
+    def __getstate__(self):
+        """
+        Customized method returning dictionary for pickling; items are not pickled, only the index arrays. The owner of the items (e.g. the mesh) should set the items attribute again after unpickling.
+        """
+        d2=self.__dict__.copy()
+        d2['items']=None
+        return d2
+
+    def __setstate__(self, state):
+        """
+        Restore the instance from :func:`__getstate__`.
+        """
+        self.__dict__.update(state)
+        if 'items' not in state: self.items=None
+
+    def insert (self, item):
+        """
+        Not supported, the tree is static and must be rebuilt.
+        """
+        raise NotImplementedError('BulkOctree is static and must be rebuilt to insert items')
+
+    def delete (self, item):
+        """
+        Not supported, the tree is static and must be rebuilt.
+        """
+        raise NotImplementedError('BulkOctree is static and must be rebuilt to delete items')
+
+    def giveItemsInBBox (self, bbox):
+        """
+        Returns the set of items (or item indices, if no items were given) with bounding box intersecting given bounding box.
+
+        :param BBox bbox: target bounding box
+        :rtype: set
+        """
+        iq,ii=self.giveItemIndicesInBBoxes([bbox.coords_ll],[bbox.coords_ur])
+        if self.items is None: return set(ii.tolist())
+        return set(self.items[i] for i in ii.tolist())
+
+    def evaluate(self, functor):
+        """
+        Evaluate the given functor on all items with bounding box intersecting the functor bounding box, see :func:`Octant.evaluate`.
+        """
+        for i in self.giveItemsInBBox(functor.getBBox()): functor.evaluate(i)
+
+    def giveDepth(self):
+        """
+        :return: Returns the depth of the tree
+        """
+        return self.depth
+
+
 try:
     # this will be used by Octree ctor if necessary
     from . import fastOctant
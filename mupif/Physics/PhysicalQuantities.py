@@ -44,7 +44,7 @@ import numpy
 import re, string
 from functools import reduce
 import Pyro4
-import collections
+import collections.abc
 
 # Class definitions
 @Pyro4.expose
@@ -178,7 +178,7 @@ class PhysicalQuantity(object):
         if not isPhysicalQuantity(other):
             raise TypeError('Incompatible types')
         factor = other.unit.conversionFactorTo(self.unit)
-        if isinstance(self.value, collections.Iterable):
+        if isinstance(self.value, collections.abc.Iterable):
             new_value = tuple((sign1*v1+sign2*v2*factor for v1, v2 in zip(self.value, other.value)))
         else:
             new_value = sign1*self.value + sign2*other.value*factor
@@ -197,14 +197,14 @@ class PhysicalQuantity(object):
 
     def __cmp__(self, other):
         diff = self._sum(other, 1, -1)
-        if isinstance(diff.value, collections.Iterable):
+        if isinstance(diff.value, collections.abc.Iterable):
             return all(v==0 for v in diff.value)
         else:
             return cmp(diff.value, 0)
 
     def __eq__(self, other): #python3 stuff
         diff = self._sum(other, 1, -1)
-        if isinstance(diff.value, collections.Iterable):
+        if isinstance(diff.value, collections.abc.Iterable):
             return all(v==0 for v in diff.value)
         else:
             return diff.value == 0
@@ -212,20 +212,20 @@ class PhysicalQuantity(object):
         
     def __lt__(self, other): #python3 stuff
         diff = self._sum(other, 1, -1)
-        if isinstance(diff.value, collections.Iterable):
+        if isinstance(diff.value, collections.abc.Iterable):
             return all(v<0 for v in diff.value)
         else:
             return (diff.value < 0)
     
     def __mul__(self, other):
-        if isinstance(self.value, collections.Iterable):
+        if isinstance(self.value, collections.abc.Iterable):
             # tuple valued (vector)
             if not isPhysicalQuantity(other):
                 newVal = tuple((v*other for v in self.value))
                 return self.__class__(newVal, self.unit)
             else:
                 # other is physical quantity with units
-                if isinstance(other.value, collections.Iterable):
+                if isinstance(other.value, collections.abc.Iterable):
                     raise TypeError('Incompatible types')
                 else:
                     #scalar
@@ -245,14 +245,14 @@ class PhysicalQuantity(object):
     __rmul__ = __mul__
 
     def __truediv__(self, other):
-        if isinstance(self.value, collections.Iterable):
+        if isinstance(self.value, collections.abc.Iterable):
             # tuple valued (vector)
             if not isPhysicalQuantity(other):
                 newVal = tuple((v/other for v in self.value))
                 return self.__class__(newVal, self.unit)
             else:
                 # other is physical quantity with units
-                if isinstance(other.value, collections.Iterable):
+                if isinstance(other.value, collections.abc.Iterable):
                     raise TypeError('Incompatible types')
                 else:
                     #scalar
@@ -696,7 +696,7 @@ def _round(x):
 
 def _convertValue (value, src_unit, target_unit):
     (factor, offset) = src_unit.conversionTupleTo(target_unit)
-    if isinstance(value, collections.Iterable):
+    if isinstance(value, collections.abc.Iterable):
         return tuple((v+offset)*factor for v in value)
     else:
         return (value + offset) * factor
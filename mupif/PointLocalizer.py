@@ -0,0 +1,226 @@
+# 
+#           MuPIF: Multi-Physics Integration Framework 
+#               Copyright (C) 2010-2015 Borek Patzak
+# 
+#    Czech Technical University, Faculty of Civil Engineering,
+#  Department of Structural Mechanics, 166 29 Prague, Czech Republic
+# 
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+# 
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, 
+# Boston, MA  02110-1301  USA
+#
+from __future__ import division
+from builtins import range
+
+import numpy
+from . import Localizer
+from .Octree import _raggedArange
+
+def _pointArray(points):
+    """
+    Return given point(s) as (N,3) float array; 1D/2D coordinates are padded by zeros.
+    """
+    pts=numpy.array(points,dtype=numpy.float64,ndmin=2)
+    if pts.shape[1]<3: pts=numpy.hstack((pts,numpy.zeros((pts.shape[0],3-pts.shape[1]))))
+    return pts
+
+class PointLocalizer(Localizer.Localizer):
+    """
+    Static localizer specialized for points (e.g. mesh vertices), based on a hashed uniform grid.
+
+    Points are sorted by the index of the grid bin they fall in; only non-empty bins are stored. Besides the :obj:`Localizer.Localizer` interface, the class offers batch nearest-neighbour (:func:`giveNearest`) and radius (:func:`giveInRadius`) queries over arrays of points, which are done in vectorized passes.
+
+    The class contains:
+
+    * points: (N,3) array of point coordinates
+    * items: optional sequence of items corresponding to points, returned by :func:`giveItemsInBBox`
+    * origin, binSize, numBins: grid geometry
+    * order: point indices sorted by bin
+    * binKeys, binStart: sorted keys of non-empty bins and offsets of their points in order
+
+    .. automethod:: __init__
+    """
+    def __init__(self, points, items=None, pointsPerBin=2.):
+        """
+        Builds the grid.
+
+        :param numpy.array points: (N,D) array of point coordinates (D<3 is padded by zeros)
+        :param items: Optional sequence of N items returned by :func:`giveItemsInBBox`
+        :param float pointsPerBin: average number of points per bin the grid spacing is chosen for
+        """
+        self.points=_pointArray(points) if len(points) else numpy.zeros((0,3))
+        self.items=items
+        n=self.points.shape[0]
+        lo,hi=(self.points.min(axis=0),self.points.max(axis=0)) if n else (numpy.zeros(3),numpy.zeros(3))
+        ext=hi-lo
+        self.mask=(ext>0)
+        dim=self.mask.sum()
+        h=(numpy.prod(ext[self.mask])*pointsPerBin/n)**(1./dim) if dim else 1.
+        nb=numpy.where(self.mask,numpy.floor(ext/h)+1,1).astype(numpy.int64)
+        # points concentrated in a thin region would lead to too many (even if empty) bins
+        while nb.prod()>8*n+64:
+            h*=2.
+            nb=numpy.where(self.mask,numpy.floor(ext/h)+1,1).astype(numpy.int64)
+        self.origin,self.binSize,self.numBins=lo,h,nb
+        keys=self._binKey(self._binIndex(self.points))
+        self.order=numpy.argsort(keys,kind='mergesort')
+        self.binKeys,start=numpy.unique(keys[self.order],return_index=True)
+        self.binStart=numpy.concatenate((start,[n])).astype(numpy.int64)
+
+    def _binIndex(self, x):
+        'Return (unclipped) integer bin coordinates of given (N,3) points.'
+        ijk=numpy.floor((x-self.origin)/self.binSize)
+        ijk[:,~self.mask]=0
+        # limit the range so that conversion to int does not overflow for points far away
+        return numpy.clip(ijk,-1-self.numBins,2*self.numBins).astype(numpy.int64)
+
+    def _binKey(self, ijk):
+        'Return linear key of (clipped) bin coordinates.'
+        ijk=numpy.clip(ijk,0,self.numBins-1)
+        return (ijk[:,0]*self.numBins[1]+ijk[:,1])*self.numBins[2]+ijk[:,2]
+
+    def _gather(self, ilo, ihi):
+        """
+        Return all points in bin ranges ilo..ihi (inclusive, clipped to the grid).
+
+        :return: (iq,ip) arrays of range and point indices
+        """
+        ilo,ihi=numpy.maximum(ilo,0),numpy.minimum(ihi,self.numBins-1)
+        span=numpy.maximum(ihi-ilo+1,0)
+        cnt=span.prod(axis=1)
+        iq=numpy.repeat(numpy.arange(ilo.shape[0]),cnt)
+        k,s=_raggedArange(cnt),span[iq]
+        keys=self._binKey(ilo[iq]+numpy.column_stack((k//(s[:,1]*s[:,2]),(k//s[:,2])%s[:,1],k%s[:,2])))
+        b=numpy.searchsorted(self.binKeys,keys)
+        b=numpy.minimum(b,self.binKeys.size-1)
+        hit=(self.binKeys[b]==keys)
+        iq,b=iq[hit],b[hit]
+        pcnt=self.binStart[b+1]-self.binStart[b]
+        ip=self.order[numpy.repeat(self.binStart[b],pcnt)+_raggedArange(pcnt)]
+        return numpy.repeat(iq,pcnt),ip
+
+    def giveNearest(self, points, k=1):
+        """
+        Find k nearest points for all given query points.
+
+        :param numpy.array points: (M,D) array of query points
+        :param int k: number of nearest points
+        :return: (distances,indices) arrays of shape (M,k), sorted by distance; if there are less than k points, missing entries have infinite distance and index -1
+        :rtype: (numpy.array,numpy.array)
+        """
+        q=_pointArray(points)
+        m,n=q.shape[0],self.points.shape[0]
+        dist,idx=numpy.full((m,k),numpy.inf),numpy.full((m,k),-1,dtype=numpy.int64)
+        ke=min(k,n)
+        if ke==0 or m==0: return dist,idx
+        qb=self._binIndex(q)
+        # distance in flat directions is the same for all points
+        flat=numpy.linalg.norm((q-self.origin)[:,~self.mask],axis=1)
+        # start with the ring which touches the grid
+        s=numpy.maximum(numpy.maximum(-qb,qb-(self.numBins-1)),0).max(axis=1)
+        active=numpy.arange(m)
+        while active.size:
+            ilo,ihi=qb[active]-s[active,None],qb[active]+s[active,None]
+            iq,ip=self._gather(ilo,ihi)
+            d=numpy.linalg.norm(q[active[iq]]-self.points[ip],axis=1)
+            # sort by query, then by distance; candidates are already grouped by query, so a single sort of a combined key is much faster than lexsort
+            o=numpy.argsort(iq+d/(2.*d.max()+1.)) if d.size else numpy.zeros(0,dtype=numpy.int64)
+            iq,ip,d=iq[o],ip[o],d[o]
+            cnt=numpy.bincount(iq,minlength=active.size)
+            start=numpy.cumsum(cnt)-cnt
+            kth=numpy.where(cnt>=ke,d[numpy.minimum(start+ke-1,d.size-1)] if d.size else numpy.inf,numpy.inf)
+            # points outside of the searched bins are at least s*binSize away (in non-flat directions)
+            full=numpy.all((ilo<=0)&(ihi>=self.numBins-1),axis=1)
+            done=full|(kth**2<=(s[active]*self.binSize)**2+flat[active]**2)
+            rank=_raggedArange(cnt)
+            sel=done[iq]&(rank<ke)
+            dist[active[iq[sel]],rank[sel]]=d[sel]
+            idx[active[iq[sel]],rank[sel]]=ip[sel]
+            active=active[~done]
+            s[active]+=1
+        return dist,idx
+
+    def giveInRadius(self, points, radius):
+        """
+        Find all points within given distance from query points.
+
+        :param numpy.array points: (M,D) array of query points
+        :param float radius: search radius (scalar or array of M values)
+        :return: (iq,ip) arrays of query and point indices, sorted by query and point index
+        :rtype: (numpy.array,numpy.array)
+        """
+        q=_pointArray(points)
+        r=numpy.broadcast_to(numpy.asarray(radius,dtype=numpy.float64),(q.shape[0],))
+        if self.points.shape[0]==0 or q.shape[0]==0: return numpy.zeros(0,dtype=numpy.int64),numpy.zeros(0,dtype=numpy.int64)
+        iq,ip=self._gather(self._binIndex(q-r[:,None]),self._binIndex(q+r[:,None]))
+        ok=numpy.linalg.norm(q[iq]-self.points[ip],axis=1)<=r[iq]
+        o=numpy.lexsort((ip[ok],iq[ok]))
+        return iq[ok][o],ip[ok][o]
+
+    def giveIndicesInBBox(self, ll, ur):
+        """
+        :param tuple ll: lower left corner of the box
+        :param tuple ur: upper right corner of the box
+        :return: indices of points inside given box
+        :rtype: numpy.array
+        """
+        ll,ur=_pointArray(ll),_pointArray(ur)
+        if self.points.shape[0]==0: return numpy.zeros(0,dtype=numpy.int64)
+        iq,ip=self._gather(self._binIndex(ll),self._binIndex(ur))
+        ok=numpy.all((self.points[ip]>=ll)&(self.points[ip]<=ur),axis=1)
+        return numpy.sort(ip[ok])
+
+    def __getstate__(self):
+        """
+        Customized method returning dictionary for pickling; items are not pickled, only the index arrays. The owner of the items (e.g. the mesh) should set the items attribute again after unpickling.
+        """
+        d2=self.__dict__.copy()
+        d2['items']=None
+        return d2
+
+    def __setstate__(self, state):
+        """
+        Restore the instance from :func:`__getstate__`.
+        """
+        self.__dict__.update(state)
+        if 'items' not in state: self.items=None
+
+    def insert (self, item):
+        """
+        Not supported, the localizer is static and must be rebuilt.
+        """
+        raise NotImplementedError('PointLocalizer is static and must be rebuilt to insert items')
+
+    def delete (self, item):
+        """
+        Not supported, the localizer is static and must be rebuilt.
+        """
+        raise NotImplementedError('PointLocalizer is static and must be rebuilt to delete items')
+
+    def giveItemsInBBox (self, bbox):
+        """
+        Returns the set of items (or point indices, if no items were given) inside given bounding box.
+
+        :param BBox bbox: target bounding box
+        :rtype: set
+        """
+        ii=self.giveIndicesInBBox(bbox.coords_ll,bbox.coords_ur).tolist()
+        if self.items is None: return set(ii)
+        return set(self.items[i] for i in ii)
+
+    def evaluate(self, functor):
+        """
+        Evaluate the given functor on all items inside the functor bounding box, see :func:`Localizer.Localizer.evaluate`.
+        """
+        for i in self.giveItemsInBBox(functor.getBBox()): functor.evaluate(i)
@@ -6,7 +6,7 @@ try:
    import cPickle as pickle #faster serialization if available
 except:
    import pickle
-import collections
+import collections.abc
 
 @Pyro4.expose
 class Property(MupifObject.MupifObject, PhysicalQuantity):
@@ -172,7 +172,7 @@ class ConstantProperty(Property):
            conversionTupleTo(target_unit)
            """
            (factor, offset) = src_unit.conversionTupleTo(target_unit)
-           if isinstance(value, collections.Iterable):
+           if isinstance(value, collections.abc.Iterable):
               return tuple((v+offset)*factor for v in value)
            else:
               return (value + offset) * factor
@@ -28,6 +28,8 @@ import socket
 import getpass
 import subprocess
 import time
+import sys
+import pickle
 from . import RemoteAppRecord
 from . import Application
 from . import JobManager
@@ -37,8 +39,10 @@ log = logging.getLogger()
 
 Pyro4.config.SERIALIZER="pickle"
 # some versions of Pyro don't have this attribute... (strange, is documented)
-if hasattr(Pyro4.config,'PICKLE_PROTOCOL_VERSION'):
-    Pyro4.config.PICKLE_PROTOCOL_VERSION=2 # use lower version for interoperability between python 2 and 3
+# python 3 uses the highest protocol, which pickles numpy arrays (field values, mesh data) as raw buffers; protocol 2
+# (interoperable with python 2, set PYRO_PICKLE_PROTOCOL_VERSION=2 in the environment when mixing) pickles them as latin1-encoded text
+if hasattr(Pyro4.config,'PICKLE_PROTOCOL_VERSION') and 'PYRO_PICKLE_PROTOCOL_VERSION' not in os.environ:
+    Pyro4.config.PICKLE_PROTOCOL_VERSION=2 if sys.version_info[0]<3 else pickle.HIGHEST_PROTOCOL
 Pyro4.config.SERIALIZERS_ACCEPTED={'pickle'}
 #Pyro4.config.THREADPOOL_SIZE=100
 Pyro4.config.SERVERTYPE="multiplex"
@@ -296,7 +300,7 @@ def getNSAppName(jobname, appname):
     """
     return 'Mupif'+'.'+jobname+'.'+appname
 
-def runDaemon(host, port, nathost=None, natport=None, hkey=None):
+def runDaemon(host, port, nathost=None, natport=None, hkey=None, serverType=None):
     """
     Runs a daemon without registering to a name server
     :param str(int) host: Host name where daemon runs. This is typically a localhost
@@ -304,12 +308,19 @@ def runDaemon(host, port, nathost=None, natport=None, hkey=None):
     :param str(int) nathost: Hostname of the server as reported by nameserver, for secure ssh tunnel it should be set to 'localhost' (external host name)
     :param int natport: Server NAT port, optional (external port)
     :param str hkey: A password string
+    :param str serverType: Pyro server type, 'thread' or 'multiplex' (default given by Pyro4.config.SERVERTYPE). Job managers queueing the requests require 'thread', see :func:`JobManager.JobManager.allocateJob`.
 
     :return Instance of the running daemon, None if a problem
     :rtype Pyro4.Daemon
     """
     try:
-        daemon = Pyro4.Daemon(host=host, port=int(port), nathost=nathost, natport=Util.NoneOrInt(natport))
+        defaultServerType = Pyro4.config.SERVERTYPE
+        if serverType:
+            Pyro4.config.SERVERTYPE = serverType
+        try:
+            daemon = Pyro4.Daemon(host=host, port=int(port), nathost=nathost, natport=Util.NoneOrInt(natport))
+        finally:
+            Pyro4.config.SERVERTYPE = defaultServerType
         #daemon._pyroHmacKey = hkey.encode(encoding='UTF-8')#needed probably in future
         log.info('Pyro4 daemon runs on %s:%s using nathost %s:%s' % (host, port, nathost, natport))
     except socket.error as e:
@@ -523,7 +534,7 @@ def connectJobManager (ns, jobManName, hkey=None, sshContext=None):
     return JobManager.RemoteJobManager(jobMan, tunnelJobMan)
 
 
-def allocateApplicationWithJobManager (ns, jobMan, natPort, hkey, sshContext=None):
+def allocateApplicationWithJobManager (ns, jobMan, natPort, hkey, sshContext=None, wait=0., priority=0, resources=None):
     """
     Request new application instance to be spawned by  given jobManager.
     
@@ -532,6 +543,9 @@ def allocateApplicationWithJobManager (ns, jobMan, natPort, hkey, sshContext=Non
     :param int natPort: nat port on a local computer for ssh tunnel for the application
     :param str hkey: A password string
     :param sshContext sshContext: describing optional ssh tunnel connection detail
+    :param float wait: maximum time to wait for resources of job manager, see :func:`JobManager.JobManager.allocateJob`
+    :param int priority: priority of the request, see :func:`JobManager.JobManager.allocateJob`
+    :param dict resources: resources required by the application (e.g. cores, memory), see :func:`JobManager.JobManager.allocateJob`
 
     :returns: Application instance
     :rtype: Application.RemoteApplication
@@ -557,7 +571,10 @@ def allocateApplicationWithJobManager (ns, jobMan, natPort, hkey, sshContext=Non
 
     try:
         (username,hostname)=getUserInfo()
-        retRec = jobMan.allocateJob(username+"@"+hostname, natPort=natPort)
+        if wait or priority or resources:
+            retRec = jobMan.allocateJob(username+"@"+hostname, natPort=natPort, wait=wait, priority=priority, resources=resources)
+        else:
+            retRec = jobMan.allocateJob(username+"@"+hostname, natPort=natPort)
         log.info('Allocated job, returned record from jobManagaer:' +  str(retRec))
     except Exception:
         log.exception("JobManager allocateJob() failed")
@@ -30,6 +30,9 @@ import time as timeTime
 import Pyro4
 import logging
 import sys
+import json
+import uuid
+import concurrent.futures
 from . import JobManager
 from . import PyroUtil
 from . import PyroFile
@@ -46,6 +49,51 @@ SJM2_PROC_INDX = 0 #object of subprocess.Popen
 SJM2_URI_INDX = 3 #Pyro4 uri
 SJM2_PORT_INDX = 4 #port
 
+
+def sendMessage(conn, msg):
+    """
+    Sends a message to JobMan2cmd worker (or job manager), see :func:`recvMessage`.
+
+    :param socket.socket conn: connected socket
+    :param str msg: message (single line)
+    """
+    conn.sendall((msg+'\n').encode('utf-8'))
+
+def recvMessage(conn):
+    """
+    Receives a message sent by :func:`sendMessage`.
+
+    :param socket.socket conn: connected socket
+    :return: received message, empty if the connection was closed
+    :rtype: str
+    """
+    data = b''
+    while not data.endswith(b'\n'):
+        chunk = conn.recv(1024)
+        if not chunk:
+            break
+        data += chunk
+    return data.decode('utf-8').strip()
+
+def setAffinity(pid, cpus):
+    """
+    Pins all threads of a process to given CPUs. Threads and processes started later inherit the affinity. Supported on Linux only, does nothing elsewhere.
+
+    :param int pid: process id
+    :param cpus: CPU ids
+    :type cpus: list of int
+    """
+    if not hasattr(os, 'sched_setaffinity'):
+        return
+    taskDir = '/proc/%d/task' % pid
+    tasks = [int(tid) for tid in os.listdir(taskDir)] if os.path.isdir(taskDir) else [pid]
+    for tid in tasks:
+        try:
+            os.sched_setaffinity(tid, cpus)
+        except ProcessLookupError:
+            # thread finished meanwhile
+            pass
+
 @Pyro4.expose
 class SimpleJobManager(JobManager.JobManager):
     """
@@ -57,7 +105,7 @@ class SimpleJobManager(JobManager.JobManager):
 
     .. automethod:: __init__
     """
-    def __init__ (self, daemon, ns, appAPIClass, appName, jobManWorkDir, maxJobs=1):
+    def __init__ (self, daemon, ns, appAPIClass, appName, jobManWorkDir, maxJobs=1, resources=None):
         """Constructor.
 
         :param Pyro4.Daemon daemon: running daemon for SimpleJobManager
@@ -66,15 +114,15 @@ class SimpleJobManager(JobManager.JobManager):
         :param str appName: application name
         :param str jobManWorkDir: see :func:`JobManager.__init__`
         :param int maxJobs: see :func:`JobManager.__init__`
+        :param dict resources: see :func:`JobManager.__init__`, the jobs are not pinned to assigned cores as they run in the same process
         """
-        super(SimpleJobManager, self).__init__(appName, jobManWorkDir, maxJobs)
+        super(SimpleJobManager, self).__init__(appName, jobManWorkDir, maxJobs, resources)
         # remember application API class to create new app instances later
         self.appAPIClass = appAPIClass
         self.daemon = daemon
         self.ns = ns
         self.jobCounter = 0
         self.jobPort = daemon.locationString
-        self.lock = threading.Lock()
 
         # pyro daemon running in thread pool based setting to allow for concurrent connections
         #self.pyroDaemon = Pyro4.Daemon(host=server, port=port, nathost=nathost, natport=natport)
@@ -82,7 +130,7 @@ class SimpleJobManager(JobManager.JobManager):
         #self.ns = connectNameServer(nshost, nsport, hkey)
         log.debug('SimpleJobManager: initialization done')
 
-    def allocateJob(self, user, natPort):
+    def allocateJob(self, user, natPort, wait=0., priority=0, resources=None):
         """
         Allocates a new job.
 
@@ -92,37 +140,39 @@ class SimpleJobManager(JobManager.JobManager):
         """
         self.lock.acquire()
         log.debug('SimpleJobManager:allocateJob...')
-        if (len(self.activeJobs) >= self.maxJobs):
-            log.error('SimpleJobManager: no more resources')
+        try:
+            request = self._waitForResources(user, wait, priority, resources)
+        except JobManager.JobManException:
             self.lock.release()
-            raise JobManNoResourcesException("SimpleJobManager: no more resources");
-            # return (JOBMAN_NO_RESOURCES,None)
-        else:
-            # update job counter
-            self.jobCounter = self.jobCounter+1
-            jobID = str(self.jobCounter)+"@"+self.applicationName
-            log.debug('SimpleJobManager: trying to allocate '+jobID)
-            # run the new application instance in a new thread
-            try:
-                app = self.appAPIClass()
-                start = timeTime.time()
-                self.activeJobs[jobID] = (app, start, user)
-                #register agent; exposing all its methods
-                #ExposedApp = Pyro4.expose(app)
-                #uri = self.daemon.register(ExposedApp) #
-                uri = self.daemon.register(app)
-                self.ns.register(jobID, uri)
-                log.info('NameServer %s registered uri %s' % (jobID, uri) )
-
-            except:
-                log.error('Unable to start thread')
-                self.lock.release()
-                raise
-                return (JobManager.JOBMAN_ERR,None)
-
-            log.info('SimpleJobManager:allocateJob: successfully allocated ' + jobID)
+            raise
+        # update job counter
+        self.jobCounter = self.jobCounter+1
+        jobID = str(self.jobCounter)+"@"+self.applicationName
+        self._assignResources(jobID, request)
+        log.debug('SimpleJobManager: trying to allocate '+jobID)
+        # run the new application instance in a new thread
+        try:
+            app = self.appAPIClass()
+            start = timeTime.time()
+            self.activeJobs[jobID] = (app, start, user)
+            #register agent; exposing all its methods
+            #ExposedApp = Pyro4.expose(app)
+            #uri = self.daemon.register(ExposedApp) #
+            uri = self.daemon.register(app)
+            self.ns.register(jobID, uri)
+            log.info('NameServer %s registered uri %s' % (jobID, uri) )
+
+        except:
+            log.error('Unable to start thread')
+            self.activeJobs.pop(jobID, None)
+            self._releaseResources(jobID)
             self.lock.release()
-            return (JobManager.JOBMAN_OK, jobID, self.jobPort)
+            raise
+            return (JobManager.JOBMAN_ERR,None)
+
+        log.info('SimpleJobManager:allocateJob: successfully allocated ' + jobID)
+        self.lock.release()
+        return (JobManager.JOBMAN_OK, jobID, self.jobPort)
 
     def terminateJob (self, jobID):
         """
@@ -132,6 +182,7 @@ class SimpleJobManager(JobManager.JobManager):
         """
         self.lock.acquire()
         self.activeJobs[jobID][SJM2_PROC_INDX].terminate()
+        self._jobFinished(jobID, self.activeJobs[jobID][SJM_STARTTIME_INDX])
         del self.activeJobs[jobID]
         log.debug('SimpleJobManager:terminateJob: job terminated ' + jobID)
         self.lock.release()
@@ -145,14 +196,16 @@ class SimpleJobManager(JobManager.JobManager):
 
     def getStatus (self):
         """
-        Returns a list of tuples for all running jobIDs
+        Returns a list of tuples for all running jobIDs, followed by requests waiting in the queue (see :func:`JobManager.getStatus`)
         :return: a list of tuples (jobID, running time, user)
         :rtype: a list of (str, float, str)
         """
         status = []
-        tnow = timeTime.time()
-        for key in self.activeJobs:
-            status.append((key, tnow-self.activeJobs[key][SJM_STARTTIME_INDX], self.activeJobs[key][SJM_USER_INDX] ))
+        with self.lock:
+            tnow = timeTime.time()
+            for key in self.activeJobs:
+                status.append((key, tnow-self.activeJobs[key][SJM_STARTTIME_INDX], self.activeJobs[key][SJM_USER_INDX]))
+            status.extend(self._queueStatus([rec[SJM_STARTTIME_INDX] for rec in self.activeJobs.values()]))
         return status
 
 
@@ -163,11 +216,11 @@ class SimpleJobManager2 (JobManager.JobManager):
 
     .. automethod:: __init__
 
-    :param int jobMancmdCommPort: optional communication port to communicate with jobman2cmd
+    :param int jobMancmdCommPort: optional communication port to communicate with jobman2cmd, 0 to use any free port
     :param str configFile: path to server config file
 
     """
-    def __init__ (self, daemon, ns, appAPIClass, appName, portRange, jobManWorkDir, serverConfigPath, serverConfigFile, serverConfigMode, jobMan2CmdPath, maxJobs=1, jobMancmdCommPort=10000):
+    def __init__ (self, daemon, ns, appAPIClass, appName, portRange, jobManWorkDir, serverConfigPath, serverConfigFile, serverConfigMode, jobMan2CmdPath, maxJobs=1, jobMancmdCommPort=10000, poolSize=0, resources=None):
         """
         Constructor.
 
@@ -175,8 +228,10 @@ class SimpleJobManager2 (JobManager.JobManager):
         :param tuple portRange: start and end ports for jobs which will be allocated by a job manager
         :param str serverConfigFile: path to serverConfig file
         :param str jobMan2CmdPath: path to JobMan2cmd.py
+        :param int poolSize: number of idle JobMan2cmd workers started in advance. Idle workers have the server config (and application module) imported and name server located, so that allocated jobs only start their daemon and application. The pool is replenished in background.
+        :param dict resources: see :func:`JobManager.__init__`, job processes are pinned to their assigned cores
         """
-        super(SimpleJobManager2, self).__init__(appName, jobManWorkDir, maxJobs)
+        super(SimpleJobManager2, self).__init__(appName, jobManWorkDir, maxJobs, resources)
         # remember application API class to create new app instances later
         self.appAPIClass = appAPIClass
         self.daemon = daemon
@@ -191,95 +246,197 @@ class SimpleJobManager2 (JobManager.JobManager):
         if maxJobs > len(self.freePorts):
             log.error('SimpleJobManager2: not enough free ports, changing maxJobs to %d'%(self.freePorts.size()))
             self.maxJobs = len(self.freePorts)
-        self.lock = threading.Lock()
         jobID = ""
 
-        # Create a TCP/IP socket to get uri from daemon registering an application
+        # Create a TCP/IP socket to communicate with JobMan2cmd workers
         self.s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.s.bind(('localhost', self.jobMancmdCommPort))
-        self.s.listen(1)
+        # port actually bound, if any free port was requested
+        self.jobMancmdCommPort = self.s.getsockname()[1]
+        self.s.listen(socket.SOMAXCONN)
+        # timeout to check that the job manager was not terminated
+        self.s.settimeout(1.)
+        # starting workers as token: future of the connection, see _startWorker
+        self.startingWorkers = {}
+        self.acceptThread = threading.Thread(target=self._acceptWorkers)
+        self.acceptThread.daemon = True
+        self.acceptThread.start()
+
+        # idle workers as (proc, conn) tuples
+        self.poolSize = poolSize
+        self.pool = []
+        self.poolEvent = threading.Event()
+        self.poolThread = None
+        if poolSize > 0:
+            self.poolThread = threading.Thread(target=self._fillPool)
+            self.poolThread.daemon = True
+            self.poolThread.start()
+            self.poolEvent.set()
 
         log.debug('SimpleJobManager2: initialization done for application name %s' % self.applicationName)
 
-    def allocateJob (self, user, natPort):
+    def allocateJob (self, user, natPort, wait=0., priority=0, resources=None):
         """
         Allocates a new job.
 
-        See :func:`JobManager.allocateJob`
+        See :func:`JobManager.allocateJob`. The lock is held only while the job is registered, several jobs may be started at once.
         :except: unable to start a thread, no more resources
         """
         self.lock.acquire()
         log.info('SimpleJobManager2: allocateJob...')
-        if (len(self.activeJobs) >= self.maxJobs):
-            log.error('SimpleJobManager2: no more resources, activeJobs:%d >= maxJobs:%d' % (len(self.activeJobs), self.maxJobs) )
-            self.lock.release()
-            raise JobManNoResourcesException("SimpleJobManager: no more resources");
-            # return (JOBMAN_NO_RESOURCES,None)
-        else:
+        try:
+            request = self._waitForResources(user, wait, priority, resources)
             # update job counter
             self.jobCounter = self.jobCounter+1
             jobID = str(self.jobCounter)+"@"+self.applicationName
-            log.debug('SimpleJobManager2: trying to allocate '+jobID)
-            # run the new application instance served by corresponding pyro daemon in a new process
             jobPort = self.freePorts.pop(0)
-            log.info('SimpleJobManager2: port to be assigned %d'%(jobPort))
+            self.pendingJobs[jobID] = (None, timeTime.time(), user, None, jobPort)
+            assigned = self._assignResources(jobID, request)
+        finally:
+            self.lock.release()
+        log.debug('SimpleJobManager2: trying to allocate '+jobID)
+        log.info('SimpleJobManager2: port to be assigned %d'%(jobPort))
 
+        # run the new application instance served by corresponding pyro daemon in a new process
+        proc = None
+        try:
+            targetWorkDir = self.jobManWorkDir+os.path.sep+jobID
+            log.info('SimpleJobManager2: Checking target workdir %s', targetWorkDir)
+            if not os.path.exists(targetWorkDir):
+                os.makedirs(targetWorkDir)
+                log.info('SimpleJobManager2: creating target workdir %s', targetWorkDir)
+
+            proc, conn = self._takeWorker()
+            if 'cores' in assigned:
+                try:
+                    setAffinity(proc.pid, assigned['cores'])
+                except OSError as e:
+                    log.warning('SimpleJobManager2: can not pin job %s to CPUs %s: %s' % (jobID, assigned['cores'], e))
+            sendMessage(conn, json.dumps({'port': jobPort, 'jobID': jobID, 'natPort': natPort, 'workDir': targetWorkDir}))
+            uri = recvMessage(conn)
+            conn.close()
+            log.info('Received uri: %s' % uri)
+            if not uri:
+                raise JobManager.JobManException('SimpleJobManager2: worker of job %s exited without sending uri' % jobID)
+        except Exception as e:
+            log.exception(e)
+            log.error('Unable to start thread')
+            if proc is not None:
+                # do not leak the worker
+                proc.terminate()
+            with self.lock:
+                del self.pendingJobs[jobID]
+                self.freePorts.append(jobPort)
+                self._releaseResources(jobID)
+            raise
+            return (JobManager.JOBMAN_ERR,None)
+
+        with self.lock:
+            del self.pendingJobs[jobID]
+            self.activeJobs[jobID] = (proc, timeTime.time(), user, uri, jobPort)
+        log.debug('SimpleJobManager2: new process ')
+        log.debug(self.activeJobs[jobID])
+        log.info('SimpleJobManager2:allocateJob: allocated ' + jobID)
+        return (JobManager.JOBMAN_OK, jobID, jobPort)
+
+    def _acceptWorkers(self):
+        """
+        Accepts connections of starting workers and passes them to the threads waiting for them (identified by token, see :func:`_startWorker`). Runs in a separate thread until the job manager is terminated.
+        """
+        while self.acceptThread is not None:
             try:
-                targetWorkDir = self.jobManWorkDir+os.path.sep+jobID
-                log.info('SimpleJobManager2: Checking target workdir %s', targetWorkDir)
-                if not os.path.exists(targetWorkDir):
-                    os.makedirs(targetWorkDir)
-                    log.info('SimpleJobManager2: creating target workdir %s', targetWorkDir)
-            except Exception as e:
-                log.exception(e)
-                raise
-                return (JOBMAN_ERR,None)
-
+                conn, addr = self.s.accept()
+            except socket.timeout:
+                continue
+            except socket.error:
+                # socket closed
+                return
+            log.debug('Connected by %s' % str(addr))
             try:
-                args = [self.jobMan2CmdPath, '-p', str(jobPort), '-j', str(jobID), '-n', str(natPort), '-d', str(targetWorkDir), '-s', str(self.jobMancmdCommPort), '-i', self.serverConfigPath,  '-c', str(self.configFile), '-m', str(self.serverConfigMode)]
-                if self.jobMan2CmdPath[-3:] == '.py':
-                    #use the same python interpreter as running this code, prepend to the arguments
-                    args.insert(0, sys.executable)
-                    log.info("Using python interpreter %s" % sys.executable)
-                    proc = subprocess.Popen(args)#, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-                else:
-                    proc = subprocess.Popen(args)#, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
-                log.debug('SimpleJobManager2: new subprocess has been started: %s', " ".join(args))
-            except Exception as e:
+                conn.settimeout(10.)
+                msg = recvMessage(conn).split()
+                conn.settimeout(None)
+            except socket.error as e:
                 log.exception(e)
-                raise
-                return (JOBMAN_ERR,None)
-            
-            try:
-                # try to get uri from Property.psubprocess
-                uri = None # avoids UnboundLocalError in py3k
-                conn, addr = self.s.accept()
-                log.debug('Connected by %s' % str(addr))
-                while True:
-                    data = conn.recv(1024)
-                    if not data: break
-                    uri = repr(data).rstrip('\'').lstrip('\'')
-                    log.info('Received uri: %s' % uri)
                 conn.close()
-                #s.shutdown(socket.SHUT_RDWR)
-                #s.close()
-
-                # check if uri is ok
-                # either by doing some sort of regexp or query ns for it
-                start = timeTime.time()
-                self.activeJobs[jobID] = (proc, start, user, uri, jobPort)
-                log.debug('SimpleJobManager2: new process ')
-                log.debug(self.activeJobs[jobID])
-            except Exception as e:
-                log.exception(e)
-                log.error('Unable to start thread')
-                self.lock.release()
-                raise
-                return (JobManager.JOBMAN_ERR,None)
+                continue
+            with self.lock:
+                future = self.startingWorkers.pop(msg[1], None) if len(msg) == 2 and msg[0] == 'ready' else None
+            if future is None:
+                log.warning('SimpleJobManager2: unexpected message from worker: %s' % ' '.join(msg))
+                conn.close()
+                continue
+            future.set_result(conn)
 
-            log.info('SimpleJobManager2:allocateJob: allocated ' + jobID)
-            self.lock.release()
-            return (JobManager.JOBMAN_OK, jobID, jobPort)
+    def _startWorker(self):
+        """
+        Starts a new JobMan2cmd worker and waits until it is ready to get a job.
+
+        :return: worker process and connection to it
+        :rtype: tuple (subprocess.Popen, socket.socket)
+        :except: JobManException when the worker exits before getting ready
+        """
+        token = uuid.uuid4().hex
+        future = concurrent.futures.Future()
+        with self.lock:
+            self.startingWorkers[token] = future
+        args = [self.jobMan2CmdPath, '-w', '-t', token, '-s', str(self.jobMancmdCommPort), '-i', self.serverConfigPath,  '-c', str(self.configFile), '-m', str(self.serverConfigMode)]
+        if self.jobMan2CmdPath[-3:] == '.py':
+            #use the same python interpreter as running this code, prepend to the arguments
+            args.insert(0, sys.executable)
+        try:
+            proc = subprocess.Popen(args)
+            log.debug('SimpleJobManager2: new subprocess has been started: %s', " ".join(args))
+            while True:
+                try:
+                    return (proc, future.result(1.))
+                except concurrent.futures.TimeoutError:
+                    if proc.poll() is not None:
+                        raise JobManager.JobManException('SimpleJobManager2: worker exited with code %d' % proc.returncode)
+        finally:
+            with self.lock:
+                self.startingWorkers.pop(token, None)
+
+    def _takeWorker(self):
+        """
+        Returns an idle worker from the pool, or a newly started one if the pool is empty.
+
+        :return: worker process and connection to it
+        :rtype: tuple (subprocess.Popen, socket.socket)
+        """
+        with self.lock:
+            while self.pool:
+                proc, conn = self.pool.pop(0)
+                self.poolEvent.set()
+                if proc.poll() is None:
+                    return (proc, conn)
+                log.warning('SimpleJobManager2: idle worker exited with code %d' % proc.returncode)
+                conn.close()
+        return self._startWorker()
+
+    def _fillPool(self):
+        """
+        Keeps poolSize idle workers, runs in a separate thread.
+        """
+        while True:
+            self.poolEvent.wait()
+            self.poolEvent.clear()
+            while self.poolThread is not None and len(self.pool) < self.poolSize:
+                try:
+                    worker = self._startWorker()
+                except Exception as e:
+                    log.exception(e)
+                    break
+                with self.lock:
+                    if self.poolThread is None:
+                        # terminated meanwhile
+                        worker[1].close()
+                        worker[0].terminate()
+                        return
+                    self.pool.append(worker)
+                log.debug('SimpleJobManager2: %d idle workers' % len(self.pool))
+            if self.poolThread is None:
+                return
 
     def terminateJob(self, jobID):
         """
@@ -287,9 +444,9 @@ class SimpleJobManager2 (JobManager.JobManager):
 
         See :func:`JobManager.terminateJob`
         """
-        self.lock.acquire()
         # unregister the applictaion from ns
         self.ns.remove(jobID)
+        self.lock.acquire()
         # terminate the process
         if jobID in self.activeJobs:
             try:
@@ -298,6 +455,7 @@ class SimpleJobManager2 (JobManager.JobManager):
                 self.freePorts.append(self.activeJobs[jobID][SJM2_PORT_INDX])
                 # delete entry in the list of active jobs
                 log.debug('SimpleJobManager2:terminateJob: job %s terminated, freeing port %d'%(jobID, self.activeJobs[jobID][SJM2_PORT_INDX]))
+                self._jobFinished(jobID, self.activeJobs[jobID][SJM_STARTTIME_INDX])
                 del self.activeJobs[jobID]
             except KeyError:
                 log.debug('SimpleJobManager2:terminateJob: jobID error, job %s already terminated?'%(jobID))
@@ -309,6 +467,15 @@ class SimpleJobManager2 (JobManager.JobManager):
         """
         Terminates job manager itself.
         """
+        # stop accepting and filling the pool, terminate idle workers
+        self.acceptThread = None
+        self.poolThread = None
+        self.poolEvent.set()
+        with self.lock:
+            for proc, conn in self.pool:
+                conn.close()
+                proc.terminate()
+            self.pool = []
         try:
             self.ns.remove(self.applicationName)
             log.debug("Removing job manager %s from a nameServer %s" % (self.applicationName, self.ns) )
@@ -335,11 +502,16 @@ class SimpleJobManager2 (JobManager.JobManager):
     def getStatus(self):
         """
         See :func:`JobManager.getStatus`
+
+        :return: a list of tuples (jobID, running time, user, port, assigned resources) followed by tuples (None, waiting time, user, position in queue, estimated wait, required resources) of queued requests
+        :rtype: list of tuples
         """
         status = []
-        tnow = timeTime.time()
-        for key in self.activeJobs:
-            status.append((key, tnow-self.activeJobs[key][SJM_STARTTIME_INDX], self.activeJobs[key][SJM_USER_INDX], self.activeJobs[key][SJM2_PORT_INDX]  ))
+        with self.lock:
+            tnow = timeTime.time()
+            for key in self.activeJobs:
+                status.append((key, tnow-self.activeJobs[key][SJM_STARTTIME_INDX], self.activeJobs[key][SJM_USER_INDX], self.activeJobs[key][SJM2_PORT_INDX], self.jobResources.get(key, {})))
+            status.extend(self._queueStatus([rec[SJM_STARTTIME_INDX] for rec in self.activeJobs.values()]))
         return status
 
     def uploadFile(self, jobID, filename, pyroFile):
@@ -1,8 +1,10 @@
 from __future__ import print_function, division
 from builtins import range
 
+import numpy
 
 from . import Mesh
+from . import CellGeometryType
 from . import Vertex
 from . import Cell
 from . import Field
@@ -12,64 +14,48 @@ from . import ValueType
 #debug flag
 debug = 0
 
-def readMesh(numNodes,nx,ny,nz,coords):
+def _giveBrickConnectivity(nx, ny, nz):
     """
-    Reads structured 3D mesh
+    Return vertex numbers of hexahedra of structured grid, in the order of :obj:`Cell.Brick_3d_lin`. Vertices are numbered with x index running fastest, then y and z; so are the elements.
+
+    :param int nx: Number of vertices in x direction
+    :param int ny: Number of vertices in y direction
+    :param int nz: Number of vertices in z direction
+    :return: ((nx-1)*(ny-1)*(nz-1),8) array of vertex numbers
+    :rtype: numpy.array
+    """
+    # first vertex of each element, from index grids broadcast against each other
+    n1 = (numpy.arange(nz-1)[:,None,None]*(nx*ny)+numpy.arange(ny-1)[None,:,None]*nx+numpy.arange(nx-1)[None,None,:]).ravel()
+    # offsets of n1,n2,n4,n3,n5,n6,n8,n7 with respect to n1
+    offsets = numpy.array([0, 1, nx+1, nx, nx*ny, nx*ny+1, nx*ny+nx+1, nx*ny+nx])
+    return n1[:,None]+offsets[None,:]
+
+def readMesh(numNodes,nx,ny,nz,coords,compact=False):
+    """
+    Reads structured 3D mesh. Connectivity of all elements is computed at once; vertices and cells are labeled from 1.
 
     :param int numNodes: Number of nodes
-    :param int nx: Number of elements in x direction
-    :param int ny: Number of elements in y direction
-    :param int nz: Number of elements in z direction
-    :param tuple coords: Coordinates for each nodes
+    :param int nx: Number of nodes in x direction
+    :param int ny: Number of nodes in y direction
+    :param int nz: Number of nodes in z direction
+    :param tuple coords: Coordinates for each nodes (sequence of tuples or (numNodes,3) array)
+    :param bool compact: Return :obj:`Mesh.CompactUnstructuredMesh` instead of :obj:`Mesh.UnstructuredMesh`, without creating vertex and cell objects
     :return: Mesh
     :rtype: Mesh
     """
+    coords = numpy.asarray(coords, dtype=numpy.float64)[:numNodes]
+    conn = _giveBrickConnectivity(nx, ny, nz)
+    numElts = conn.shape[0]
+    if debug: print("nodes: ", numNodes, "elements: ", numElts, "nx: ", nx, "ny: ", ny, "nz: ", nz)
+
+    if compact:
+        mesh = Mesh.CompactUnstructuredMesh()
+        mesh.setupFromArrays(coords, numpy.full(numElts, CellGeometryType.CGT_HEXAHEDRON), conn.ravel(), cellOffsets=numpy.arange(0, 8*numElts+1, 8),
+            vertexLabels=numpy.arange(1, numNodes+1), cellLabels=numpy.arange(1, numElts+1))
+        return mesh
     mesh = Mesh.UnstructuredMesh()
-    vertices = []
-    cells = []
-
-    for i in range(0,numNodes):
-        (x,y,z) = coords[i]
-        #print (x,y,z)
-        vertices.append(Vertex.Vertex(i, i+1, (x,y,z)))
-
-    print(numNodes)
-
-    numElts = (nx-1)*(ny-1)*(nz-1)
-    print(numElts)
-
-    print("nx: ",nx)
-    print("ny: ",ny)
-    print("nz: ",nz)
-
-    for e in range(0,numElts):
-        #print "elem :",e
-        i = e % (nx-1)
-        #print "ligne i :", i
-        j = (e//(nx-1))%(ny-1) 
-        #print "col j :", j
-        k = e//((nx-1)*(ny-1)) 
-        #print "k :", k
-
-        n1=i + j*nx + k*nx*ny
-        n2=n1+1
-        n3=i + (j+1)*nx + k*nx*ny
-        n4=n3+1
-        n5=i + j*nx + (k+1)*nx*ny
-        n6=n5+1
-        n7=i + (j+1)*nx + (k+1)*nx*ny
-        n8=n7+1
-
-        # print "n1 :", n1
-        # print "n2 :", n2
-        # print "n3 :", n3
-        # print "n4 :", n4
-        # print "n5 :", n5
-        # print "n6 :", n6
-        # print "n7 :", n7
-        # print "n8 :", n8
-        cells.append(Cell.Brick_3d_lin(mesh, e, e+1, (n1,n2,n4,n3,n5,n6,n8,n7)))
-
+    vertices = [Vertex.Vertex(i, i+1, tuple(xyz)) for i, xyz in enumerate(coords.tolist())]
+    cells = [Cell.Brick_3d_lin(mesh, e, e+1, tuple(vv)) for e, vv in enumerate(conn.tolist())]
     mesh.setup(vertices, cells)
     return mesh
 
@@ -81,13 +67,12 @@ def readField(mesh, Data, fieldID, units, time, name, filename, type):
     :param PhysicalUnit units: field units
     :param PhysicalQuantity time: time
     :param str name: name of the field to visualize
-    :param int type: type of value of the field (1:Scalar, 3:Vector, 6:Tensor) 
+    :param str filename: name of the file Data were read from (not used, kept for compatibility)
+    :param int type: type of value of the field (1:Scalar, 3:Vector, 6:Tensor)
 
-    :return: Field of unknowns
+    :return: Field of unknowns, with values as (numNodes,type) array
     :rtype: Field
     """
-    values=[]
-
     if (type == 1):
         ftype = ValueType.Scalar
     elif (type == 3):
@@ -95,37 +80,14 @@ def readField(mesh, Data, fieldID, units, time, name, filename, type):
     else:
         ftype = ValueType.Tensor
 
-
-    f=open(filename, "r")
-    numScalars=0
-    for line in f.readlines():
-        if line.find('SCALARS')>= 0:
-            numScalars=numScalars+1
-    print("numScalars : ",  numScalars)
-
-    count=0
-    for i in range(0,numScalars):
-        Name=Data.point_data.data[i].name
-        if (Name==name):
-            indice = count
-        count=count+1
-
-    fieldName=Data.point_data.data[indice].name
-    print("fieldName : ", fieldName)
-
-    scalar=[]
-    scalar=Data.point_data.data[indice].scalars
-
+    for data in Data.point_data.data:
+        if data.name == name: break
+    else: raise ValueError('Point data "%s" not found (available: %s)'%(name, ', '.join(d.name for d in Data.point_data.data)))
+    # attribute holding values differs by pyvtk data class (Scalars, ColorScalars, Vectors, Tensors, Normals, TextureCoordinates)
+    values = numpy.asarray(next(getattr(data, a) for a in ('scalars', 'vectors', 'tensors', 'normals', 'coords') if hasattr(data, a)), dtype=numpy.float64)
     numNodes = Data.point_data.length
-
-    # for i in range(0,numNodes):
-    #     print scalar[i]
-
-    print("name : ", name)
-    if(name==fieldName):
-        for i in range(0,numNodes):
-            values.append((scalar[i],))
-            #print "values : ", values
+    if debug: print("fieldName : ", name, "numNodes : ", numNodes)
+    values = values.reshape(numNodes, -1)
 
     field = Field.Field(mesh, fieldID ,ftype, units, time, values, Field.FieldType.FT_vertexBased )
     return field
@@ -61,6 +61,8 @@ class Workflow(Application.Application):
             self.targetTime = targetTime
         else:
             raise TypeError ('targetTime is not PhysicalQuantity')
+        # (writer,fieldIDs) pairs, see addFieldSeries
+        self.fieldSeries = []
 
         (username, hostname) = PyroUtil.getUserInfo()
         self.setMetadata(MetadataKeys.USERNAME, username)
@@ -92,7 +94,20 @@ class Workflow(Application.Application):
 
             self.solveStep(istep)
             self.finishStep(istep)
+            for writer,fieldIDs in self.fieldSeries:
+                writer.appendFields([self.getField(fid, istep.getTime()) for fid in fieldIDs], istep.getTime())
+                writer.flush()
         self.terminate()
+
+    def addFieldSeries(self, writer, fieldIDs):
+        """
+        Register fields to be written after every step of :func:`solve`. The fields are obtained by :func:`getField` once the step is finished, appended to their series and flushed, so that results can be inspected while the workflow is still running.
+
+        :param FieldSeries.FieldSeriesWriter writer: writer the fields are appended to
+        :param fieldIDs: IDs of fields to be written
+        :type fieldIDs: list of FieldID
+        """
+        self.fieldSeries.append((writer, list(fieldIDs)))
                          
  
     def getAPIVersion(self):
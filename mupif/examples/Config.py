@@ -1,5 +1,6 @@
 #Common configuration for running examples in local, ssh or VPN mode
 import sys, os, os.path
+import pickle
 import Pyro4
 import logging
 log = logging.getLogger()
@@ -18,7 +19,8 @@ class config(object):
            log.error("Unknown mode -m %d" % mode)
         
         Pyro4.config.SERIALIZER="pickle"
-        Pyro4.config.PICKLE_PROTOCOL_VERSION=2 #to work with python 2.x and 3.x
+        if 'PYRO_PICKLE_PROTOCOL_VERSION' not in os.environ: # set to 2 to work with python 2.x and 3.x
+            Pyro4.config.PICKLE_PROTOCOL_VERSION=2 if sys.version_info[0]<3 else pickle.HIGHEST_PROTOCOL
         Pyro4.config.SERIALIZERS_ACCEPTED={'pickle'}
         Pyro4.config.SERVERTYPE="multiplex"
 
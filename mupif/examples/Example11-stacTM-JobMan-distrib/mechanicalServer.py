@@ -12,7 +12,7 @@ cfg = serverConfig(mode)
 ns = PyroUtil.connectNameServer(nshost=cfg.nshost, nsport=cfg.nsport, hkey=cfg.hkey)
 
 #Run a daemon for jobMamager on this machine
-daemon = PyroUtil.runDaemon(host=cfg.server, port=cfg.serverPort, nathost=cfg.serverNathost, natport=cfg.serverNatport, hkey=cfg.hkey)
+daemon = PyroUtil.runDaemon(host=cfg.server, port=cfg.serverPort, nathost=cfg.serverNathost, natport=cfg.serverNatport, hkey=cfg.hkey, serverType="thread")
 
 #Run job manager on a server
 jobMan = SimpleJobManager.SimpleJobManager2(daemon, ns, cfg.applicationClass, cfg.jobManName, cfg.portsForJobs, cfg.jobManWorkDir, os.getcwd(), 'mechanicalServerConfig', mode, cfg.jobMan2CmdPath, cfg.maxJobs, cfg.socketApps)
@@ -18,6 +18,8 @@ class Demo13(Workflow.Workflow):
         self.thermal = demoapp.thermal_nonstat('inputT13.in','.')
         self.mechanical = demoapp.mechanical('inputM13.in', '.')
         self.matPlotFig = None
+        # transient results, viewable in ParaView (mesh stored once, values appended every step)
+        self.results = FieldSeries.XdmfWriter('results13.xmf')
 
 
     def solveStep(self, istep, stageID=0, runInBackground=False):
@@ -32,7 +34,8 @@ class Demo13(Workflow.Workflow):
             sol = self.mechanical.solveStep(istep) 
             f = self.mechanical.getField(FieldID.FID_Displacement, istep.getTime())
 
-            data = f.field2VTKData().tofile('M_%s'%str(istep.getNumber()))
+            self.results.appendFields([ft, f], istep.getTime())
+            self.results.flush()
             if (graphics):
                 self.matPlotFig = f.field2Image2D(title='Mechanical ' + str(istep.getTime().inUnitsOf(timeUnits).getValue()), barRange=(-9e-5, 1.6e-6), fileName='mechanical.png', fieldComponent=1, figsize = (12,6), matPlotFig=self.matPlotFig) 
             
@@ -44,6 +47,7 @@ class Demo13(Workflow.Workflow):
         return min (self.thermal.getCriticalTimeStep(), self.mechanical.getCriticalTimeStep())
 
     def terminate(self):
+        self.results.close()
         self.thermal.terminate()
         self.mechanical.terminate()
 
@@ -42,10 +42,11 @@ class Demo18(Workflow.Workflow):
 
         self.thermal.solveStep(istep)
         f = self.thermal.getField(FieldID.FID_Temperature, self.mechanical.getAssemblyTime(istep))
-        data = f.field2VTKData().tofile('T_%s'%str(istep.getNumber()))
-        
         self.mechanical.setField(f)
-        sol = self.mechanical.solveStep(istep) 
+        # solve mechanical problem in background while the temperature is being written
+        sol = self.mechanical.solveStep(istep, runInBackground=True)
+        data = f.field2VTKData().tofile('T_%s'%str(istep.getNumber()))
+        sol.result()
         f = self.mechanical.getField(FieldID.FID_Displacement, istep.getTime())
         data = f.field2VTKData().tofile('M_%s'%str(istep.getNumber()))
         
@@ -0,0 +1,99 @@
+import unittest
+import sys
+import time
+import threading
+import concurrent.futures
+sys.path.append('../..')
+
+from mupif import *
+import Pyro4
+
+@Pyro4.expose
+class App(Application.Application):
+    def __init__(self, delay=0.3):
+        super(App, self).__init__()
+        self.delay = delay
+        self.solved = []
+    def solveStep(self, tstep, stageID=0, runInBackground=False):
+        time.sleep(self.delay)
+        if tstep < 0: raise ValueError('negative step')
+        self.solved.append(tstep)
+        return tstep
+
+class SubApp(App):
+    def solveStep(self, tstep, stageID=0, runInBackground=False):
+        return super(SubApp, self).solveStep(tstep, stageID)+1
+
+class Application_TestCase(unittest.TestCase):
+    def test_solveStep(self):
+        app=App(delay=0.)
+        self.assertEqual(app.solveStep(1),1)
+        self.assertEqual(app.solveStep(2,0,False),2)
+        self.assertTrue(app.isSolved())
+        self.assertTrue(app.wait())
+
+    def test_background(self):
+        apps=[App(delay=1.),App(delay=1.)]
+        t0=time.time()
+        futures=[app.solveStep(1,runInBackground=True) for app in apps]
+        self.assertTrue(all(isinstance(f,concurrent.futures.Future) for f in futures))
+        self.assertFalse(apps[0].isSolved())
+        self.assertFalse(apps[0].wait(timeout=0.01))
+        for app in apps: self.assertTrue(app.wait())
+        # solutions overlap (sequential solution would take at least 2 s)
+        self.assertLess(time.time()-t0,1.8)
+        self.assertEqual([f.result() for f in futures],[1,1])
+        self.assertTrue(all(app.isSolved() for app in apps))
+        # steps of one application are solved in order
+        app=App(delay=0.05)
+        for i in range(3): app.solveStep(i,runInBackground=True)
+        app.wait()
+        self.assertEqual(app.solved,[0,1,2])
+        # super call in derived class is not sent to background again
+        self.assertEqual(SubApp(delay=0.).solveStep(1,0,True).result(),2)
+
+    def test_exception(self):
+        app=App(delay=0.)
+        f=app.solveStep(-1,runInBackground=True)
+        self.assertRaises(ValueError,f.result)
+        self.assertRaises(ValueError,app.wait)
+
+    def test_startSolveStep(self):
+        app=App(delay=0.1)
+        self.assertIsNone(app.startSolveStep(1))
+        self.assertFalse(app.isSolved())
+        self.assertTrue(app.wait())
+        self.assertEqual(app.solved,[1])
+        # local calls return the future also within a pyro call
+        Pyro4.current_context.client=object()
+        try:
+            self.assertEqual(app.solveStep(2,runInBackground=True).result(),2)
+        finally:
+            Pyro4.current_context.client=None
+
+    def test_remoteApplication(self):
+        daemon=Pyro4.Daemon(host='127.0.0.1')
+        apps=[App(delay=1.),App(delay=1.)]
+        uris=[daemon.register(app) for app in apps]
+        thread=threading.Thread(target=daemon.requestLoop)
+        thread.start()
+        try:
+            remote=[Application.RemoteApplication(Pyro4.Proxy(uri)) for uri in uris]
+            self.assertEqual(remote[0].solveStep(1),1)
+            t0=time.time()
+            futures=[r.solveStep(2,runInBackground=True) for r in remote]
+            self.assertFalse(remote[1].isSolved())
+            for f in futures: self.assertIsNone(f.result())
+            self.assertLess(time.time()-t0,1.8)
+            self.assertEqual([app.solved for app in apps],[[1,2],[2]])
+            self.assertRaises(ValueError,remote[0].solveStep(-1,runInBackground=True).result)
+            # local application
+            self.assertEqual(Application.RemoteApplication(App(delay=0.)).solveStep(3,runInBackground=True).result(),3)
+            for r in remote: r.terminate()
+        finally:
+            daemon.shutdown()
+            thread.join()
+            daemon.close()
+
+# python test_Application.py for stand-alone test being run
+if __name__=='__main__': unittest.main()
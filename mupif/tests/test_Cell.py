@@ -7,6 +7,20 @@ from mupif import *
 import math
 import numpy as np
 
+def checkBatch(test, cell, points):
+    """
+    Compare vectorized glob2locBatch/evalNBatch of the cell class with scalar containsPoint/interpolate at given points.
+    """
+    vc = np.array([(tuple(v.coords)+(0.,0.))[:3] for v in cell.getVertices()])
+    pts = np.array([(tuple(p)+(0.,0.))[:3] for p in points])
+    lc, inside = cell.__class__.glob2locBatch(np.repeat(vc[None], len(points), axis=0), pts)
+    for i, p in enumerate(points):
+        test.assertEqual(bool(inside[i]), bool(cell.containsPoint(p)), 'glob2locBatch inside mismatch for %s'%str(p))
+        if inside[i]:
+            N = cell.__class__.evalNBatch(lc[i:i+1])[0]
+            test.assertTrue(np.allclose(N, cell.interpolate(p, np.eye(len(vc))), atol=1.e-8), 'evalNBatch mismatch for %s'%str(p))
+
+
 class Triangle_2d_lin_TestCase(unittest.TestCase):
     def setUp(self):
         self.mesh = Mesh.UnstructuredMesh()
@@ -141,6 +155,9 @@ class Triangle_2d_quad_TestCase(unittest.TestCase):
         self.assertFalse(b)
 
 
+    def test_glob2locBatch(self):
+        checkBatch(self, self.cell, [(0.,0.), (0.1,0.), (0.,0.2), (0.,5.1), (0.5,1.), (1.,2.5), (1.5,2.), (-0.1,3.), (3.,3.)])
+
     def test_evalN(self):
         l1 = 0.5;
         l2 = 0.5
@@ -231,6 +248,9 @@ class Quad_2d_lin_TestCase(unittest.TestCase):
         self.assertEqual(self.cell.containsPoint((0.,-0.2)),False,'Error in contains point(0.,-0.2)')
         self.assertEqual(self.cell.containsPoint((0.,5.)),True,'Error in contains point(0.,5.)')
         self.assertEqual(self.cell.containsPoint((4.01,2.)),False,'Error in contains point(4.01,2.)')
+
+    def test_glob2locBatch(self):
+        checkBatch(self, self.cell, [(2.,2.), (0.,-0.2), (0.,5.), (4.01,2.), (1.,0.), (0.5,4.), (3.,3.5), (-1.,-1.)])
         
     def test_getTransformationJacobian(self):
         self.assertEqual(self.cell.getTransformationJacobian((1.0,1.0)),2.5,'error in getTransformationJacobian for (1.0,1.0)')
@@ -471,11 +491,18 @@ class Brick_3d_lin_TestCase(unittest.TestCase):
         self.assertEqual(self.cell.containsPoint((0.,1.5,-2.)),True,'error in containsPoint for (0,1.5,-2)')
         self.assertEqual(self.cell.containsPoint((2.5,1.5,-1.)),True,'error in containsPoint for (2.5,1.5,-1)')
         self.assertEqual(self.cell.containsPoint((0.,3.01,0.)),False,'error in containsPoint for (0,3.01,0)')
+
+    def test_glob2locBatch(self):
+        checkBatch(self, self.cell, [(0.,3.,0.), (5.,3.,-2.), (2.5,3.,0.), (2.5,1.5,-1.), (0.,3.01,0.), (1.,1.,0.1), (4.,2.,-1.9), (6.,1.,-1.)])
        
         
     def test_getTransformationJacobian(self):
         print(self.cell.getTransformationJacobian((-1.0, 1.0, 1.0)))
         self.assertEqual(self.cell.getTransformationJacobian((-1.0, 1.0, 1.0)), 30.0/8.0, 'error in getTransformationJacobian')
+
+    def test_evalVolumeBatch(self):
+        vc = np.array([self.mesh.getVertex(i).coords for i in range(8)])
+        self.assertAlmostEqual(Cell.Brick_3d_lin.evalVolumeBatch(vc[None])[0], 30., msg='error in evalVolumeBatch', delta=1.e-10)
         
 # python test_Cell.py for stand-alone test being run
 if __name__=='__main__': unittest.main()
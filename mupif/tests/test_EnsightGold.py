@@ -0,0 +1,64 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+sys.path.append('../..')
+
+from mupif import *
+import numpy as np
+import mupif.Physics.PhysicalQuantities as PQ
+
+class EnsightGold_TestCase(unittest.TestCase):
+    def setUp(self):
+        self.mesh = Mesh.UnstructuredMesh()
+        self.mesh.setup([Vertex.Vertex(0,1,(0.,0.,0.)), Vertex.Vertex(1,2,(1.,0.,0.)), Vertex.Vertex(2,3,(1.,1.,0.)), Vertex.Vertex(3,4,(0.,1.,0.)), Vertex.Vertex(4,5,(2.,0.,0.))],
+            [Cell.Triangle_2d_lin(self.mesh,0,1,(1,4,2)), Cell.Quad_2d_lin(self.mesh,1,2,(0,1,2,3)), Cell.Triangle_2d_lin(self.mesh,2,3,(0,2,3))])
+        self.tmp=tempfile.mkdtemp()
+        self.case=os.path.join(self.tmp,'out.case')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def fields(self, t):
+        temp=Field.Field(self.mesh,FieldID.FID_Temperature,ValueType.Scalar,'K',PQ.PhysicalQuantity(t,'s'),[(t+i,) for i in range(5)])
+        disp=Field.Field(self.mesh,FieldID.FID_Displacement,ValueType.Vector,'m',PQ.PhysicalQuantity(t,'s'),[(t,i,0.) for i in range(3)],fieldType=Field.FieldType.FT_cellBased)
+        return [temp,disp]
+
+    def test_writeRead(self):
+        w=EnsightGold.EnsightGoldWriter(self.case)
+        for t in (0.,.5): w.appendFields(self.fields(t))
+        self.assertRaises(ValueError,w.appendFields,self.fields(1.)[:1])
+        # fields on a copy of the mesh (e.g. received from remote application) are accepted, other meshes are not
+        import pickle
+        self.assertEqual(w.appendFields(pickle.loads(pickle.dumps(self.fields(1.)))),2)
+        other=self.mesh.copy()
+        other.getVertex(4).coords=(3.,0.,0.)
+        self.assertRaises(ValueError,w.appendFields,[Field.Field(other,FieldID.FID_Temperature,ValueType.Scalar,'K',PQ.PhysicalQuantity(2.,'s'),[(0.,)]*5)]+self.fields(2.)[1:])
+        case=open(self.case).read()
+        self.assertTrue('scalar per node: 1 Temperature out_Temperature.*****' in case)
+        self.assertTrue('vector per element: 1 Displacement out_Displacement.*****' in case)
+        self.assertTrue('number of steps: 3' in case)
+
+        partRec=[]
+        mesh=EnsightGold.readEnsightGoldGeo(os.path.join(self.tmp,'out.geo'),(1,),partRec)
+        self.assertEqual(partRec,[{'part':1,'coordinates':5,'tria3':2,'quad4':1}])
+        self.assertEqual(mesh.getNumberOfVertices(),5)
+        self.assertTrue(np.allclose(mesh.getVertices(),self.mesh.getVertices()))
+        # cells are grouped by type
+        self.assertEqual([c.getVertices()[0].getNumber() for c in mesh.cells()],[1,0,0])
+        self.assertEqual([len(c.getVertices()) for c in mesh.cells()],[3,3,4])
+
+        temp=EnsightGold.readEnsightGoldField(os.path.join(self.tmp,'out_Temperature.00001'),(1,),partRec,1,FieldID.FID_Temperature,mesh,'K',.5)
+        self.assertEqual(temp.getFieldType(),Field.FieldType.FT_vertexBased)
+        self.assertEqual(temp.value.tolist(),[[.5],[1.5],[2.5],[3.5],[4.5]])
+        disp=EnsightGold.readEnsightGoldField(os.path.join(self.tmp,'out_Displacement.00001'),(1,),partRec,3,FieldID.FID_Displacement,mesh,'m',.5)
+        self.assertEqual(disp.getFieldType(),Field.FieldType.FT_cellBased)
+        self.assertEqual(disp.value.tolist(),[[.5,0.,0.],[.5,2.,0.],[.5,1.,0.]])
+        # parts not selected are skipped
+        partRec=[]
+        self.assertEqual(EnsightGold.readEnsightGoldGeo(os.path.join(self.tmp,'out.geo'),(),partRec).getNumberOfVertices(),0)
+        self.assertEqual(partRec[0]['coordinates'],5)
+
+# python test_EnsightGold.py for stand-alone test being run
+if __name__=='__main__': unittest.main()
@@ -6,6 +6,8 @@ from mupif import *
 import math
 import mupif.Physics.PhysicalQuantities as PQ
 import os
+import tempfile
+import numpy as np
 
 
 
@@ -21,7 +23,41 @@ class EnsightReader2_TestCase(unittest.TestCase):
         timeUnits = PQ.PhysicalUnit('s',   1.,    [0,0,1,0,0,0,0,0,0])
         temperatureUnits = PQ.PhysicalUnit('K',   1.,    [0,0,0,0,1,0,0,0,0])
 #        f = EnsightReader2.readEnsightField('fld_TEMPERATURE.escl', parts, partRec, 1, FieldID.FID_Temperature, mesh, temperatureUnits, 0)
-        self.assertTrue(1==1)
+        self.assertEqual(partRec,[{'hexa8':1},{'quad4':2}])
+        self.assertEqual(mesh.getNumberOfVertices(),8)
+        self.assertEqual([c.getGeometryType() for c in mesh.cells()],[CellGeometryType.CGT_HEXAHEDRON,CellGeometryType.CGT_QUAD,CellGeometryType.CGT_QUAD])
+        self.assertEqual(mesh.getCell(2).vertices,(4,5,6,7))
+        self.assertEqual(mesh.getVertex(6).label,107)
+        self.assertEqual(mesh.getVertex(6).getCoordinates(),(1.,1.,1.))
+        # only the second part, as compact mesh
+        partRec=[]
+        mesh2 = EnsightReader2.readEnsightGeo(my_file, [2], partRec, compact=True)
+        self.assertEqual(partRec,[{'hexa8':1},{'quad4':2}])
+        self.assertTrue(isinstance(mesh2,Mesh.CompactUnstructuredMesh))
+        self.assertEqual(mesh2.getCells()[1].tolist(),[[0,1,2,3],[4,5,6,7]])
+        self.assertEqual(mesh2.vertexLabel2Number(107),6)
+
+    def test_ReadEnsightField(self):
+        THIS_FOLDER = os.path.dirname(os.path.abspath(__file__))
+        temperatureUnits = PQ.PhysicalUnit('K',   1.,    [0,0,0,0,1,0,0,0,0])
+        partRec=[]
+        mesh = EnsightReader2.readEnsightGeo(os.path.join(THIS_FOLDER, 'testEnsightReader.geo'), [1,2], partRec)
+        with tempfile.NamedTemporaryFile(mode='w',suffix='.escl') as f:
+            # 8 vertex values: full line of 6 and a partial one
+            f.write('temperature\n'+''.join('%12.5e'%v for v in range(6))+'\n'+''.join('%12.5e'%v for v in range(6,8))+'\n')
+            f.flush()
+            field = EnsightReader2.readEnsightField(f.name, [1,2], partRec, 1, FieldID.FID_Temperature, mesh, temperatureUnits, 0)
+        self.assertEqual(field.getFieldType(),Field.FieldType.FT_vertexBased)
+        self.assertEqual(np.array(field.value)[:,0].tolist(),list(range(8)))
+        with tempfile.NamedTemporaryFile(mode='w',suffix='.evec') as f:
+            f.write('velocity\npart 1\nhexa8\n%12.5e%12.5e%12.5e\npart 2\nquad4\n'%(1,2,3)+''.join('%12.5e'%v for v in range(4,10))+'\n')
+            f.flush()
+            field = EnsightReader2.readEnsightField(f.name, [1,2], partRec, 3, FieldID.FID_Displacement, mesh, temperatureUnits, 0)
+            self.assertEqual(field.getFieldType(),Field.FieldType.FT_cellBased)
+            self.assertEqual(np.array(field.value).tolist(),[[1,2,3],[4,5,6],[7,8,9]])
+            # skip the first part
+            field = EnsightReader2.readEnsightField(f.name, [2], partRec, 3, FieldID.FID_Displacement, mesh, temperatureUnits, 0)
+            self.assertEqual(np.array(field.value).tolist(),[[4,5,6],[7,8,9]])
 
 
 if __name__ == '__main__': unittest.main()
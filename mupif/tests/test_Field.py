@@ -112,6 +112,101 @@ class Field_TestCase(unittest.TestCase):
         self.assertEqual(self.f6.evaluate((2.,2.,2.)).getValue(),(24.,),'error in evaluate for f1(point 2.,2.,2.)')
         self.assertEqual(self.f6.evaluate((1.5,1.5,1.5)).getValue(),(18.,),'error in evaluate for f1(point 2.,2.,2.)')
 
+    def test_evaluateBatch(self):
+        r=self.f1.evaluate(np.array([(1.,2.5,0.),(3.,1.,0.)])).getValue()
+        self.assertEqual(r.shape,(2,1),'error in evaluate (batch) for f1')
+        self.assertAlmostEqual(r[0,0],93.5,msg='error in evaluate (batch) for f1(point 1.,2.5,0.)',delta=1.e-10)
+        self.assertAlmostEqual(r[1,0],53.,msg='error in evaluate (batch) for f1(point 3.,1.,0.)',delta=1.e-10)
+        # 2D positions are padded by zero
+        r=self.f1.evaluate(np.array([(1.,2.5)])).getValue()
+        self.assertAlmostEqual(r[0,0],93.5,msg='error in evaluate (batch) for f1(point 1.,2.5)',delta=1.e-10)
+        r=self.f6.evaluate(np.array([(2.,2.,2.),(1.5,1.5,1.5)])).getValue()
+        self.assertAlmostEqual(r[0,0],24.,msg='error in evaluate (batch) for f6(point 2.,2.,2.)',delta=1.e-10)
+        self.assertAlmostEqual(r[1,0],18.,msg='error in evaluate (batch) for f6(point 1.5,1.5,1.5)',delta=1.e-10)
+        self.assertRaises(ValueError,self.f1.evaluate,np.array([(1.,2.5,0.),(30.,1.,0.)]))
+
+    def test_transferTo(self):
+        target = Mesh.UnstructuredMesh()
+        target.setup([Vertex.Vertex(0,0,(.5,.5,0.)), Vertex.Vertex(1,1,(2.,1.,0.)), Vertex.Vertex(2,2,(1.,3.,0.))], [Cell.Triangle_2d_lin(target,0,0,(0,1,2))])
+        # f1 is linear (6x+35y), interpolation is exact
+        t=self.f1.transferTo(target)
+        self.assertEqual(t.getMesh(),target)
+        self.assertEqual(t.getFieldType(),Field.FieldType.FT_vertexBased)
+        self.assertEqual(t.getUnits(),self.f1.getUnits())
+        self.assertTrue(np.allclose(t.value[:,0],[20.5,47.,111.]))
+        t=self.f1.transferTo(target,method='nearest')
+        self.assertTrue(np.allclose(t.value[:,0],[0.,12.,175.]))
+        # cell average of linear field is its value at the centroid
+        t=self.f1.transferTo(target,method='conservative')
+        self.assertEqual(t.getFieldType(),Field.FieldType.FT_cellBased)
+        self.assertAlmostEqual(t.value[0,0],59.5,delta=1e-10)
+        # operator is cached for the same meshes and method
+        n=len(Field._transferOperators)
+        self.f8.transferTo(target,method='conservative')
+        self.assertEqual(len(Field._transferOperators),n)
+        self.assertRaises(ValueError,self.f1.transferTo,target,'spline')
+        # cell-based source field (cell values are indexed by cell number)
+        mesh4 = Mesh.UnstructuredMesh()
+        mesh4.setup([Vertex.Vertex(i,i,self.mesh4.getVertex(i).coords) for i in range(5)], [Cell.Tetrahedron_3d_lin(mesh4,0,1,(0,1,2,3)),Cell.Tetrahedron_3d_lin(mesh4,1,2,(1,2,3,4))])
+        f7=Field.Field(mesh4,FieldID.FID_Displacement,ValueType.Scalar,'m',PQ.PhysicalQuantity(16,'s'),[(2,),(16,)],Field.FieldType.FT_cellBased)
+        c=np.array([1.25,2.,1.75])
+        target4 = Mesh.UnstructuredMesh()
+        target4.setup([Vertex.Vertex(i,i,tuple(c+.1*(np.array(self.mesh4.getVertex(i).coords)-c))) for i in range(4)], [Cell.Tetrahedron_3d_lin(target4,0,0,(0,1,2,3))])
+        self.assertTrue(np.allclose(f7.transferTo(target4).value[:,0],2.))
+        self.assertTrue(np.allclose(f7.transferTo(target4,method='conservative').value[:,0],2.))
+
+    def test_transferToConservative(self):
+        def quadMesh(xs, ys):
+            mesh = Mesh.UnstructuredMesh()
+            nx = len(xs)
+            vertices = [Vertex.Vertex(j*nx+i, j*nx+i, (x,y,0.)) for j,y in enumerate(ys) for i,x in enumerate(xs)]
+            cells = [Cell.Quad_2d_lin(mesh, j*(nx-1)+i, j*(nx-1)+i, (j*nx+i+1, (j+1)*nx+i+1, (j+1)*nx+i, j*nx+i)) for j in range(len(ys)-1) for i in range(nx-1)]
+            mesh.setup(vertices, cells)
+            return mesh
+        source = quadMesh((0.,.3,1.), (0.,1.))
+        f = Field.Field(source, FieldID.FID_Temperature, ValueType.Scalar, 'K', 0., [(0.,),(1.,)], Field.FieldType.FT_cellBased)
+        t = f.transferTo(quadMesh((0.,1.), (0.,1.)), method='conservative')
+        self.assertAlmostEqual(t.value[0,0], .7, delta=1e-12)
+        # non-matching meshes, integral is preserved
+        source = quadMesh((0.,.2,.5,.55,1.), (0.,.3,1.))
+        target = quadMesh((0.,.35,.8,1.), (0.,.45,.6,1.))
+        for fieldType, n in ((Field.FieldType.FT_cellBased, 8), (Field.FieldType.FT_vertexBased, 15)):
+            f = Field.Field(source, FieldID.FID_Temperature, ValueType.Scalar, 'K', 0., [(float(i*i%7),) for i in range(n)], fieldType)
+            t = f.transferTo(target, method='conservative')
+            self.assertAlmostEqual(t.integrate().getValue()[0], f.integrate().getValue()[0], delta=1e-12)
+        # linear field is averaged exactly
+        f = Field.Field(source, FieldID.FID_Temperature, ValueType.Scalar, 'K', 0., [(1.+2.*x+3.*y,) for x,y,z in source.getVertices()])
+        t = f.transferTo(target, method='conservative')
+        self.assertTrue(np.allclose(t.value[:,0], [1.+2.*x+3.*y for x,y,z in target.getCellCentroids()]))
+        # source is zero outside of its mesh
+        f = Field.Field(source, FieldID.FID_Temperature, ValueType.Scalar, 'K', 0., [(1.,)]*8, Field.FieldType.FT_cellBased)
+        self.assertTrue(np.allclose(f.transferTo(quadMesh((-.5,.5), (0.,1.)), method='conservative').value[:,0], [.5]))
+        # 3D: overlap of shifted tetrahedral meshes is the same in both directions
+        mesh4 = Mesh.UnstructuredMesh()
+        mesh4.setup([Vertex.Vertex(i,i,self.mesh4.getVertex(i).coords) for i in range(5)], [Cell.Tetrahedron_3d_lin(mesh4,0,1,(0,1,2,3)),Cell.Tetrahedron_3d_lin(mesh4,1,2,(1,2,3,4))])
+        target4 = Mesh.UnstructuredMesh()
+        target4.setup([Vertex.Vertex(i,i,tuple(np.array(self.mesh4.getVertex(i).coords)+(.2,.1,0.))) for i in range(5)], [Cell.Tetrahedron_3d_lin(target4,0,0,(0,1,2,3)),Cell.Tetrahedron_3d_lin(target4,1,1,(1,2,3,4))])
+        ones = lambda mesh: Field.Field(mesh, FieldID.FID_Temperature, ValueType.Scalar, 'K', 0., [(1.,),(1.,)], Field.FieldType.FT_cellBased)
+        overlap = ones(mesh4).transferTo(target4, method='conservative').integrate().getValue()[0]
+        self.assertGreater(overlap, 0.)
+        self.assertAlmostEqual(overlap, ones(target4).transferTo(mesh4, method='conservative').integrate().getValue()[0], delta=1e-12)
+
+    def test_integrate(self):
+        # linear field on triangles of areas 5 and 7
+        total=5.*(0+12+175)/3.+7.*(12+175+94)/3.
+        self.assertAlmostEqual(self.f1.integrate().getValue()[0],total,delta=1.e-10)
+        self.assertEqual(self.f1.integrate().getUnitName(),'m')
+        self.assertAlmostEqual(self.f1.getMean().getValue()[0],total/12.,delta=1.e-10)
+        cells=self.f1.integrate(cellwise=True).getValue()
+        self.assertEqual(cells.shape,(2,1))
+        self.assertAlmostEqual(cells[0,0],5.*(0+12+175)/3.,delta=1.e-10)
+        l2=5./6.*(0+144+175**2+12*175)+7./6.*(12**2+175**2+94**2+12*175+175*94+94*12)
+        self.assertAlmostEqual(self.f1.getL2Norm().getValue(),math.sqrt(l2),delta=1.e-8)
+        # the same with cached integration weights
+        self.mesh.enableGeometryCache()
+        self.assertAlmostEqual(self.f1.integrate().getValue()[0],total,delta=1.e-10)
+        self.assertAlmostEqual(self.f1.integrate().getValue()[0],total,delta=1.e-10)
+
     def test_getVertexValue(self):
         self.assertEqual(self.f1.getVertexValue(0).getValue(),(0,),'error in getVertexValuep for f1')
         self.assertEqual(self.f1.getVertexValue(1).getValue(),(12,),'error in getVertexValue for f1')
@@ -192,6 +287,58 @@ class Field_TestCase(unittest.TestCase):
         self.assertEqual(self.res.getVertexValue(2),self.f1.getVertexValue(2),'error in toHdf5(getVertexValue for res)')
         self.assertEqual(self.res.getUnits().name(),self.f1.getUnits().name(),'error in toHdf5(getUnits for res)')
         
+    def test_makeFromHdf5Lazy(self):
+        import pickle
+        with tempfile.NamedTemporaryFile(suffix='.hdf5') as tmp:
+            self.f1.toHdf5(tmp.name)
+            self.f7.toHdf5(tmp.name)
+            self.f1.toHdf5(tmp.name)
+            ff=Field.Field.makeFromHdf5(tmp.name,lazy=True)
+            self.assertEqual(len(ff),3)
+            self.assertFalse(any(f.isLoaded() for f in ff))
+            self.assertEqual(ff[0].getFieldID(),self.f1.getFieldID())
+            self.assertEqual(ff[0].getTime().getValue(),13)
+            # contiguous values are memory-mapped
+            self.assertTrue(isinstance(ff[0].value,np.memmap))
+            self.assertEqual(ff[0].value.tolist(),[[0.],[12.],[175.],[94.]])
+            self.assertFalse(ff[0].isLoaded())
+            self.assertAlmostEqual(ff[0].evaluate((1.,1.,0.)).getValue()[0],self.f1.evaluate((1.,1.,0.)).getValue()[0],delta=1.e-10)
+            self.assertTrue(ff[0].isLoaded())
+            # mesh is restored once for each mhash
+            self.assertTrue(ff[0].getMesh() is ff[2].getMesh())
+            self.assertEqual(ff[0].getMesh().internalArraysDigest(),self.mesh.internalArraysDigest())
+            self.assertEqual(ff[1].getFieldType(),Field.FieldType.FT_cellBased)
+            self.assertEqual(ff[1].value.tolist(),[[2.],[16.]])
+            self.assertEqual(ff[1].getMesh().getNumberOfCells(),2)
+            f=pickle.loads(pickle.dumps(ff[2]))
+            self.assertTrue(f.isLoaded())
+            self.assertEqual(type(f.value),np.ndarray)
+            self.assertEqual(f.value.tolist(),[[0.],[12.],[175.],[94.]])
+
+    def test_hdf5Resave(self):
+        # fields loaded from HDF5 hold values as array (eager) or memmap (lazy) and can be saved again
+        for lazy in (False,True):
+            with tempfile.NamedTemporaryFile(suffix='.hdf5') as tmp, tempfile.NamedTemporaryFile(suffix='.hdf5') as tmp2:
+                self.f1.toHdf5(tmp.name)
+                f=Field.Field.makeFromHdf5(tmp.name,lazy=lazy)[0]
+                f.toHdf5(tmp2.name)
+                f2=Field.Field.makeFromHdf5(tmp2.name)[0]
+                self.assertEqual(f2.value.tolist(),[[0.],[12.],[175.],[94.]])
+                self.assertEqual(f2.getFieldID(),self.f1.getFieldID())
+
+    def test_pickle(self):
+        import pickle
+        f=pickle.loads(pickle.dumps(self.f1,pickle.HIGHEST_PROTOCOL))
+        # values given as tuples are sent as array and restored as tuples
+        self.assertTrue(isinstance(self.f1.__getstate__()['value'],np.ndarray))
+        self.assertEqual(f.value,self.f1.value)
+        self.assertEqual(f.getMesh().internalArraysDigest(),self.mesh.internalArraysDigest())
+        self.assertAlmostEqual(f.evaluate((1.,1.,0.)).getValue()[0],self.f1.evaluate((1.,1.,0.)).getValue()[0],delta=1.e-10)
+        g=Field.Field(self.mesh,FieldID.FID_Displacement,ValueType.Vector,'m',0.,np.arange(12.).reshape(4,3)[:,::-1])
+        g2=pickle.loads(pickle.dumps(g,pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(type(g2.value),np.ndarray)
+        self.assertEqual(g2.value.tolist(),g.value.tolist())
+
     def test_toVTK2(self):
         with tempfile.NamedTemporaryFile(suffix='.vtk') as tmp:
             self.f1.toVTK2(tmp.name)
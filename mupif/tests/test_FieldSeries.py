@@ -0,0 +1,147 @@
+import unittest
+import sys
+import tempfile
+import os
+import shutil
+import xml.etree.ElementTree as ET
+sys.path.append('../..')
+
+from mupif import *
+import numpy as np
+import mupif.Physics.PhysicalQuantities as PQ
+
+# check for python-vtk before running related tests
+try:
+    import vtk
+    vtkAvailable=True
+except ImportError:
+    vtkAvailable=False
+
+class TemperatureWorkflow(Workflow.Workflow):
+    """Minimal workflow with constant time step, its temperature equals the time of the last step."""
+    def __init__(self, mesh, targetTime):
+        super(TemperatureWorkflow, self).__init__(targetTime=targetTime)
+        self.mesh = mesh
+        self.value = 0.
+    def getCriticalTimeStep(self):
+        return PQ.PhysicalQuantity(.4, 's')
+    def solveStep(self, tstep, stageID=0, runInBackground=False):
+        self.value = tstep.getTime().inUnitsOf('s').getValue()
+    def getField(self, fieldID, time):
+        return Field.Field(self.mesh,fieldID,ValueType.Scalar,'K',time,[(self.value,)]*4)
+
+class FieldSeries_TestCase(unittest.TestCase):
+    def setUp(self):
+        self.mesh = Mesh.UnstructuredMesh()
+        self.mesh.setup([Vertex.Vertex(0,4,(1.,1.,0.)), Vertex.Vertex(1,5,(3.,1.,0.)), Vertex.Vertex(2,6,(3.,5.,0.)), Vertex.Vertex(3,16,(8.,7.,0.))], [Cell.Triangle_2d_lin(self.mesh,0,22,(0,1,2)),Cell.Triangle_2d_lin(self.mesh,1,18,(1,2,3))])
+        self.tmp=tempfile.NamedTemporaryFile(suffix='.hdf5')
+
+    def tearDown(self):
+        self.tmp.close()
+
+    def temperature(self, t):
+        return Field.Field(self.mesh,FieldID.FID_Temperature,ValueType.Scalar,'K',PQ.PhysicalQuantity(t,'s'),[(t,),(t+1.,),(t+2.,),(t+3.,)])
+
+    def test_writeRead(self):
+        with FieldSeries.FieldSeriesWriter(self.tmp.name) as w:
+            for t in (0.,1.,2.): self.assertEqual(w.append(self.temperature(t)),int(t))
+            w.append(Field.Field(self.mesh,FieldID.FID_Displacement,ValueType.Vector,'m',PQ.PhysicalQuantity(2.,'s'),[(1.,2.,3.),(4.,5.,6.)],fieldType=Field.FieldType.FT_cellBased))
+            # time given explicitly is converted to units of the series
+            w.append(self.temperature(3.),time=PQ.PhysicalQuantity(50.,'ms'))
+            self.assertRaises(ValueError,w.append,Field.Field(self.mesh,FieldID.FID_Temperature,ValueType.Vector,'K',0.))
+        # appending to existing file reuses the series and the mesh
+        with FieldSeries.FieldSeriesWriter(self.tmp.name) as w:
+            w.append(self.temperature(4.))
+            self.assertEqual(sorted(n for n in w.group if n.startswith('mesh_')),['mesh_01'])
+        with FieldSeries.FieldSeriesReader(self.tmp.name) as r:
+            self.assertEqual(sorted(r.getFieldIDs()),[FieldID.FID_Displacement,FieldID.FID_Temperature])
+            self.assertEqual(r.getNumberOfSteps(FieldID.FID_Temperature),5)
+            self.assertTrue(np.allclose(r.getTimes(FieldID.FID_Temperature),[0.,1.,2.,.05,4.]))
+            f=r.getField(FieldID.FID_Temperature,1)
+            self.assertEqual(f.value.tolist(),[[1.],[2.],[3.],[4.]])
+            self.assertEqual(f.getTime().getValue(),1.)
+            self.assertEqual(f.getUnits().name(),'K')
+            self.assertAlmostEqual(f.evaluate((3.,3.,0.)).getValue()[0],2.5)
+            d=r.getField(FieldID.FID_Displacement)
+            self.assertEqual((d.getFieldType(),d.getValueType()),(Field.FieldType.FT_cellBased,ValueType.Vector))
+            self.assertEqual(d.value.tolist(),[[1.,2.,3.],[4.,5.,6.]])
+            # mesh is restored once and shared
+            self.assertTrue(d.getMesh() is f.getMesh())
+            self.assertEqual(f.getMesh().internalArraysDigest(),self.mesh.internalArraysDigest())
+            self.assertRaises(IndexError,r.getField,FieldID.FID_Temperature,5)
+
+    def test_time(self):
+        with FieldSeries.FieldSeriesWriter(self.tmp.name) as w:
+            w.append(self.temperature(1.))
+            # float is in units of the series, field without time is stored as NaN
+            w.append(self.temperature(0.),time=3.)
+            w.append(Field.Field(self.mesh,FieldID.FID_Temperature,ValueType.Scalar,'K',None,[(0.,)]*4))
+            # series without units
+            w.append(Field.Field(self.mesh,FieldID.FID_Humidity,ValueType.Scalar,'none',None,[(0.,)]*4))
+            w.append(Field.Field(self.mesh,FieldID.FID_Humidity,ValueType.Scalar,'none',2.,[(0.,)]*4))
+            w.append(Field.Field(self.mesh,FieldID.FID_Humidity,ValueType.Scalar,'none',0.,[(0.,)]*4),time=PQ.PhysicalQuantity(5.,'s'))
+        with FieldSeries.FieldSeriesReader(self.tmp.name) as r:
+            self.assertTrue(np.allclose(r.getTimes(FieldID.FID_Temperature),[1.,3.,np.nan],equal_nan=True))
+            self.assertTrue(np.allclose(r.getTimes(FieldID.FID_Humidity),[np.nan,2.,5.],equal_nan=True))
+            self.assertEqual(r.getField(FieldID.FID_Temperature,1).getTime().getValue(),3.)
+
+    def test_workflow(self):
+        wf=TemperatureWorkflow(self.mesh,PQ.PhysicalQuantity(1.,'s'))
+        with FieldSeries.FieldSeriesWriter(self.tmp.name) as w:
+            wf.addFieldSeries(w,[FieldID.FID_Temperature])
+            wf.solve()
+        # fields are written after every step, the last step is shortened to reach the target time
+        with FieldSeries.FieldSeriesReader(self.tmp.name) as r:
+            self.assertEqual(r.getFieldIDs(),[FieldID.FID_Temperature])
+            self.assertEqual(r.getNumberOfSteps(FieldID.FID_Temperature),3)
+            self.assertTrue(np.allclose(r.getTimes(FieldID.FID_Temperature),[.4,.8,1.]))
+            self.assertTrue(np.allclose(r.getField(FieldID.FID_Temperature,1).value,.8))
+
+    def test_xdmfWithoutTime(self):
+        tmp=tempfile.mkdtemp()
+        try:
+            xmf=os.path.join(tmp,'out.xmf')
+            with FieldSeries.XdmfWriter(xmf) as w:
+                w.append(self.temperature(1.))
+                for i in range(2):
+                    w.append(Field.Field(self.mesh,FieldID.FID_Displacement,ValueType.Scalar,'m',None,[(float(i),)]*4))
+                    w.append(Field.Field(self.mesh,FieldID.FID_Humidity,ValueType.Scalar,'none',None,[(float(i),)]*4))
+            # steps without time are grouped by their index, which is used as time
+            grids=ET.parse(xmf).getroot().findall('Domain/Grid/Grid')
+            self.assertEqual([g.find('Time').get('Value') for g in grids],['1','0','1'])
+            self.assertEqual([[a.get('Name') for a in g.findall('Attribute')] for g in grids],[['Temperature'],['Displacement','Humidity'],['Displacement','Humidity']])
+            self.assertEqual(grids[2].find('Attribute/DataItem/DataItem').text.split()[0],'1')
+        finally: shutil.rmtree(tmp)
+
+    @unittest.skipUnless(vtkAvailable,'vtk (python-vtk/python-vtk6) not importable') # vtkAvailable defined above
+    def test_xdmf(self):
+        tmp=tempfile.mkdtemp()
+        try:
+            xmf=os.path.join(tmp,'out.xmf')
+            with FieldSeries.XdmfWriter(xmf) as w:
+                for t in (0.,1.,2.): w.append(self.temperature(t))
+                w.append(Field.Field(self.mesh,FieldID.FID_Displacement,ValueType.Vector,'m',PQ.PhysicalQuantity(2.,'s'),[(1.,2.,3.),(4.,5.,6.)],fieldType=Field.FieldType.FT_cellBased))
+            grids=ET.parse(xmf).getroot().findall('Domain/Grid/Grid')
+            self.assertEqual([g.find('Time').get('Value') for g in grids],['0','1','2'])
+            self.assertEqual([a.get('Name') for a in grids[2].findall('Attribute')],['Displacement','Temperature'])
+            disp=grids[2].find('Attribute')
+            self.assertEqual((disp.get('AttributeType'),disp.get('Center')),('Vector','Cell'))
+            slab=disp.findall('DataItem/DataItem')
+            self.assertEqual(slab[0].text.split(),['0','0','0','1','1','1','1','2','3'])
+            self.assertEqual(slab[1].text,'out.h5:/series/FID_Displacement/values')
+            self.assertEqual(grids[1].find('Attribute/DataItem/DataItem').text.split()[0],'1')
+            # reading the series back is not affected by the XDMF topology stored with the mesh
+            with FieldSeries.FieldSeriesReader(os.path.join(tmp,'out.h5')) as r:
+                self.assertEqual(r.getField(FieldID.FID_Temperature).value.tolist(),[[2.],[3.],[4.],[5.]])
+                self.assertEqual(r.group['mesh_01/xdmf_topology'][...].tolist(),[4,0,1,2,4,1,2,3])
+            from vtk.util.numpy_support import vtk_to_numpy
+            reader=vtk.vtkXdmfReader()
+            reader.SetFileName(xmf)
+            reader.UpdateTimeStep(1.)
+            ugrid=reader.GetOutputDataObject(0)
+            self.assertEqual((ugrid.GetNumberOfPoints(),ugrid.GetNumberOfCells(),ugrid.GetCellType(1)),(4,2,5))
+            self.assertEqual(vtk_to_numpy(ugrid.GetPointData().GetArray('Temperature')).tolist(),[1.,2.,3.,4.])
+        finally: shutil.rmtree(tmp)
+
+# python test_FieldSeries.py for stand-alone test being run
+if __name__=='__main__': unittest.main()
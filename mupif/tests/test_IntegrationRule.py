@@ -52,6 +52,33 @@ class GaussIntegrationRule_TestCase(unittest.TestCase):
         self.assertTrue(rule.getRequiredNumberOfPoints(cgt, 7) == 8)
         self.assertTrue(rule.getRequiredNumberOfPoints(cgt, 8) == -1)
         
+    def test_tetraHexa(self):
+        rule = IntegrationRule.GaussIntegrationRule()
+        cgt = CellGeometryType.CGT_TETRA
+        self.assertTrue(rule.getRequiredNumberOfPoints(cgt, 1) == 1)
+        self.assertTrue(rule.getRequiredNumberOfPoints(cgt, 2) == 4)
+        self.assertTrue(rule.getRequiredNumberOfPoints(cgt, 3) == 5)
+        self.assertTrue(rule.getRequiredNumberOfPoints(cgt, 4) == -1)
+        for npt in (1,4,5):
+            pnts = rule.getIntegrationPoints(cgt,npt)
+            self.assertEqual(len(pnts), npt)
+            # volume of the reference tetrahedron
+            self.assertAlmostEqual(sum([p[1] for p in pnts]), 1./6., delta=1.e-12)
+        # x*y is integrated exactly by 4 points
+        self.assertAlmostEqual(sum([p[1]*p[0][0]*p[0][1] for p in rule.getIntegrationPoints(cgt,4)]), 1./120., delta=1.e-12)
+
+        cgt = CellGeometryType.CGT_HEXAHEDRON
+        self.assertTrue(rule.getRequiredNumberOfPoints(cgt, 1) == 8)
+        self.assertTrue(rule.getRequiredNumberOfPoints(cgt, 4) == 27)
+        self.assertTrue(rule.getRequiredNumberOfPoints(cgt, 6) == -1)
+        for npt in (1,8,27):
+            pnts = rule.getIntegrationPoints(cgt,npt)
+            self.assertEqual(len(pnts), npt)
+            self.assertAlmostEqual(sum([p[1] for p in pnts]), 8., delta=1.e-12)
+        # x^4 is integrated exactly by 27 points
+        self.assertAlmostEqual(sum([p[1]*p[0][0]**4 for p in rule.getIntegrationPoints(cgt,27)]), 4*2./5., delta=1.e-12)
+        self.assertRaises(APIError.APIError, rule.getIntegrationPoints, cgt, 2)
+
 # python test_Cell.py for stand-alone test being run
 if __name__=='__main__': unittest.main()
 
@@ -0,0 +1,35 @@
+import unittest
+import sys
+sys.path.append('../..')
+
+from mupif import *
+import mupif.Physics.PhysicalQuantities as PQ
+import numpy as np
+
+class InterpolationPlan_TestCase(unittest.TestCase):
+    def setUp(self):
+        self.mesh = Mesh.UnstructuredMesh()
+        self.mesh.setup([Vertex.Vertex(0,0,(0.,0.,0.)), Vertex.Vertex(1,1,(2.,0.,0.)), Vertex.Vertex(2,2,(0.,5.,0.)), Vertex.Vertex(3,3,(4.,2.,0.))], [Cell.Triangle_2d_lin(self.mesh,1,1,(0,1,2)),Cell.Triangle_2d_lin(self.mesh,2,2,(1,2,3))])
+        self.f1=Field.Field(self.mesh,FieldID.FID_Displacement,ValueType.Scalar,'m',PQ.PhysicalQuantity(13, 's'),[(0,),(12,),(175,),(94,)])
+        self.f2=Field.Field(self.mesh,FieldID.FID_Displacement,ValueType.Scalar,'m',PQ.PhysicalQuantity(14, 's'),[(1,),(1,),(1,),(1,)])
+        self.points=np.array([(1.,2.5,0.),(3.,1.,0.)])
+
+    def test_apply(self):
+        plan=InterpolationPlan.InterpolationPlan(self.mesh,self.points)
+        self.assertEqual(plan.getNumberOfPoints(),2)
+        self.assertEqual(plan.getMatrix().shape,(2,4))
+        r=plan.apply(self.f1).getValue()
+        self.assertAlmostEqual(r[0,0],93.5,msg='error in apply for f1(point 1.,2.5,0.)',delta=1.e-10)
+        self.assertAlmostEqual(r[1,0],53.,msg='error in apply for f1(point 3.,1.,0.)',delta=1.e-10)
+        # the same plan is reusable for other fields on the mesh
+        r=plan.apply(self.f2).getValue()
+        self.assertAlmostEqual(r[0,0],1.,msg='error in apply for f2',delta=1.e-10)
+        self.assertAlmostEqual(r[1,0],1.,msg='error in apply for f2',delta=1.e-10)
+        # results agree with Field.evaluate
+        self.assertTrue(np.allclose(plan.apply(self.f1).getValue(),self.f1.evaluate(self.points).getValue()))
+
+    def test_outside(self):
+        self.assertRaises(ValueError,InterpolationPlan.InterpolationPlan,self.mesh,[(30.,1.,0.)])
+
+# python test_InterpolationPlan.py for stand-alone test being run
+if __name__=='__main__': unittest.main()
@@ -111,6 +111,101 @@ class Mesh_TestCase(unittest.TestCase):
         self.assertEqual(self.mesh5.getCell(1) in s,True,'error in giveCellLocalizer mesh5')
         self.assertEqual(self.mesh5.getCell(0) in s,True,'error in giveCellLocalizer mesh5')
 
+    def test_bulkOctree(self):
+        rng=np.random.RandomState(0)
+        c,s=rng.rand(2000,3),rng.rand(2000,3)*.05
+        bb=np.stack((c-s,c+s),axis=1)
+        oct=Octree.BulkOctree(bb,refineLimit=10)
+        self.assertTrue(oct.giveDepth()>0)
+        q,qe=rng.rand(50,3),rng.rand(50,3)*.02
+        iq,ii=oct.giveItemIndicesInBBoxes(q-qe,q+qe)
+        for i in range(50):
+            ref=np.nonzero(np.all((q[i]-qe[i]<=bb[:,1])&(q[i]+qe[i]>=bb[:,0]),axis=1))[0]
+            self.assertEqual(ii[iq==i].tolist(),ref.tolist(),'error in BulkOctree query %d'%i)
+        self.assertEqual(oct.giveItemsInBBox(BBox.BBox(tuple(q[0]-qe[0]),tuple(q[0]+qe[0]))),set(ii[iq==0].tolist()))
+        self.assertRaises(NotImplementedError,oct.insert,0)
+
+    def test_pointLocalizer(self):
+        rng=np.random.RandomState(0)
+        p,q=rng.rand(1000,3),rng.rand(50,3)*1.2-.1
+        loc=PointLocalizer.PointLocalizer(p)
+        D=np.linalg.norm(q[:,None,:]-p[None,:,:],axis=2)
+        dist,idx=loc.giveNearest(q,k=3)
+        self.assertTrue(np.allclose(dist,np.sort(D,axis=1)[:,:3]),'error in giveNearest')
+        self.assertTrue(np.allclose(D[np.arange(50)[:,None],idx],dist),'error in giveNearest')
+        iq,ip=loc.giveInRadius(q,.1)
+        ref=np.nonzero(D<=.1)
+        self.assertTrue(np.array_equal(iq,ref[0]) and np.array_equal(ip,ref[1]),'error in giveInRadius')
+        # more neighbours requested than available
+        dist,idx=PointLocalizer.PointLocalizer(p[:2]).giveNearest(q[:1],k=3)
+        self.assertEqual(idx[0,2],-1)
+
+    def test_snapToVertices(self):
+        pts=self.mesh5.snapToVertices([(3.001,1.,0.),(4.,1.,0.)],.01)
+        self.assertEqual(pts[0].tolist(),[3.,1.,0.])
+        self.assertEqual(pts[1].tolist(),[4.,1.,0.])
+
+    def test_mergeTolerance(self):
+        mesh6 = Mesh.UnstructuredMesh()
+        mesh6.setup([Vertex.Vertex(0,100,(3.,1.,0.)), Vertex.Vertex(1,101,(3.,5.,0.)), Vertex.Vertex(2,102,(5.,1.,0.))], [Cell.Triangle_2d_lin(mesh6,0,100,(0,2,1))])
+        self.mesh3.merge(mesh6,tolerance=1e-6)
+        self.assertEqual(self.mesh3.getNumberOfVertices(),5)
+        self.assertEqual([v.label for v in self.mesh3.getCell(2).getVertices()],[5,102,6])
+
+    def test_geometryCache(self):
+        pts=[(2.5,1.5,0.),(4.,4.,0.),(0.,0.,0.)]
+        cells,weights=self.mesh3.locatePoints(pts)
+        self.assertEqual(self.mesh3.getCellVolumes().tolist(),[4.,10.])
+        self.mesh3.enableGeometryCache()
+        self.assertEqual(self.mesh3.getCellVolumes().tolist(),[4.,10.])
+        self.assertTrue(self.mesh3.geometryCache.volumes is not None)
+        c2,w2=self.mesh3.locatePoints(pts)
+        self.assertEqual(c2.tolist(),cells.tolist())
+        self.assertTrue(np.allclose(w2,weights))
+        # merge changes the geometry
+        self.mesh3.merge(self.mesh5)
+        self.assertTrue(self.mesh3.geometryCache.volumes is None)
+        self.assertEqual(self.mesh3.getCellVolumes().shape,(4,))
+        self.mesh3.enableGeometryCache(False)
+        self.assertTrue(self.mesh3.geometryCache is None)
+
+    def test_cellNumbers(self):
+        self.assertEqual(self.mesh3._giveCellNumbers().tolist(),[5,2])
+        self.mesh3.enableGeometryCache()
+        self.mesh3._giveCellNumbers()
+        self.assertEqual(self.mesh3.geometryCache.cellNumbers[0].tolist(),[5,2])
+        # sequential numbering is not stored
+        self.mesh3.setup(self.mesh3.vertexList,[Cell.Triangle_2d_lin(self.mesh3,0,22,(0,1,2)),Cell.Triangle_2d_lin(self.mesh3,1,18,(1,2,3))])
+        self.assertIsNone(self.mesh3._giveCellNumbers())
+        self.assertIsNone(Mesh.CompactUnstructuredMesh.makeFromMesh(self.mesh3)._giveCellNumbers())
+
+    def test_digestCache(self):
+        d=self.mesh3.internalArraysDigest()
+        self.assertEqual(self.mesh3.arraysDigest,d)
+        self.assertEqual(Mesh.CompactUnstructuredMesh.makeFromMesh(self.mesh3).internalArraysDigest(),d)
+        # changed in place, digest is only recomputed after invalidation
+        self.mesh3.getVertex(0).coords=(0.,0.)
+        self.assertEqual(self.mesh3.internalArraysDigest(),d)
+        self.mesh3.invalidateGeometryCache()
+        d2=self.mesh3.internalArraysDigest()
+        self.assertNotEqual(d2,d)
+        self.mesh3.merge(self.mesh5)
+        self.assertTrue(self.mesh3.arraysDigest is None)
+        self.assertNotEqual(self.mesh3.internalArraysDigest(),d2)
+        self.mesh3.setup(self.mesh3.vertexList[:4],self.mesh3.cellList[:2])
+        self.assertEqual(self.mesh3.internalArraysDigest(),d2)
+
+    def test_integrate(self):
+        self.assertAlmostEqual(self.mesh3.integrate(lambda x: x[:,0]),56.,delta=1.e-10)
+        self.assertTrue(np.allclose(self.mesh3.integrate(lambda x: x[:,0],cellwise=True),[28./3.,140./3.]))
+        self.assertTrue(np.allclose(self.mesh3.integrate(lambda x: x[:,:2]),[56.,158./3.]))
+        # brick of size 5x3x2
+        mesh = Mesh.UnstructuredMesh()
+        mesh.setup([Vertex.Vertex(0,0,(0.,0.,0.)), Vertex.Vertex(1,1,(0.,3.,0.)), Vertex.Vertex(2,2,(5.,3.,0.)), Vertex.Vertex(3,3,(5.,0.,0.)), Vertex.Vertex(4,4,(0.,0.,-2.)), Vertex.Vertex(5,5,(0.,3.,-2.)), Vertex.Vertex(6,6,(5.,3.,-2.)),Vertex.Vertex(7,7,(5.,0.,-2.))], [])
+        mesh.setup(mesh.vertexList, [Cell.Brick_3d_lin(mesh,0,0,(0,1,2,3,4,5,6,7))])
+        self.assertAlmostEqual(mesh.integrate(lambda x: np.ones(x.shape[0])),30.,delta=1.e-10)
+        self.assertAlmostEqual(mesh.integrate(lambda x: x[:,0]**2*x[:,2]**2,order=4),125./3.*3.*8./3.,delta=1.e-8)
+
 #Testing vertexLabel2Number
     def test_vertexLabel2Number(self):
         self.assertEqual(self.mesh4.vertexLabel2Number(4),0,'error in vertexLabel2Number for mesh4(4)')
@@ -132,14 +227,46 @@ class Mesh_TestCase(unittest.TestCase):
         self.assertEqual(self.mesh3.getCell(2).getVertices()[1].label, 5, 'error in merge')
 
     def test_asVtkUnstructuredGrid(self):
-        #@todo: not working with mesh1 because points have only two coordinates
-        #@todo: not working with mesh4 because cell types are not supported ?
+        # mesh4 has abstract cells without geometry type, which cannot be exported
         self.testMesh = Mesh.UnstructuredMesh()
         self.testMesh.setup([Vertex.Vertex(0, 0, (0., 0., 0.)), Vertex.Vertex(1, 1, (1., 0., 0.)), Vertex.Vertex(2, 2, (1., 1., 0)),
                              Vertex.Vertex(3, 3, (0., 1., 0.)),Vertex.Vertex(4, 4, (0., 0., 1.)), Vertex.Vertex(5, 5, (1., 0., 1.)), Vertex.Vertex(6, 6, (1., 1., 0)),
                              Vertex.Vertex(7, 7, (0., 1., 1.))], [Cell.Brick_3d_lin(self.testMesh, 1, 1, (0, 1, 2,3,4,5,6,7))])
 
-        self.testMesh.asVtkUnstructuredGrid()
+        ugrid=self.testMesh.asVtkUnstructuredGrid()
+        self.assertEqual((ugrid.GetNumberOfPoints(),ugrid.GetNumberOfCells()),(8,1))
+        self.assertEqual(ugrid.GetPoint(7),(0.,1.,1.))
+        self.assertEqual(ugrid.GetCellType(0),12) # VTK_HEXAHEDRON
+        ids=ugrid.GetCell(0).GetPointIds()
+        self.assertEqual([ids.GetId(i) for i in range(ids.GetNumberOfIds())],list(range(8)))
+        # mixed cell types, 2D coordinates are padded by zero
+        ugrid=self.mesh3.asVtkUnstructuredGrid()
+        self.assertEqual([ugrid.GetCellType(i) for i in range(2)],[5,5]) # VTK_TRIANGLE
+        self.assertEqual(ugrid.GetPoint(3),(8.,7.,0.))
+        ids=ugrid.GetCell(1).GetPointIds()
+        self.assertEqual([ids.GetId(i) for i in range(3)],[1,2,3])
+        self.assertRaises(KeyError,self.mesh4.asVtkUnstructuredGrid)
+
+    def test_pickle(self):
+        import pickle
+        mesh = Mesh.UnstructuredMesh()
+        mesh.setup([Vertex.Vertex(0,4,(1.,1.)), Vertex.Vertex(1,5,(3.,1.)), Vertex.Vertex(2,6,(3.,5.)), Vertex.Vertex(3,16,(8.,7.))], [Cell.Triangle_2d_lin(mesh,0,22,(0,1,2)),Cell.Quad_2d_lin(mesh,1,18,(0,1,2,3))])
+        m=pickle.loads(pickle.dumps(mesh,pickle.HIGHEST_PROTOCOL))
+        self.assertEqual([(v.number,v.label,v.coords) for v in m.vertices()],[(0,4,(1.,1.)),(1,5,(3.,1.)),(2,6,(3.,5.)),(3,16,(8.,7.))])
+        self.assertEqual([(type(c),c.number,c.label,c.vertices) for c in m.cells()],[(Cell.Triangle_2d_lin,0,22,(0,1,2)),(Cell.Quad_2d_lin,1,18,(0,1,2,3))])
+        self.assertTrue(m.getCell(1).mesh is m)
+        self.assertEqual(m.internalArraysDigest(),mesh.internalArraysDigest())
+        # vertices and cells are sent as arrays
+        self.assertTrue(isinstance(mesh.__getstate__()['_packedItems']['coords'],np.ndarray))
+        self.assertFalse('vertexList' in mesh.__getstate__())
+        # items which cannot be restored from arrays exactly are pickled as they are
+        mesh.getVertex(0).extra=1
+        self.assertTrue('vertexList' in mesh.__getstate__())
+        self.assertEqual(pickle.loads(pickle.dumps(mesh)).getVertex(0).extra,1)
+        m=pickle.loads(pickle.dumps(self.mesh3)) # cells not numbered sequentially
+        self.assertEqual([(c.number,c.label) for c in m.cells()],[(5,22),(2,18)])
+        m=pickle.loads(pickle.dumps(self.mesh2))
+        self.assertEqual([(type(c),c.vertices) for c in m.cells()],[(Cell.Cell,(0,1,2)),(Cell.Cell,(1,2,3))])
 
     #def test_makeFromVtkUnstructuredGrid(self):
      #   mesh=Mesh.UnstructuredMesh.makeFromVtkUnstructuredGrid(self.mesh1)
@@ -151,5 +278,56 @@ class Mesh_TestCase(unittest.TestCase):
        import pyvtk
        self.assertTrue(isinstance(self.res,pyvtk.DataSet.DataSet),'error in getVTKRepresentation')
   
+class CompactMesh_TestCase(unittest.TestCase):
+    def setUp(self):
+        self.mesh3 = Mesh.UnstructuredMesh()
+        self.mesh3.setup([Vertex.Vertex(0,4,(1.,1.)), Vertex.Vertex(1,5,(3.,1.)), Vertex.Vertex(2,6,(3.,5.)), Vertex.Vertex(3,16,(8.,7.))], [Cell.Triangle_2d_lin(self.mesh3,0,22,(0,1,2)),(Cell.Triangle_2d_lin(self.mesh3,1,18,(1,2,3)))])
+        self.mesh5 = Mesh.UnstructuredMesh()
+        self.mesh5.setup([Vertex.Vertex(0,16,(8.,7.,0.)), Vertex.Vertex(1,5,(3.,1.,0.)), Vertex.Vertex(2,8,(35.,42.,0.)), Vertex.Vertex(3,9,(545.,72.,0.))], [Cell.Triangle_2d_lin(self.mesh5,5,1,(0,1,2)),(Cell.Triangle_2d_lin(self.mesh5,2,2,(1,2,3)))])
+        self.cmesh=Mesh.CompactUnstructuredMesh.makeFromMesh(self.mesh3)
+
+    def test_arrays(self):
+        self.assertEqual(self.cmesh.getNumberOfVertices(),4)
+        self.assertEqual(self.cmesh.getNumberOfCells(),2)
+        self.assertTrue(np.array_equal(self.cmesh.getVertices(),self.mesh3.getVertices()))
+        for a,b in zip(self.cmesh.getCells(),self.mesh3.getCells()): self.assertTrue(np.array_equal(a,b))
+        self.assertEqual(self.cmesh.cellOffsets.tolist(),[0,3,6])
+        self.assertEqual(self.cmesh.internalArraysDigest(),self.mesh3.internalArraysDigest())
+
+    def test_views(self):
+        v=self.cmesh.getVertex(2)
+        self.assertEqual((v.number,v.label,v.coords),(2,6,(3.,5.,0.)))
+        c=self.cmesh.getCell(1)
+        self.assertTrue(isinstance(c,Cell.Triangle_2d_lin))
+        self.assertEqual((c.number,c.label,c.vertices),(1,18,(1,2,3)))
+        self.assertEqual([v.label for v in c.getVertices()],[5,6,16])
+        self.assertEqual(len(list(self.cmesh.vertices())),4)
+        self.assertEqual([c.label for c in self.cmesh.cells()],[22,18])
+        self.assertEqual(self.cmesh.vertexLabel2Number(16),3)
+        self.assertEqual(self.cmesh.cellLabel2Number(18),1)
+
+    def test_setupFromArrays(self):
+        m=Mesh.CompactUnstructuredMesh()
+        m.setupFromArrays(np.array([(0.,0.),(1.,0.),(1.,1.),(0.,1.),(2.,0.)]),[CellGeometryType.CGT_QUAD,CellGeometryType.CGT_TRIANGLE_1],np.array([[0,1,2,3],[1,4,2,-1]]))
+        self.assertEqual(m.cellConnectivity.tolist(),[0,1,2,3,1,4,2])
+        self.assertTrue(isinstance(m.getCell(0),Cell.Quad_2d_lin))
+        self.assertEqual(m.getCells()[1].tolist(),[[0,1,2,3],[1,4,2,-1]])
+        f=Field.Field(m,FieldID.FID_Temperature,ValueType.Scalar,'K',0.,[(0.,),(1.,),(2.,),(1.,),(2.,)])
+        self.assertAlmostEqual(f.evaluate((1.5,.25,0.)).getValue()[0],1.75)
+
+    def test_merge(self):
+        self.cmesh.merge(self.mesh5)
+        self.assertEqual(self.cmesh.getNumberOfVertices(),6)
+        self.assertEqual(self.cmesh.getNumberOfCells(),4)
+        self.assertEqual(self.cmesh.getCell(0).getVertices()[1].label, 5, 'error in merge')
+        self.assertEqual(self.cmesh.getCell(2).getVertices()[0].label, 16, 'error in merge')
+        self.assertEqual(self.cmesh.getCell(2).getVertices()[1].label, 5, 'error in merge')
+        self.assertEqual(self.cmesh.vertexLabel2Number(9),5)
+
+    def test_pickle(self):
+        import pickle
+        m=pickle.loads(pickle.dumps(self.cmesh))
+        self.assertEqual(m.internalArraysDigest(),self.cmesh.internalArraysDigest())
+
 # python test_Mesh.py for stand-alone test being run
 if __name__=='__main__': unittest.main()
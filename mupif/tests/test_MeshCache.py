@@ -0,0 +1,74 @@
+import unittest
+import sys
+import pickle
+sys.path.append('../..')
+
+from mupif import *
+
+class App(Application.Application):
+    def __init__(self):
+        super(App, self).__init__()
+        self.mesh = Mesh.UnstructuredMesh()
+        self.mesh.setup([Vertex.Vertex(0,4,(1.,1.,0.)), Vertex.Vertex(1,5,(3.,1.,0.)), Vertex.Vertex(2,6,(3.,5.,0.)), Vertex.Vertex(3,16,(8.,7.,0.))], [Cell.Triangle_2d_lin(self.mesh,0,22,(0,1,2)),Cell.Triangle_2d_lin(self.mesh,1,18,(1,2,3))])
+    def getField(self, fieldID, time):
+        # new field (and equal mesh) every time
+        return Field.Field(self.mesh.copy(),fieldID,ValueType.Scalar,'K',time,[(time,)]*4)
+
+class PickleProxy(object):
+    'Passes return values through pickle, as pyro would do.'
+    def __init__(self, obj): self.obj,self.sent=obj,[]
+    def __getattr__(self, name):
+        def call(*args):
+            ret=pickle.dumps(getattr(self.obj,name)(*args),pickle.HIGHEST_PROTOCOL)
+            self.sent.append(len(ret))
+            return pickle.loads(ret)
+        return call
+
+class MeshCache_TestCase(unittest.TestCase):
+    def test_getFieldCached(self):
+        app=App()
+        f=app.getFieldCached(FieldID.FID_Temperature,1.)
+        self.assertTrue(isinstance(f.getMesh(),Mesh.Mesh))
+        f=app.getFieldCached(FieldID.FID_Temperature,1.,[app.mesh.internalArraysDigest()])
+        self.assertEqual(f.getMesh().digest,app.mesh.internalArraysDigest())
+        self.assertEqual(f.value,[(1.,)]*4)
+
+    def test_remoteApplication(self):
+        proxy=PickleProxy(App())
+        app=Application.RemoteApplication(proxy)
+        f1=app.getField(FieldID.FID_Temperature,1.)
+        f2=app.getField(FieldID.FID_Temperature,2.)
+        # mesh is sent only the first time, then both fields share it
+        self.assertTrue(proxy.sent[1]<proxy.sent[0]/2)
+        self.assertTrue(f1.getMesh() is f2.getMesh())
+        self.assertEqual(f2.value,[(2.,)]*4)
+        self.assertAlmostEqual(f2.evaluate((3.,3.,0.)).getValue()[0],2.)
+        app._decoratee=None
+
+    def test_withoutGetFieldCached(self):
+        class OldApp(object):
+            def getField(self, fieldID, time): return App().getField(fieldID, time)
+        app=Application.RemoteApplication(OldApp())
+        self.assertEqual(app.getField(FieldID.FID_Temperature,1.).value,[(1.,)]*4)
+        self.assertIsNone(app._meshCache)
+        # errors of the application are not masked
+        class FailingApp(App):
+            def getFieldCached(self, fieldID, time, knownMeshes=()): raise AttributeError('failure')
+        app=Application.RemoteApplication(FailingApp())
+        self.assertRaises(AttributeError,app.getField,FieldID.FID_Temperature,1.)
+        self.assertIsNotNone(app._meshCache)
+
+    def test_lru(self):
+        cache=MeshCache.MeshCache(maxSize=2)
+        meshes=[App().mesh for i in range(3)]
+        for i,m in enumerate(meshes): m.getVertex(0).coords=(float(i),0.,0.)
+        for m in meshes[:2]: self.assertTrue(cache.add(m) is m)
+        cache.get(meshes[0].internalArraysDigest())
+        cache.add(meshes[2])
+        self.assertEqual(cache.getDigests(),[meshes[0].internalArraysDigest(),meshes[2].internalArraysDigest()])
+        self.assertRaises(KeyError,cache.get,meshes[1].internalArraysDigest())
+        # equal mesh is replaced by the cached instance
+        self.assertTrue(cache.add(meshes[0].copy()) is meshes[0])
+
+# python test_MeshCache.py for stand-alone test being run
+if __name__=='__main__': unittest.main()
@@ -0,0 +1,249 @@
+import unittest
+import sys
+import os
+import time
+import socket
+import tempfile
+import shutil
+import threading
+sys.path.append('../..')
+
+from mupif import *
+import Pyro4
+import Pyro4.naming
+
+# server config used by JobMan2cmd workers
+serverConfig = '''
+from mupif import Application
+import Pyro4
+import time
+
+@Pyro4.expose
+class App(Application.Application):
+    def __init__(self, file='', workdir=''):
+        super(App, self).__init__(file, workdir)
+        # slow application startup
+        time.sleep(%f)
+    def getApplicationSignature(self):
+        return 'App@'+self.workDir
+
+class serverConfig(object):
+    def __init__(self, mode):
+        self.nshost = '127.0.0.1'
+        self.nsport = %d
+        self.hkey = None
+        self.server = '127.0.0.1'
+        self.serverNathost = None
+        self.applicationClass = App
+        self.applicationInitialFile = '/dev/null'
+'''
+
+def freePortRange(n):
+    """
+    Returns first port of n consecutive free ports. Ports are looked for below the ephemeral range, so that they are not taken by connections of other processes meanwhile.
+    """
+    for start in range(20000, 32000, n):
+        sockets = []
+        try:
+            for port in range(start, start+n):
+                s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                sockets.append(s)
+                s.bind(('127.0.0.1', port))
+            return start
+        except socket.error:
+            continue
+        finally:
+            for s in sockets: s.close()
+    raise RuntimeError('no free ports')
+
+class JobManager_TestCase(unittest.TestCase):
+    def test_resources(self):
+        jobMan = JobManager.JobManager('test', '.', maxJobs=4, resources={'cores': [0, 1, 2, 3, 6, 7], 'memory': 1000})
+        def allocate(jobID, resources):
+            with jobMan.lock:
+                request = jobMan._waitForResources('user', 0., 0, resources)
+                jobMan.pendingJobs[jobID] = None
+                return jobMan._assignResources(jobID, request)
+        # smallest block of neighbouring CPUs the job fits in
+        self.assertEqual(allocate('a', {'cores': 2, 'memory': 500}), {'cores': [6, 7], 'memory': 500})
+        # single core by default
+        self.assertEqual(allocate('b', None), {'cores': [0]})
+        self.assertEqual(jobMan.getResourceUtilisation(), {'cores': (3, 6), 'memory': (500, 1000), 'jobs': (2, 4)})
+        self.assertRaises(JobManager.JobManNoResourcesException, allocate, 'c', {'memory': 600})
+        self.assertRaises(JobManager.JobManNoResourcesException, allocate, 'c', {'cores': 7})
+        self.assertRaises(JobManager.JobManException, allocate, 'c', {'gpus': 1})
+        self.assertEqual(allocate('c', {'cores': 3}), {'cores': [1, 2, 3]})
+        with jobMan.lock:
+            del jobMan.pendingJobs['a']
+            jobMan._jobFinished('a', time.time())
+        self.assertEqual(jobMan.getResourceUtilisation()['cores'], (4, 6))
+        self.assertEqual(allocate('d', {'cores': 2, 'memory': 1000}), {'cores': [6, 7], 'memory': 1000})
+        self.assertRaises(ValueError, JobManager.JobManager, 'test', '.', resources={'cores': 100000})
+
+class SimpleJobManager2_TestCase(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.pythonPath = os.environ.get('PYTHONPATH')
+        self.tmp = tempfile.mkdtemp()
+        os.chdir(self.tmp)
+        # workers have to find mupif
+        root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+        os.environ['PYTHONPATH'] = os.pathsep.join([root]+([self.pythonPath] if self.pythonPath else []))
+        nsUri, self.nsDaemon, bcServer = Pyro4.naming.startNS(host='127.0.0.1', port=0, enableBroadcast=False)
+        self.nsThread = threading.Thread(target=self.nsDaemon.requestLoop)
+        self.nsThread.start()
+        for name, delay in (('jobManTestConfig', 0.), ('jobManTestConfigSlow', 2.)):
+            with open(os.path.join(self.tmp, name+'.py'), 'w') as f:
+                f.write(serverConfig % (delay, nsUri.port))
+        self.ns = PyroUtil.connectNameServer('127.0.0.1', nsUri.port, None)
+        self.jobMan = None
+
+    def tearDown(self):
+        if self.jobMan:
+            for jobID in list(self.jobMan.activeJobs):
+                self.jobMan.terminateJob(jobID)
+            # worker being started for the pool needs the name server
+            poolThread = self.jobMan.poolThread
+            self.jobMan.terminate()
+            if poolThread: poolThread.join(60)
+            self.jobMan.s.close()
+        self.nsDaemon.shutdown()
+        self.nsThread.join()
+        self.nsDaemon.close()
+        os.chdir(self.cwd)
+        if self.pythonPath is None: del os.environ['PYTHONPATH']
+        else: os.environ['PYTHONPATH'] = self.pythonPath
+        shutil.rmtree(self.tmp)
+
+    def jobManager(self, maxJobs=2, poolSize=0, config='jobManTestConfig', resources=None):
+        port = freePortRange(10)
+        jobMan2cmd = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools', 'JobMan2cmd.py')
+        self.jobMan = SimpleJobManager.SimpleJobManager2(None, self.ns, None, 'TestApp', (port, port+9), self.tmp, self.tmp, config, 0, jobMan2cmd, maxJobs=maxJobs, jobMancmdCommPort=0, poolSize=poolSize, resources=resources)
+        return self.jobMan
+
+    def waitForPool(self, jobMan):
+        for i in range(600):
+            if len(jobMan.pool) == jobMan.poolSize: return
+            time.sleep(0.1)
+        self.fail('pool not filled')
+
+    def checkJob(self, ret):
+        self.assertEqual(ret[0], JobManager.JOBMAN_OK)
+        app = Pyro4.Proxy(self.ns.lookup(ret[1]))
+        self.assertEqual(app.getApplicationSignature(), 'App@'+os.path.join(self.tmp, ret[1]))
+        app._pyroRelease()
+
+    def test_allocateJob(self):
+        jobMan = self.jobManager()
+        self.checkJob(jobMan.allocateJob('user', None))
+        self.assertEqual(len(jobMan.getStatus()), 1)
+
+    def test_concurrentAllocation(self):
+        jobMan = self.jobManager(maxJobs=3, config='jobManTestConfigSlow')
+        results = []
+        def allocate():
+            results.append(jobMan.allocateJob('user', None))
+        threads = [threading.Thread(target=allocate) for i in range(3)]
+        t0 = time.time()
+        for t in threads: t.start()
+        for t in threads: t.join(60)
+        # jobs are started in parallel (sequential start would take at least 6 s)
+        self.assertLess(time.time()-t0, 5.)
+        self.assertEqual(len(set(ret[1] for ret in results)), 3)
+        for ret in results: self.checkJob(ret)
+        self.assertEqual((len(jobMan.activeJobs), len(jobMan.pendingJobs), len(jobMan.startingWorkers)), (3, 0, 0))
+        # unknown worker is rejected
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.connect(('localhost', jobMan.jobMancmdCommPort))
+        SimpleJobManager.sendMessage(s, 'ready 1234')
+        self.assertEqual(SimpleJobManager.recvMessage(s), '')
+        s.close()
+
+    def queued(self, jobMan, n):
+        for i in range(600):
+            queued = [rec for rec in jobMan.getStatus() if rec[0] is None]
+            if len(queued) == n: return queued
+            time.sleep(0.1)
+        self.fail('request not queued')
+
+    def test_queue(self):
+        jobMan = self.jobManager(maxJobs=1)
+        first = jobMan.allocateJob('user', None)
+        self.assertRaises(JobManager.JobManNoResourcesException, jobMan.allocateJob, 'user', None)
+        t0 = time.time()
+        self.assertRaises(JobManager.JobManNoResourcesException, jobMan.allocateJob, 'user', None, wait=0.2)
+        self.assertGreaterEqual(time.time()-t0, 0.2)
+        results = {}
+        def allocate(user, priority):
+            results[user] = jobMan.allocateJob(user, None, wait=60., priority=priority)
+        threads = [threading.Thread(target=allocate, args=('low', 0)), threading.Thread(target=allocate, args=('high', 1))]
+        threads[0].start()
+        self.queued(jobMan, 1)
+        threads[1].start()
+        queued = self.queued(jobMan, 2)
+        # higher priority goes first, waiting time is unknown until a job finishes
+        self.assertEqual([(rec[2], rec[3], rec[4]) for rec in queued], [('high', 0, None), ('low', 1, None)])
+        jobMan.terminateJob(first[1])
+        threads[1].join(60)
+        self.checkJob(results['high'])
+        queued = self.queued(jobMan, 1)
+        self.assertEqual((queued[0][2], queued[0][3]), ('low', 0))
+        self.assertTrue(queued[0][4] >= 0.)
+        self.assertFalse('low' in results)
+        jobMan.terminateJob(results['high'][1])
+        threads[0].join(60)
+        self.checkJob(results['low'])
+
+    def test_resources(self):
+        cpu = min(os.sched_getaffinity(0))
+        jobMan = self.jobManager(poolSize=1, resources={'cores': [cpu], 'memory': 100})
+        self.waitForPool(jobMan)
+        ret = jobMan.allocateJob('user', None, resources={'memory': 60})
+        self.checkJob(ret)
+        # worker is pinned to assigned core
+        self.assertEqual(os.sched_getaffinity(jobMan.activeJobs[ret[1]][SimpleJobManager.SJM2_PROC_INDX].pid), set([cpu]))
+        self.assertEqual(jobMan.getStatus()[0][4], {'cores': [cpu], 'memory': 60})
+        self.assertEqual(jobMan.getResourceUtilisation(), {'cores': (1, 1), 'memory': (60, 100), 'jobs': (1, 2)})
+        # no core left although maxJobs is not reached
+        self.assertRaises(JobManager.JobManNoResourcesException, jobMan.allocateJob, 'user', None, resources={'memory': 10})
+        jobMan.terminateJob(ret[1])
+        self.assertEqual(jobMan.getResourceUtilisation(), {'cores': (0, 1), 'memory': (0, 100), 'jobs': (0, 2)})
+
+    def test_failedAllocation(self):
+        jobMan = self.jobManager(poolSize=1)
+        self.waitForPool(jobMan)
+        proc, conn = jobMan.pool[0]
+        # keep our end of the connection open, so that only terminate stops the idle worker
+        ports = list(jobMan.freePorts)
+        def fail(conn, msg): raise socket.error('connection lost')
+        sendMessage = SimpleJobManager.sendMessage
+        SimpleJobManager.sendMessage = fail
+        try:
+            self.assertRaises(socket.error, jobMan.allocateJob, 'user', None)
+        finally:
+            SimpleJobManager.sendMessage = sendMessage
+        # worker is terminated, reservation is released
+        self.assertIsNotNone(proc.wait(10))
+        conn.close()
+        self.assertEqual((len(jobMan.pendingJobs), sorted(jobMan.freePorts)), (0, sorted(ports)))
+        self.assertEqual(jobMan.getResourceUtilisation()['jobs'], (0, 2))
+
+    def test_pool(self):
+        jobMan = self.jobManager(poolSize=2)
+        self.waitForPool(jobMan)
+        workers = list(jobMan.pool)
+        ret = jobMan.allocateJob('user', None)
+        self.checkJob(ret)
+        # job runs in a pre-started worker, the pool is replenished
+        proc = jobMan.activeJobs[ret[1]][SimpleJobManager.SJM2_PROC_INDX]
+        self.assertTrue(any(proc is w[0] for w in workers))
+        self.waitForPool(jobMan)
+        self.assertEqual(len(jobMan.pool), 2)
+        jobMan.terminateJob(ret[1])
+        # idle workers are terminated with the job manager
+        jobMan.terminate()
+        for p, conn in workers:
+            if p is not proc: self.assertIsNotNone(p.wait(10))
+
+# python test_SimpleJobManager.py for stand-alone test being run
+if __name__=='__main__': unittest.main()
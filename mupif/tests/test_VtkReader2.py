@@ -20,6 +20,21 @@ class VtkReader2_TestCase(unittest.TestCase):
         self.assertTrue(nV == 8)
         self.assertTrue(nC == 1)
 
+    def test_ReadMeshConnectivity(self):
+        nx,ny,nz=4,3,5
+        coords=[(i,j,k) for k in range(nz) for j in range(ny) for i in range(nx)]
+        m = VtkReader2.readMesh(len(coords),nx,ny,nz,coords)
+        cm = VtkReader2.readMesh(len(coords),nx,ny,nz,coords,compact=True)
+        self.assertEqual((cm.getNumberOfVertices(),cm.getNumberOfCells()),(60,24))
+        self.assertEqual(m.internalArraysDigest(),cm.internalArraysDigest())
+        self.assertEqual([c.label for c in cm.cells()],list(range(1,25)))
+        # element 11 (i=2,j=1,k=1) is a unit cube at (2,1,1)
+        c=cm.getCell(11)
+        self.assertEqual(c.getGeometryType(),CellGeometryType.CGT_HEXAHEDRON)
+        self.assertEqual(c.vertices,(18,19,23,22,30,31,35,34))
+        self.assertEqual(sorted(v.coords for v in c.getVertices()),sorted((2.+i,1.+j,1.+k) for i in (0,1) for j in (0,1) for k in (0,1)))
+        self.assertAlmostEqual(cm.getCellVolumes().sum(),3*2*4)
+
     def test_ReadField(self):
         THIS_FOLDER = os.path.dirname(os.path.abspath(__file__))
         my_file = os.path.join(THIS_FOLDER, 'testVtkReader2.vtk')
@@ -96,21 +96,48 @@ class TestSaveLoad(unittest.TestCase):
     def testFieldVtk2SaveLoad_binary(self):
         self._testFieldVtk2SaveLoad(format='binary')
 
-    def testOctreeNotPickled(self):
+    def testLocalizersPickled(self):
         f=self.app1.getField(mupif.FieldID.FID_Temperature,tstep.getTime())
         import pickle
+        import numpy as np
         m=f.getMesh()
         # this creates localizers on-request
         m.giveVertexLocalizer()
         m.giveCellLocalizer()
         # check localizers are there (break encapsulation, sorry)
-        self.assert_(m.vertexOctree is not None)
-        self.assert_(m.cellOctree is not None)
+        self.assertTrue(m.vertexOctree is not None)
+        self.assertTrue(m.cellOctree is not None)
         p=pickle.dumps(m)
-        # but that they were not pickled
+        # localizers travel with the mesh, without items (cells, vertices) of the original mesh
         m2=pickle.loads(p)
-        self.assert_(m2.vertexOctree is None)
-        self.assert_(m2.cellOctree is None)
+        self.assertTrue(m2.cellOctree is not None)
+        self.assertTrue(np.array_equal(m2.cellOctree.leafItems,m.cellOctree.leafItems))
+        self.assertEqual(m2.localizerDigest,m.internalArraysDigest())
+        # on first use, they are validated and attached to the new mesh
+        cl=m2.giveCellLocalizer()
+        self.assertTrue(cl is m2.cellOctree)
+        self.assertTrue(m2.getCell(0) in cl.giveItemsInBBox(m2.getCell(0).getBBox()))
+        self.assertTrue(m2.getVertex(0) in m2.giveVertexLocalizer().giveItemsInBBox(BBox.BBox(m2.getVertex(0).getCoordinates(),m2.getVertex(0).getCoordinates())))
+        # stale localizers are rejected
+        m3=pickle.loads(p)
+        m3.getVertex(0).coords=(-1.,-1.,0.)
+        self.assertTrue(m3.giveCellLocalizer() is not pickle.loads(p).cellOctree)
+        self.assertTrue(m3.getCell(0) in m3.giveCellLocalizer().giveItemsInBBox(BBox.BBox((-1.,-1.,0.),(-1.,-1.,0.))))
+    def testLocalizersHdf5(self):
+        import h5py, tempfile
+        import numpy as np
+        f=self.app1.getField(mupif.FieldID.FID_Temperature,tstep.getTime())
+        m=f.getMesh()
+        m.giveCellLocalizer()
+        with tempfile.NamedTemporaryFile() as tmp:
+            with h5py.File(tmp.name,'w') as h5:
+                m.asHdf5Object(h5,'mesh')
+            with h5py.File(tmp.name,'r') as h5:
+                m2=mupif.Mesh.Mesh.makeFromHdf5Object(h5['mesh'])
+        self.assertTrue(isinstance(m2.cellOctree,mupif.Octree.BulkOctree))
+        self.assertTrue(m2.vertexOctree is None)
+        cells,weights=m2.locatePoints([(2.,2.,0.)])
+        self.assertTrue(np.array_equal(cells,m.locatePoints([(2.,2.,0.)])[0]))
         
         
 
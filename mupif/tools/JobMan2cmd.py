@@ -8,17 +8,19 @@ import socket
 import getopt, sys
 import logging
 import importlib
+import json
 from mupif import Util
 
 def usage(log):
     log.info("Usage: JobMan2cmd -p portnumber -j jobid -n natport -d workdir -f inputfile -s socket -i moduleDir -c ServerConfigFile -m configMode")
+    log.info("       JobMan2cmd -w -t token -s socket -i moduleDir -c ServerConfigFile -m configMode (idle worker getting the job from job manager)")
 
 def main():
     log = Util.setupLogger(fileName='JobMan2cmd.log', level=logging.DEBUG)
     log.info("JobMan2cmd: " + str(sys.argv[1:]))
 
     try:
-        opts, args = getopt.getopt(sys.argv[1:], "p:j:n:d:f:s:i:c:m:", ['port=','job=','natport='])
+        opts, args = getopt.getopt(sys.argv[1:], "p:j:n:d:f:s:i:c:m:wt:", ['port=','job=','natport=','wait','token='])
     except getopt.GetoptError as err:
         # print help information and exit:
         log.exception(err)
@@ -32,6 +34,8 @@ def main():
     mupif = None
     moduleDir = None
     configMode = 0
+    wait = False
+    token = None
 
     for o, a in opts:
         if o in ("-p", "--port"):
@@ -52,11 +56,15 @@ def main():
             configName = a
         elif o in ("-m", "--mode"):
             configMode = int(a)    
+        elif o in ("-w", "--wait"):
+            wait = True
+        elif o in ("-t", "--token"):
+            token = a
         else:
             log.error("unhandled option")
 
 
-    if daemonPort == None or jobID == None:
+    if not wait and (daemonPort == None or jobID == None):
         log.error('missing at least options -p and -j')
         usage(log)
         sys.exit(2)
@@ -75,14 +83,25 @@ def main():
         log.error('missing options -c specifying server config file')
         exit(0)
 
+    #locate nameserver
+    ns = PyroUtil.connectNameServer(nshost=conf.nshost, nsport=conf.nsport, hkey=conf.hkey)
+
+    if wait:
+        # report readiness to job manager and wait for the job
+        SimpleJobManager = importlib.import_module('mupif.SimpleJobManager')
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.connect(('localhost', jobManCommPort))
+        # token identifies this worker at job manager
+        SimpleJobManager.sendMessage(s, 'ready %s' % token)
+        job = json.loads(SimpleJobManager.recvMessage(s))
+        log.info("JobMan2cmd: received job " + str(job))
+        daemonPort, jobID, natPort, workDir = job['port'], job['jobID'], job['natPort'], job['workDir']
+
     if natPort == 'None' or natPort == None:
         natPort = None
     elif conf.serverNathost==None:
         conf.serverNathost = conf.server
 
-    #locate nameserver
-    ns = PyroUtil.connectNameServer(nshost=conf.nshost, nsport=conf.nsport, hkey=conf.hkey)
-
     #Run a daemon. It will run even the port has DROP/REJECT status. The connection from a client is then impossible.
     #if conf.serverNathost==None:
         #conf.serverNathost = conf.server
@@ -109,14 +128,18 @@ def main():
     log.info('JobMan2cmd: setting workdir as %s', workDir)
     log.info('Signature is %s' % app.getApplicationSignature() )
 
-    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    s.connect(('localhost', jobManCommPort))
-    # needs something w/ buffer interface, which is bytes (and not str)
-    #if future.utils.PY3:
-    s.sendall(bytes(uri.asString(),'utf-8'))
-    #else:
-    #s.sendall(uri.asString())
-    s.close()
+    if wait:
+        SimpleJobManager.sendMessage(s, uri.asString())
+        s.close()
+    else:
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.connect(('localhost', jobManCommPort))
+        # needs something w/ buffer interface, which is bytes (and not str)
+        #if future.utils.PY3:
+        s.sendall(bytes(uri.asString(),'utf-8'))
+        #else:
+        #s.sendall(uri.asString())
+        s.close()
 
     daemon.requestLoop()
 
@@ -29,6 +29,14 @@ def usage():
     print("Usage: jobManStatus -n nshost -r nsPort -j jobmanname -k hkey [-t -u user]")
 
 
+def formatTime(t):
+    mins = t//60
+    hrs  = mins//60
+    mins = mins%60
+    sec  = int(t)%60
+    return "%02d:%02d:%02d"%(hrs, mins, sec)
+
+
 def processor(win, jobman):
     global jobmanname
     global host
@@ -59,17 +67,22 @@ def processor(win, jobman):
         if c == ord('q'):
             break
         status=jobman.getStatus()
+        utilisation=jobman.getResourceUtilisation()
+        win.addstr(22,0, "  ".join("%s %s/%s"%(name, used, available) for name, (used, available) in sorted(utilisation.items())).ljust(79))
         i = 0
         for rec in status:
-            win1.addstr(i,jobid_col, rec[0])
-            win1.addstr(i,port_col, str(rec[3]))
+            if rec[0] is None:
+                # request waiting in queue (None, waiting time, user, position, estimated wait)
+                queued = "queued #%d"%(rec[3]+1)
+                if rec[4] is not None:
+                    queued += " (est. %s)"%formatTime(rec[4])
+                win1.addstr(i,jobid_col, queued)
+                win1.addstr(i,port_col, "-")
+            else:
+                win1.addstr(i,jobid_col, rec[0])
+                win1.addstr(i,port_col, str(rec[3]))
             win1.addstr(i,user_col, rec[2])
-            mins = rec[1]//60
-            hrs  = mins//24
-            mins = mins%60
-            sec  = int(rec[1])%60
-            jobtime = "%02d:%02d:%02d"%(hrs, mins, sec)
-            win1.addstr(i,time_col, jobtime)
+            win1.addstr(i,time_col, formatTime(rec[1]))
             i = i+1
         win1.refresh()
         timeTime.sleep(1)